@@ -5,6 +5,9 @@ from sklearn.ensemble import RandomForestRegressor
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from cache_extractos import SIN_CONEXION, CacheExtracto, tiene_columna
+from carga_masiva import reemplazar_tabla
+
 conn_str = (
     'DRIVER={SQL Server};'
     'SERVER=168.88.162.158;'
@@ -13,14 +16,24 @@ conn_str = (
     'PWD=cli_abas'
 )
 
-conn = pyodbc.connect(conn_str)
-cursor = conn.cursor()
-
 query = """
-SELECT id_Tpacientes, cod_sexo, edad, total_cuenta
+SELECT id_Tpacientes, cod_sexo, edad, total_cuenta{columna_fecha}
 FROM JMC_PAQUETES_HOSPITALARIOS WHERE COD_PRESTACION = '190205508'
 """  
-df = pd.read_sql(query, conn)
+# Copia local en Parquet: sólo se piden las filas desde la última FECHA_ADD guardada (ver cache_extractos.py).
+# Si la tabla no tiene FECHA_ADD se lee entera cada vez, como antes
+extracto = CacheExtracto('paquetes_190205508', query.format(columna_fecha=', FECHA_ADD'))
+if SIN_CONEXION:
+    df = extracto.leer()
+else:
+    conn = pyodbc.connect(conn_str)
+    if tiene_columna(conn, 'JMC_PAQUETES_HOSPITALARIOS', 'FECHA_ADD'):
+        extracto.actualizar(conn)
+        df = extracto.leer()
+    else:
+        print("JMC_PAQUETES_HOSPITALARIOS no tiene FECHA_ADD: se lee sin copia local")
+        df = pd.read_sql(query.format(columna_fecha=''), conn)
+    conn.close()
 
 bins = [0, 18, 30, 40, 50, 60, 100]  
 labels = ['0-18', '19-30', '31-40', '41-50', '51-60', '61+']  
@@ -44,27 +57,14 @@ nuevos_datos = pd.DataFrame({
 
 nuevos_datos['precio_proyectado'] = model.predict(nuevos_datos)
 
-create_table_query = """
-IF OBJECT_ID('JMC_PAQUETES_HOSPITALARIOS_python', 'U') IS NOT NULL 
-    DROP TABLE JMC_PAQUETES_HOSPITALARIOS_python;
-CREATE TABLE JMC_PAQUETES_HOSPITALARIOS_python (
-    cod_sexo INT,
-    tramo_edad INT,
-    precio_proyectado FLOAT
-);
-"""
-
-cursor.execute(create_table_query)
-conn.commit()
-
-for _, row in nuevos_datos.iterrows():
-    insert_query = """
-    INSERT INTO JMC_PAQUETES_HOSPITALARIOS_python (cod_sexo, tramo_edad, precio_proyectado)
-    VALUES (?, ?, ?)
-    """
-    cursor.execute(insert_query, row['cod_sexo'], row['tramo_edad'], row['precio_proyectado'])
-
-conn.commit()
-
-cursor.close()
-conn.close()
\ No newline at end of file
+# Las filas se cargan en una tabla auxiliar que reemplaza a la anterior al final (ver carga_masiva.py)
+if SIN_CONEXION:
+    print(nuevos_datos)
+else:
+    conn = pyodbc.connect(conn_str)
+    reemplazar_tabla(conn, 'JMC_PAQUETES_HOSPITALARIOS_python', nuevos_datos, {
+        'cod_sexo': 'INT',
+        'tramo_edad': 'INT',
+        'precio_proyectado': 'FLOAT',
+    })
+    conn.close()
\ No newline at end of file
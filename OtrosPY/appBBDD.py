@@ -1,12 +1,17 @@
 from flask import Flask, request
 from datetime import datetime, timedelta
-import pyodbc
 import pytz
 import urllib.parse
 
 from twilio.twiml.messaging_response import MessagingResponse
 
 import os
+import threading
+import time
+
+from datos_reservas import crear_repositorio
+from cache_disponibilidad import CacheDisponibilidad
+from circuito import CircuitoAbierto, Cortocircuito
 
 def test_ping(ip):
     response = os.system(f"ping -c 4 {ip}")  # En Linux, usamos '-c 4' para enviar 4 paquetes
@@ -15,9 +20,6 @@ def test_ping(ip):
     else:
         return "No se puede hacer ping al servidor."
 
-result = test_ping("168.88.162.158")
-print(result)
-
 
 
 app = Flask(__name__)
@@ -43,33 +45,79 @@ db_config = {
     'pwd': 'cli_abas'
 }
 
+# Conexiones reutilizadas entre mensajes (ver datos_reservas.py)
+BBDD = crear_repositorio(db_config)
+# Tras varios fallos seguidos se deja de consultar la base por un rato y se ofrecen los últimos cupos conocidos
+CIRCUITO = Cortocircuito(
+    fallos_maximos=int(os.environ.get('CIRCUITO_FALLOS', 3)),
+    espera=float(os.environ.get('CIRCUITO_ESPERA_SEGUNDOS', 30)),
+)
+
+def consultar_cupos(dia, limite=3, especialidad=None):
+    return CIRCUITO.llamar(BBDD.cupos_disponibles, dia, limite=limite, especialidad=especialidad)
+
+# Una ráfaga de "agendar" para el mismo día comparte una sola consulta a Reservas
+DISPONIBILIDAD = CacheDisponibilidad(
+    consultar_cupos, ttl=float(os.environ.get('DISPONIBILIDAD_TTL_SEGUNDOS', 5))
+)
+ULTIMOS_CUPOS = {}  # día -> (hora de la consulta, cupos) de la última lectura exitosa
+
+# Las verificaciones de conectividad corren en segundo plano para no demorar el arranque del worker;
+# /ready contesta 503 hasta que la base responda
+BBDD_LISTA = threading.Event()
+
+def verificar_conectividad(intervalo=10):
+    print(test_ping(db_config['server']))
+    while True:
+        try:
+            BBDD.verificar()
+            BBDD_LISTA.set()
+            print("Base de datos disponible")
+            return
+        except Exception as e:
+            print("Base de datos no disponible aún:", e)
+        time.sleep(intervalo)
+
+threading.Thread(target=verificar_conectividad, name='conectividad', daemon=True).start()
+
+@app.route("/ready")
+def ready():
+    if BBDD_LISTA.is_set():
+        return {'listo': True, 'circuito': CIRCUITO.estado}
+    return {'listo': False, 'circuito': CIRCUITO.estado}, 503
+
 def get_available_slots():
+    """Devuelve (cupos, actualizado_a): actualizado_a es la hora de los cupos si vienen del respaldo, o None"""
+    tz = pytz.timezone('America/Santiago')
+    ahora = datetime.now(tz)
+    today = ahora.date()
     try:
-        tz = pytz.timezone('America/Santiago')
-        today = datetime.now(tz).strftime('%Y-%m-%d')
         print("Buscando horas para:", today)
-
-        conn_str = f"DRIVER={db_config['driver']};SERVER={db_config['server']};DATABASE={db_config['database']};UID={db_config['uid']};PWD={db_config['pwd']}"
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT TOP 3 fecha, hora, medico, especialidad
-        FROM Reservas
-        WHERE CONVERT(DATE, fecha) = ? AND disponible = 1
-        ORDER BY hora
-        """
-        cursor.execute(query, (today,))
-        rows = cursor.fetchall()
-
+        rows = DISPONIBILIDAD.obtener(today, limite=3)
         print("🔍 Cantidad:", rows)
-
-        cursor.close()
-        conn.close()
-        return rows
+        if today not in ULTIMOS_CUPOS:
+            ULTIMOS_CUPOS.clear()
+        ULTIMOS_CUPOS[today] = (ahora, rows)
+        return rows, None
+    except CircuitoAbierto as e:
+        print("Base de datos no disponible:", e)
     except Exception as e:
         print("Error:", e)
-        return []
+    if today in ULTIMOS_CUPOS:
+        actualizado_a, rows = ULTIMOS_CUPOS[today]
+        return rows, actualizado_a
+    return [], None
+
+def reservar_slot(slot, telefono):
+    """True si se tomó el cupo, False si alguien lo ganó antes, None si la base no respondió"""
+    try:
+        ganado = BBDD.reservar(slot[4], telefono)
+    except Exception as e:
+        print("Error al reservar:", e)
+        return None
+    # Gane o pierda, los cupos cacheados de ese día ya no son confiables
+    DISPONIBILIDAD.invalidar(slot[0])
+    return ganado
 
 def generar_google_calendar_link(fecha, hora, medico, especialidad):
     tz = pytz.timezone('America/Santiago')
@@ -91,25 +139,7 @@ def generar_google_calendar_link(fecha, hora, medico, especialidad):
 
 def buscar_respuesta_faq(user_input):
     try:
-        conn_str = f"DRIVER={db_config['driver']};SERVER={db_config['server']};DATABASE={db_config['database']};UID={db_config['uid']};PWD={db_config['pwd']}"
-        conn = pyodbc.connect(conn_str)
-        cursor = conn.cursor()
-
-        query = """
-        SELECT TOP 1 respuesta
-        FROM faq_hospital_dipreca
-        WHERE LOWER(pregunta) LIKE LOWER(?)
-        """
-        cursor.execute(query, (f"%{user_input}%",))
-        row = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
-
-        if row:
-            return row[0]
-        else:
-            return None
+        return BBDD.buscar_faq(user_input)
     except Exception as e:
         print("Error al buscar en FAQ:", e)
         return None
@@ -125,9 +155,14 @@ def whatsapp_reply():
 
     if estado == "inicio":
         if "agendar" in user_msg:
-            slots = get_available_slots()
+            slots, actualizado_a = get_available_slots()
             if slots:
                 texto = "📅 *Opciones de cita disponibles:*\n\n"
+                if actualizado_a:
+                    texto = (
+                        f"⚠️ No pudimos consultar la agenda en este momento; estas son las horas disponibles "
+                        f"a las {actualizado_a.strftime('%H:%M')} y podrían ya no estar libres.\n\n" + texto
+                    )
                 for i, row in enumerate(slots, 1):
                     texto += f"{i}. {row[1].strftime('%H:%M')} - {row[2]}\n"
                 texto += "\nEscribe el *número* de la opción que deseas reservar ✅"
@@ -149,14 +184,21 @@ def whatsapp_reply():
 
             if 0 <= seleccion < len(slots):
                 slot = slots[seleccion]
-                link = generar_google_calendar_link(slot[0], slot[1], slot[2], slot[3])
-
-                msg.body(
-                    f"✅ Cita con *{slot[2]}* agendada para el {slot[0].strftime('%Y-%m-%d')} a las {slot[1].strftime('%H:%M')}.\n\n"
-                    f"📲 Agrega al calendario aquí:\n{link}"
-                )
-
-                user_state[from_number]["estado"] = "confirmado"
+                reservado = reservar_slot(slot, from_number)
+                if reservado:
+                    link = generar_google_calendar_link(slot[0], slot[1], slot[2], slot[3])
+
+                    msg.body(
+                        f"✅ Cita con *{slot[2]}* agendada para el {slot[0].strftime('%Y-%m-%d')} a las {slot[1].strftime('%H:%M')}.\n\n"
+                        f"📲 Agrega al calendario aquí:\n{link}"
+                    )
+
+                    user_state[from_number]["estado"] = "confirmado"
+                elif reservado is None:
+                    msg.body("⛔ No pudimos confirmar tu reserva en este momento. Intenta más tarde.")
+                else:
+                    msg.body("⛔ Esa hora ya no está disponible. Escribe *'agendar'* para ver las opciones actualizadas.")
+                    user_state[from_number] = {"estado": "inicio"}
             else:
                 msg.body("❌ Opción no válida. Por favor escribe un número del 1 al 3.")
         else:
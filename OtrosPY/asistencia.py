@@ -1,5 +1,4 @@
 import pyodbc
-import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split, RandomizedSearchCV
 from sklearn.ensemble import RandomForestClassifier
@@ -10,6 +9,11 @@ import matplotlib.pyplot as plt
 from imblearn.combine import SMOTEENN
 from datetime import datetime
 
+from carga_masiva import reemplazar_tabla
+from cache_extractos import SIN_CONEXION, CacheExtracto
+from extraccion_asistencia import CONSULTA_ASISTENCIA, procesar_chunks
+from historial_asistencia import HistorialAsistencia
+
 hora_inicio = datetime.now()
 print(f"Hora de Inicio: {hora_inicio}")
 
@@ -23,38 +27,33 @@ conn_str = (
     'UID=cli_abas;'
     'PWD=cli_abas'
 )
-conn = pyodbc.connect(conn_str)
-
-query = """
-SELECT RUN, NOMBRE_DIA, FECHA_ADD, HORA, EDAD, COD_SEXO, COD_ASISTENCIA, ID_GRUPO, 
-       NOMBRE_GRUPO, NOMBRE_PRESTACION, CONFIRMACION_TELEFONICA    
-FROM JMC_PREDICCION_ASISTENCIA
-"""
+# Copia local en Parquet: a la base sólo se le piden las filas desde la última FECHA_ADD guardada (ver cache_extractos.py)
+extracto = CacheExtracto("asistencia", CONSULTA_ASISTENCIA)
+if SIN_CONEXION:
+    print(f"Sin conexión: se usa la copia local hasta {extracto.marca()}")
+else:
+    conn = pyodbc.connect(conn_str)
+    print(f"Filas nuevas desde SQL Server: {extracto.actualizar(conn)}")
+    conn.close()
 
-df = pd.read_sql(query, conn)
-conn.close()
+# Contadores por RUN incrementales: sólo se relee la ventana que la copia local pudo cambiar (ver historial_asistencia.py)
+historial_asistencia = HistorialAsistencia()
+historial_asistencia.sincronizar(extracto)
+historial = historial_asistencia.tabla()
 
-df["FECHA_ADD"] = pd.to_datetime(df["FECHA_ADD"])
-df["HORA"] = pd.to_datetime(df["HORA"], format="%H:%M:%S", errors="coerce").dt.hour
-df["ASISTENCIA"] = df["COD_ASISTENCIA"].map({"A": 1, "S": 1, "N": 0})
+# Lectura por partición con tipos compactos (ver extraccion_asistencia.py)
+df, _ = procesar_chunks(extracto.chunks(), con_historial=False)
 
 dias_semana = {"LUNES": 0, "MARTES": 1, "MIERCOLES": 2, "JUEVES": 3, "VIERNES": 4, "SABADO": 5, "DOMINGO": 6}
-df["DIA_NUM"] = df["NOMBRE_DIA"].map(dias_semana)
+df["DIA_NUM"] = df["NOMBRE_DIA"].map(dias_semana).astype("float32")
 
-df["NOMBRE_PRESTACION"] = df["NOMBRE_PRESTACION"].astype("category").cat.codes
-df["COD_SEXO"] = df["COD_SEXO"].map({"F": 1, "M": 0})
+df["NOMBRE_PRESTACION"] = df["NOMBRE_PRESTACION"].cat.codes
+df["COD_SEXO"] = df["COD_SEXO"].map({"F": 1, "M": 0}).astype("float32")
 
-historial = df.groupby("RUN").agg(
-    TOTAL_CITAS=("ASISTENCIA", "count"),
-    TOTAL_ASISTENCIAS=("ASISTENCIA", "sum")
-).reset_index()
-historial["PORCENTAJE_ASISTENCIA"] = historial["TOTAL_ASISTENCIAS"] / historial["TOTAL_CITAS"]
-
-df = df.merge(historial, on="RUN", how="left")
-
-df["TOTAL_CITAS"] = df["TOTAL_CITAS"].fillna(0)
-df["TOTAL_ASISTENCIAS"] = df["TOTAL_ASISTENCIAS"].fillna(0)
-df["PORCENTAJE_ASISTENCIA"] = df["PORCENTAJE_ASISTENCIA"].fillna(0)
+# map por RUN en vez de merge: agrega las columnas sin copiar todo el DataFrame; el historial guarda RUN como texto
+run = df["RUN"].astype(str)
+for columna in ("TOTAL_CITAS", "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"):
+    df[columna] = run.map(historial[columna]).fillna(0)
 
 features = ["EDAD", "COD_SEXO", "DIA_NUM", "HORA", "ID_GRUPO", "NOMBRE_PRESTACION",
              "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"]
@@ -96,37 +95,23 @@ df["PROBABILIDAD_ASISTENCIA"] = modelo_mejorado.predict_proba(X_imputed)[:, 1]
 
 probabilidades_df = df[["RUN", "PROBABILIDAD_ASISTENCIA", "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"]]
 
-conn = pyodbc.connect(conn_str)
-cursor = conn.cursor()
-
-cursor.execute("""
-IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='PROBABILIDAD_ASISTENCIA' AND xtype='U')
-BEGIN
-    CREATE TABLE PROBABILIDAD_ASISTENCIA (
-        RUN VARCHAR(50),
-        PROBABILIDAD_ASISTENCIA FLOAT,
-        TOTAL_ASISTENCIAS INT,
-        PORCENTAJE_ASISTENCIA FLOAT
-    )
-END
-""")
-
-conn.commit()
-
 probabilidades_df["PROBABILIDAD_ASISTENCIA"] = probabilidades_df["PROBABILIDAD_ASISTENCIA"].fillna(0)
 probabilidades_df = probabilidades_df.drop_duplicates(subset=["RUN"], keep="first")
 probabilidades_df["RUN"] = probabilidades_df["RUN"].astype(str)
 
-cursor.execute("DELETE FROM PROBABILIDAD_ASISTENCIA")
-conn.commit()
-
-for index, row in probabilidades_df.iterrows():
-    cursor.execute("INSERT INTO PROBABILIDAD_ASISTENCIA (RUN, PROBABILIDAD_ASISTENCIA, TOTAL_ASISTENCIAS, PORCENTAJE_ASISTENCIA) VALUES (?, ?, ?, ?)", 
-                   row["RUN"], row["PROBABILIDAD_ASISTENCIA"], row["TOTAL_ASISTENCIAS"], row["PORCENTAJE_ASISTENCIA"])
-
-conn.commit()
-cursor.close()
-conn.close()
+# Carga por lotes en una tabla auxiliar que reemplaza a la anterior al final (ver carga_masiva.py)
+if SIN_CONEXION:
+    print("Sin conexión: no se carga PROBABILIDAD_ASISTENCIA")
+else:
+    conn = pyodbc.connect(conn_str)
+    filas_cargadas = reemplazar_tabla(conn, "PROBABILIDAD_ASISTENCIA", probabilidades_df, {
+        "RUN": "VARCHAR(50)",
+        "PROBABILIDAD_ASISTENCIA": "FLOAT",
+        "TOTAL_ASISTENCIAS": "INT",
+        "PORCENTAJE_ASISTENCIA": "FLOAT",
+    })
+    conn.close()
+    print(f"Filas cargadas en PROBABILIDAD_ASISTENCIA: {filas_cargadas}")
 
 inasistencias_por_dia = df[df["ASISTENCIA"] == 0].groupby("NOMBRE_DIA").size().sort_values(ascending=False)
 plt.figure(figsize=(10, 6))
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+TTL_POR_DEFECTO = 5
+CAPACIDAD_POR_DEFECTO = 256
+
+
+class _Vuelo:
+    """Consulta en curso para una clave; los que llegan mientras tanto esperan su resultado"""
+
+    __slots__ = ('evento', 'resultado', 'error')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class CacheDisponibilidad:
+    """Cache read-through de cupos libres por (día, especialidad, límite) con TTL corto.
+
+    Si varias consultas fallan la cache a la vez para la misma clave, sólo la
+    primera va a la base de datos y las demás esperan su resultado
+    (single-flight). Al reservar un cupo se invalida su día; una consulta que
+    ya estaba en curso no vuelve a llenar la cache con datos anteriores a la
+    reserva.
+    """
+
+    def __init__(self, cargar, ttl=TTL_POR_DEFECTO, capacidad=CAPACIDAD_POR_DEFECTO):
+        self.cargar = cargar
+        self.ttl = ttl
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()  # clave -> (vence, cupos)
+        self.en_vuelo = {}
+        self.generaciones = {}  # día -> invalidaciones, para descartar llenados obsoletos
+        self.hits = 0
+        self.consultas = 0
+        self.coalescidas = 0
+        self.invalidaciones = 0
+        self.lock = threading.Lock()
+
+    def obtener(self, dia, especialidad=None, limite=3):
+        clave = (dia, especialidad, limite)
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.entradas.move_to_end(clave)
+                self.hits += 1
+                return entrada[1]
+            vuelo = self.en_vuelo.get(clave)
+            lider = vuelo is None
+            if lider:
+                vuelo = self.en_vuelo[clave] = _Vuelo()
+                generacion = self.generaciones.get(dia, 0)
+                self.consultas += 1
+            else:
+                self.coalescidas += 1
+
+        if not lider:
+            vuelo.evento.wait()
+            if vuelo.error is not None:
+                raise vuelo.error
+            return vuelo.resultado
+
+        try:
+            vuelo.resultado = tuple(self.cargar(dia, limite=limite, especialidad=especialidad))
+        except BaseException as e:
+            vuelo.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.en_vuelo[clave]
+                if vuelo.error is None and self.generaciones.get(dia, 0) == generacion:
+                    self.entradas[clave] = (time.monotonic() + self.ttl, vuelo.resultado)
+                    self.entradas.move_to_end(clave)
+                    if len(self.entradas) > self.capacidad:
+                        self.entradas.popitem(last=False)
+            vuelo.evento.set()
+        return vuelo.resultado
+
+    def invalidar(self, dia):
+        with self.lock:
+            for clave in [clave for clave in self.entradas if clave[0] == dia]:
+                del self.entradas[clave]
+            self.generaciones[dia] = self.generaciones.get(dia, 0) + 1
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'consultas': self.consultas,
+                'coalescidas': self.coalescidas,
+                'invalidaciones': self.invalidaciones,
+                'tamano': len(self.entradas),
+            }
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DIRECTORIO = os.environ.get('EXTRACTOS_DIR', 'extractos')
+TAMANO_CHUNK = int(os.environ.get('EXTRACTOS_TAMANO_CHUNK', 100000))
+# Días antes del día de la marca que se vuelven a pedir, por filas que llegan con FECHA_ADD atrasada
+SOLAPE_DIAS = int(os.environ.get('EXTRACTOS_SOLAPE_DIAS', 0))
+SIN_CONEXION = os.environ.get('EXTRACTOS_SIN_CONEXION') == '1'
+
+SIN_FECHA = 'sin_fecha'
+ARCHIVO_PARTICION = 'parte.parquet'
+ARCHIVO_MARCA = '_marca.json'
+DIRECTORIO_CARGA = '_carga'
+
+
+def _mes(fechas):
+    return fechas.dt.strftime('%Y-%m').fillna(SIN_FECHA)
+
+
+def _parametro_fecha(conexion, fecha):
+    # En SQLite las fechas son texto 'AAAA-MM-DD HH:MM:SS'; pyodbc recibe un datetime
+    if isinstance(conexion, sqlite3.Connection):
+        return fecha.strftime('%Y-%m-%d %H:%M:%S')
+    return fecha.to_pydatetime()
+
+
+def tiene_columna(conexion, tabla, columna):
+    """Si `tabla` tiene `columna`; permite verificar la columna de fecha antes de usar la copia incremental"""
+    cursor = conexion.cursor()
+    if isinstance(conexion, sqlite3.Connection):
+        cursor.execute("SELECT COUNT(*) FROM pragma_table_info(?) WHERE name = ?", (tabla, columna))
+    else:
+        cursor.execute(
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = ? AND COLUMN_NAME = ?", (tabla, columna)
+        )
+    encontrada = cursor.fetchone()[0] > 0
+    cursor.close()
+    return encontrada
+
+
+class CacheExtracto:
+    """Copia local en Parquet de una consulta, particionada por mes de `columna_fecha`.
+
+    Cada partición es un único archivo <directorio>/<nombre>/<columna>=AAAA-MM/parte.parquet.
+    actualizar() sólo pide a la base las filas desde el día de la última
+    fecha vista (la marca), reescribe las particiones de ese mes en adelante y
+    deja el resto como está; la lectura abre los archivos con memory_map.
+    Las filas con la fecha en NULL no caben en la marca: se vuelven a pedir en
+    cada actualización y reemplazan por completo la partición sin_fecha. Si una
+    de ellas recibe después una fecha anterior a la marca, sólo se recupera con
+    solape_dias suficiente o con actualizar(completo=True).
+    Si cambia el texto de la consulta la copia se descarta y se vuelve a bajar entera.
+    """
+
+    def __init__(self, nombre, consulta, columna_fecha='FECHA_ADD', directorio=None,
+                 tamano_chunk=TAMANO_CHUNK, solape_dias=SOLAPE_DIAS):
+        self.consulta = consulta
+        self.columna_fecha = columna_fecha
+        self.ruta = Path(directorio or DIRECTORIO) / nombre
+        self.tamano_chunk = tamano_chunk
+        self.solape_dias = solape_dias
+        self.huella = hashlib.sha1(' '.join(consulta.split()).encode('utf-8')).hexdigest()
+
+    def _leer_marca(self):
+        try:
+            with open(self.ruta / ARCHIVO_MARCA, encoding='utf-8') as archivo:
+                datos = json.load(archivo)
+        except (OSError, ValueError):
+            return None
+        if datos.get('consulta') != self.huella or not datos.get('marca'):
+            return None
+        return pd.Timestamp(datos['marca'])
+
+    def _guardar_marca(self, marca):
+        temporal = self.ruta / (ARCHIVO_MARCA + '.tmp')
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({'consulta': self.huella, 'marca': marca.isoformat() if marca is not None else None}, archivo)
+        os.replace(temporal, self.ruta / ARCHIVO_MARCA)
+
+    def marca(self):
+        """Última FECHA_ADD guardada, o None si no hay copia válida"""
+        return self._leer_marca()
+
+    def particiones(self):
+        """{mes: ruta del archivo} de las particiones existentes, ordenadas por mes"""
+        prefijo = self.columna_fecha + '='
+        if not self.ruta.exists():
+            return {}
+        return {
+            carpeta.name[len(prefijo):]: carpeta / ARCHIVO_PARTICION
+            for carpeta in sorted(self.ruta.iterdir())
+            if carpeta.name.startswith(prefijo) and (carpeta / ARCHIVO_PARTICION).exists()
+        }
+
+    def _bajar(self, conexion, corte, carga):
+        """Pide las filas desde `corte` (todas si es None) y las deja por chunk en carga/<mes>/"""
+        consulta, parametros = self.consulta, None
+        if corte is not None:
+            consulta = (
+                f"SELECT * FROM ({self.consulta}) AS extracto"
+                f" WHERE {self.columna_fecha} >= ? OR {self.columna_fecha} IS NULL"
+            )
+            parametros = [_parametro_fecha(conexion, corte)]
+        filas, marca = 0, None
+        for numero, chunk in enumerate(pd.read_sql(consulta, conexion, params=parametros, chunksize=self.tamano_chunk)):
+            chunk[self.columna_fecha] = pd.to_datetime(chunk[self.columna_fecha])
+            maximo = chunk[self.columna_fecha].max()
+            if pd.notna(maximo) and (marca is None or maximo > marca):
+                marca = maximo
+            for mes, parte in chunk.groupby(_mes(chunk[self.columna_fecha]), sort=False):
+                (carga / mes).mkdir(parents=True, exist_ok=True)
+                parte.to_parquet(carga / mes / f"{numero:06d}.parquet", index=False)
+            filas += len(chunk)
+        return filas, marca
+
+    def actualizar(self, conexion, completo=False):
+        """Trae las filas nuevas y las incorpora a la copia local; devuelve la cantidad de filas bajadas"""
+        marca = None if completo else self._leer_marca()
+        if marca is None and self.ruta.exists():
+            shutil.rmtree(self.ruta)
+        self.ruta.mkdir(parents=True, exist_ok=True)
+        corte = None if marca is None else marca.normalize() - pd.Timedelta(days=self.solape_dias)
+
+        carga = self.ruta / DIRECTORIO_CARGA
+        shutil.rmtree(carga, ignore_errors=True)
+        filas, marca_nueva = self._bajar(conexion, corte, carga)
+
+        existentes = self.particiones()
+        meses = {mes.name for mes in carga.iterdir()} if carga.exists() else set()
+        if corte is not None:
+            mes_corte = corte.strftime('%Y-%m')
+            meses.update(mes for mes in existentes if mes == SIN_FECHA or mes >= mes_corte)
+
+        for mes in sorted(meses):
+            partes = []
+            # sin_fecha se bajó entera otra vez: lo anterior se descarta
+            if mes in existentes and mes != SIN_FECHA:
+                anterior = pd.read_parquet(existentes[mes])
+                # Lo que está desde el corte se reemplaza por lo recién bajado
+                partes.append(anterior[~(anterior[self.columna_fecha] >= corte)])
+            if (carga / mes).exists():
+                partes.extend(pd.read_parquet(archivo) for archivo in sorted((carga / mes).iterdir()))
+            self._escribir_particion(mes, pd.concat(partes, ignore_index=True) if partes else pd.DataFrame())
+
+        shutil.rmtree(carga, ignore_errors=True)
+        if marca_nueva is None or (marca is not None and marca > marca_nueva):
+            marca_nueva = marca
+        self._guardar_marca(marca_nueva)
+        return filas
+
+    def _escribir_particion(self, mes, df):
+        carpeta = self.ruta / f"{self.columna_fecha}={mes}"
+        if df.empty:
+            shutil.rmtree(carpeta, ignore_errors=True)
+            return
+        carpeta.mkdir(exist_ok=True)
+        temporal = carpeta / (ARCHIVO_PARTICION + '.tmp')
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), temporal)
+        os.replace(temporal, carpeta / ARCHIVO_PARTICION)
+
+    def chunks(self, columnas=None, desde=None):
+        """DataFrames de al menos `tamano_chunk` filas (salvo el último), juntando particiones en orden de mes.
+
+        Con `desde` sólo se leen las particiones de ese mes en adelante y las filas con fecha >= desde.
+        """
+        particiones, filtro = self.particiones(), None
+        if desde is not None:
+            mes_desde = desde.strftime('%Y-%m')
+            particiones = {mes: archivo for mes, archivo in particiones.items() if mes != SIN_FECHA and mes >= mes_desde}
+            filtro = [(self.columna_fecha, '>=', desde.to_pydatetime())]
+        tablas, filas = [], 0
+        for archivo in particiones.values():
+            tablas.append(pq.read_table(archivo, columns=columnas, memory_map=True, filters=filtro))
+            filas += tablas[-1].num_rows
+            if filas >= self.tamano_chunk:
+                # permissive: una partición puede tener una columna toda nula o entera donde otra la tiene float
+                yield pa.concat_tables(tablas, promote_options='permissive').to_pandas()
+                tablas, filas = [], 0
+        if tablas:
+            yield pa.concat_tables(tablas, promote_options='permissive').to_pandas()
+
+    def sin_fecha(self, columnas=None):
+        """Las filas con la fecha en NULL (partición sin_fecha), o None si no hay"""
+        archivo = self.particiones().get(SIN_FECHA)
+        if archivo is None:
+            return None
+        return pq.read_table(archivo, columns=columnas, memory_map=True).to_pandas()
+
+    def leer(self, columnas=None):
+        """Toda la copia local en un solo DataFrame"""
+        partes = list(self.chunks(columnas))
+        if not partes:
+            return pd.DataFrame(columns=columnas)
+        return pd.concat(partes, ignore_index=True)
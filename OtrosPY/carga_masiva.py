@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+TAMANO_LOTE = int(os.environ.get('CARGA_TAMANO_LOTE', 10000))
+SUFIJO_CARGA = '__carga'
+
+
+def _filas(lote):
+    # pyodbc no acepta tipos numpy ni NaN: se pasan como int/float/str de Python y None
+    return lote.astype(object).where(lote.notna(), None).values.tolist()
+
+
+def _dialecto(conexion):
+    return 'sqlite' if isinstance(conexion, sqlite3.Connection) else 'sqlserver'
+
+
+def _existe(cursor, tabla, dialecto):
+    if dialecto == 'sqlite':
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+        return cursor.fetchone()[0] > 0
+    cursor.execute("SELECT OBJECT_ID(?, 'U')", (tabla,))
+    return cursor.fetchone()[0] is not None
+
+
+def _eliminar_si_existe(cursor, tabla, dialecto):
+    if dialecto == 'sqlite':
+        cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+    else:
+        cursor.execute(f"IF OBJECT_ID('{tabla}', 'U') IS NOT NULL DROP TABLE {tabla}")
+
+
+def reemplazar_tabla(conexion, tabla, df, columnas, tamano_lote=TAMANO_LOTE):
+    """Reemplaza todo el contenido de `tabla` por las filas de `df` sin dejarla nunca vacía.
+
+    `columnas` es un dict nombre -> tipo SQL en el orden de inserción. Las filas
+    se cargan por lotes de `tamano_lote` con executemany (fast_executemany en
+    pyodbc) en una tabla de carga. Al final, dentro de una sola transacción, se
+    vacía la tabla definitiva y se llena desde la de carga: quien lee ve la
+    versión anterior completa hasta el commit (o espera el commit en SQL Server)
+    y la nueva completa después. La tabla definitiva no se reemplaza, así que
+    conserva permisos, índices y restricciones; sólo si no existe la de carga
+    toma su nombre. Devuelve la cantidad de filas cargadas.
+    """
+    dialecto = _dialecto(conexion)
+    carga = tabla + SUFIJO_CARGA
+    nombres = list(columnas)
+    lista = ', '.join(nombres)
+    cursor = conexion.cursor()
+    if dialecto == 'sqlserver':
+        cursor.fast_executemany = True
+
+    _eliminar_si_existe(cursor, carga, dialecto)
+    definicion = ', '.join(f"{nombre} {tipo}" for nombre, tipo in columnas.items())
+    cursor.execute(f"CREATE TABLE {carga} ({definicion})")
+    conexion.commit()
+
+    insertar = f"INSERT INTO {carga} ({lista}) VALUES ({', '.join('?' * len(nombres))})"
+    datos = df[nombres]
+    for inicio in range(0, len(datos), tamano_lote):
+        cursor.executemany(insertar, _filas(datos.iloc[inicio:inicio + tamano_lote]))
+        conexion.commit()
+
+    if dialecto == 'sqlite' and not conexion.in_transaction:
+        # sqlite3 no abre transacción sola antes de DDL ni de DELETE con autocommit
+        cursor.execute("BEGIN")
+    if not _existe(cursor, tabla, dialecto):
+        if dialecto == 'sqlite':
+            cursor.execute(f"ALTER TABLE {carga} RENAME TO {tabla}")
+        else:
+            cursor.execute(f"EXEC sp_rename '{carga}', '{tabla}'")
+    else:
+        if dialecto == 'sqlite':
+            cursor.execute(f"DELETE FROM {tabla}")
+            cursor.execute(f"INSERT INTO {tabla} ({lista}) SELECT {lista} FROM {carga}")
+        else:
+            # TRUNCATE y TABLOCK dejan ambos pasos con registro mínimo en el log
+            cursor.execute(f"TRUNCATE TABLE {tabla}")
+            cursor.execute(f"INSERT INTO {tabla} WITH (TABLOCK) ({lista}) SELECT {lista} FROM {carga}")
+        cursor.execute(f"DROP TABLE {carga}")
+    conexion.commit()
+    cursor.close()
+    return len(datos)
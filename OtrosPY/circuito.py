@@ -0,0 +1,63 @@
+import threading
+import time
+
+FALLOS_POR_DEFECTO = 3
+ESPERA_POR_DEFECTO = 30
+
+
+class CircuitoAbierto(Exception):
+    pass
+
+
+class Cortocircuito:
+    """Corta las llamadas a un backend que viene fallando para no esperar su timeout en cada request.
+
+    cerrado: las llamadas pasan; tras `fallos_maximos` fallos seguidos se abre.
+    abierto: toda llamada lanza CircuitoAbierto sin tocar el backend durante `espera` segundos.
+    semiabierto: pasada la espera se deja pasar una sola llamada de prueba; si
+    resulta se cierra, si falla se abre otra vez. Las demás siguen fallando al
+    tiro mientras la prueba está en curso.
+    """
+
+    def __init__(self, fallos_maximos=FALLOS_POR_DEFECTO, espera=ESPERA_POR_DEFECTO):
+        self.fallos_maximos = fallos_maximos
+        self.espera = espera
+        self.estado = 'cerrado'
+        self.fallos = 0
+        self.abierto_desde = 0.0
+        self.probando = False
+        self.lock = threading.Lock()
+
+    def llamar(self, funcion, *args, **kwargs):
+        with self.lock:
+            if self.estado == 'abierto':
+                restante = self.espera - (time.monotonic() - self.abierto_desde)
+                if restante > 0:
+                    raise CircuitoAbierto(f"Circuito abierto, próximo intento en {restante:.0f}s")
+                self.estado = 'semiabierto'
+            prueba = self.estado == 'semiabierto'
+            if prueba:
+                if self.probando:
+                    raise CircuitoAbierto("Circuito semiabierto, prueba en curso")
+                self.probando = True
+
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception:
+            with self.lock:
+                self.fallos += 1
+                if prueba or self.fallos >= self.fallos_maximos:
+                    self.estado = 'abierto'
+                    self.abierto_desde = time.monotonic()
+            raise
+        else:
+            with self.lock:
+                self.fallos = 0
+                self.estado = 'cerrado'
+            return resultado
+        finally:
+            # También ante KeyboardInterrupt, SystemExit o un timeout del worker: si la
+            # prueba quedara marcada en curso el circuito rechazaría todo para siempre
+            if prueba:
+                with self.lock:
+                    self.probando = False
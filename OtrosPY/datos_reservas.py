@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as hora_del_dia, timedelta
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+logger = logging.getLogger(__name__)
+
+
+class PoolConexiones:
+    """Pool acotado de conexiones DB-API reutilizables entre requests.
+
+    Como máximo `maximo` conexiones abiertas; quien pide una con todas en uso
+    espera hasta `espera` segundos y luego recibe TimeoutError. Las conexiones
+    ociosas por más de `verificar_despues` segundos se prueban con SELECT 1
+    antes de entregarlas y, si fallan, se reemplazan por una nueva. Al
+    devolverla se hace rollback de lo que haya quedado sin commit.
+    """
+
+    def __init__(self, conectar, maximo=10, espera=5, verificar_despues=30):
+        self.conectar = conectar
+        self.maximo = maximo
+        self.espera = espera
+        self.verificar_despues = verificar_despues
+        self.libres = []  # (conexion, ultimo_uso); se reutiliza la más reciente
+        self.abiertas = 0
+        self.condicion = threading.Condition()
+
+    @contextmanager
+    def conexion(self):
+        conexion = self._tomar()
+        try:
+            yield conexion
+        except Exception:
+            # Tras un error no se sabe en qué estado quedó; se cierra en vez de devolverla
+            self._descartar(conexion)
+            raise
+        else:
+            # Lo que quien la usó no confirmó se descarta: una transacción abierta en una
+            # conexión ociosa retendría bloqueos y el siguiente la heredaría a medias
+            try:
+                conexion.rollback()
+            except Exception:
+                self._descartar(conexion)
+                return
+            with self.condicion:
+                self.libres.append((conexion, time.monotonic()))
+                self.condicion.notify()
+
+    def _tomar(self):
+        limite = time.monotonic() + self.espera
+        with self.condicion:
+            while not self.libres and self.abiertas >= self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise TimeoutError(f"Sin conexiones libres tras {self.espera}s ({self.maximo} en uso)")
+                self.condicion.wait(restante)
+            if self.libres:
+                conexion, ultimo_uso = self.libres.pop()
+            else:
+                self.abiertas += 1
+                conexion, ultimo_uso = None, None
+        if conexion is not None:
+            if time.monotonic() - ultimo_uso < self.verificar_despues or self._sana(conexion):
+                return conexion
+            self._cerrar(conexion)
+        try:
+            return self.conectar()
+        except Exception:
+            self._liberar_cupo()
+            raise
+
+    @staticmethod
+    def _sana(conexion):
+        try:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _cerrar(conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def _liberar_cupo(self):
+        with self.condicion:
+            self.abiertas -= 1
+            self.condicion.notify()
+
+    def _descartar(self, conexion):
+        self._cerrar(conexion)
+        self._liberar_cupo()
+
+    def cerrar(self):
+        with self.condicion:
+            libres, self.libres = self.libres, []
+            self.abiertas -= len(libres)
+        for conexion, _ in libres:
+            self._cerrar(conexion)
+
+
+# Rango [día, día siguiente) en vez de CONVERT(DATE, fecha) = ?: así SQL Server puede
+# usar un índice sobre fecha, p. ej.
+#   CREATE INDEX IX_Reservas_fecha ON Reservas (fecha) INCLUDE (hora, medico, especialidad, disponible)
+# Los recordatorios necesitan saber a quién escribir: al reservar se guarda el número del paciente
+#   ALTER TABLE Reservas ADD telefono VARCHAR(32) NULL
+# Mientras la columna no exista se reserva sin guardar el número (ver RepositorioReservas.con_telefono)
+CONSULTAS = {
+    'sqlserver': {
+        'cupos': "SELECT TOP ({limite}) fecha, hora, medico, especialidad, id FROM Reservas"
+                 " WHERE fecha >= ? AND fecha < ? AND disponible = 1{filtro} ORDER BY hora",
+        'reservados': "SELECT id, fecha, hora, medico, especialidad, telefono FROM Reservas"
+                      " WHERE fecha >= ? AND fecha < ? AND disponible = 0 AND telefono IS NOT NULL ORDER BY hora",
+        'reservar': "UPDATE Reservas SET disponible = 0, telefono = ? WHERE id = ? AND disponible = 1",
+        'reservar_sin_telefono': "UPDATE Reservas SET disponible = 0 WHERE id = ? AND disponible = 1",
+        'columna_telefono': "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS"
+                            " WHERE TABLE_NAME = 'Reservas' AND COLUMN_NAME = 'telefono'",
+        'faq': "SELECT TOP 1 respuesta FROM faq_hospital_dipreca WHERE LOWER(pregunta) LIKE LOWER(?)",
+    },
+    'sqlite': {
+        'cupos': "SELECT fecha, hora, medico, especialidad, id FROM Reservas"
+                 " WHERE fecha >= ? AND fecha < ? AND disponible = 1{filtro} ORDER BY hora LIMIT {limite}",
+        'reservados': "SELECT id, fecha, hora, medico, especialidad, telefono FROM Reservas"
+                      " WHERE fecha >= ? AND fecha < ? AND disponible = 0 AND telefono IS NOT NULL ORDER BY hora",
+        'reservar': "UPDATE Reservas SET disponible = 0, telefono = ? WHERE id = ? AND disponible = 1",
+        'reservar_sin_telefono': "UPDATE Reservas SET disponible = 0 WHERE id = ? AND disponible = 1",
+        'columna_telefono': "SELECT COUNT(*) FROM pragma_table_info('Reservas') WHERE name = 'telefono'",
+        'faq': "SELECT respuesta FROM faq_hospital_dipreca WHERE LOWER(pregunta) LIKE LOWER(?) LIMIT 1",
+    },
+}
+
+
+def _fecha(valor):
+    # En SQL Server fecha es DATETIME y pyodbc entrega datetime, que nunca es igual a un date
+    if isinstance(valor, datetime):
+        return valor.date()
+    return date.fromisoformat(valor[:10]) if isinstance(valor, str) else valor
+
+
+def _hora(valor):
+    return hora_del_dia.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _rango_dia(dia):
+    dia = _fecha(dia)
+    return [dia.isoformat(), (dia + timedelta(days=1)).isoformat()]
+
+
+class RepositorioReservas:
+    """Consultas del bot sobre Reservas y faq_hospital_dipreca, iguales para SQL Server y SQLite.
+
+    Los cupos se devuelven como tuplas (fecha, hora, medico, especialidad, id)
+    con fecha y hora como objetos date/time en ambos backends.
+    """
+
+    def __init__(self, pool, dialecto):
+        self.pool = pool
+        self.consultas = CONSULTAS[dialecto]
+        self._con_telefono = None
+
+    def con_telefono(self, conexion):
+        """Si Reservas ya tiene la columna telefono; se consulta una vez, con la primera conexión que se use"""
+        if self._con_telefono is None:
+            cursor = conexion.cursor()
+            cursor.execute(self.consultas['columna_telefono'])
+            self._con_telefono = cursor.fetchone()[0] > 0
+            cursor.close()
+            if not self._con_telefono:
+                logger.warning("Reservas no tiene la columna telefono: se reserva sin guardar el número")
+        return self._con_telefono
+
+    def cupos_disponibles(self, dia, limite=3, especialidad=None):
+        parametros = _rango_dia(dia)
+        filtro = ''
+        if especialidad:
+            filtro = ' AND especialidad = ?'
+            parametros.append(especialidad)
+        consulta = self.consultas['cupos'].format(limite=int(limite), filtro=filtro)
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            cursor.execute(consulta, parametros)
+            filas = cursor.fetchall()
+            cursor.close()
+        return [(_fecha(f[0]), _hora(f[1]), f[2], f[3], f[4]) for f in filas]
+
+    def cupos_reservados(self, dia):
+        """Citas tomadas del día con el número de quien reservó: (id, fecha, hora, medico, especialidad, telefono)"""
+        with self.pool.conexion() as conexion:
+            if not self.con_telefono(conexion):
+                raise RuntimeError("Reservas no tiene la columna telefono (ALTER TABLE en datos_reservas.py)")
+            cursor = conexion.cursor()
+            cursor.execute(self.consultas['reservados'], _rango_dia(dia))
+            filas = cursor.fetchall()
+            cursor.close()
+        return [(f[0], _fecha(f[1]), _hora(f[2]), f[3], f[4], f[5]) for f in filas]
+
+    def reservar(self, cupo_id, telefono=None):
+        """Compare-and-set de disponible 1 -> 0; True sólo para quien gana el cupo"""
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            if self.con_telefono(conexion):
+                cursor.execute(self.consultas['reservar'], (telefono, cupo_id))
+            else:
+                cursor.execute(self.consultas['reservar_sin_telefono'], (cupo_id,))
+            ganado = cursor.rowcount == 1
+            cursor.close()
+            conexion.commit()
+        return ganado
+
+    def verificar(self):
+        """Lanza excepción si no se puede obtener una conexión sana"""
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+
+    def buscar_faq(self, texto):
+        with self.pool.conexion() as conexion:
+            cursor = conexion.cursor()
+            cursor.execute(self.consultas['faq'], (f"%{texto}%",))
+            fila = cursor.fetchone()
+            cursor.close()
+        return fila[0] if fila else None
+
+
+def crear_pool_sqlserver(config, maximo=10, espera=5, timeout_conexion=5):
+    import pyodbc
+
+    conn_str = (
+        f"DRIVER={config['driver']};SERVER={config['server']};DATABASE={config['database']};"
+        f"UID={config['uid']};PWD={config['pwd']}"
+    )
+
+    def conectar():
+        conexion = pyodbc.connect(conn_str, timeout=timeout_conexion)
+        # El mismo límite para cada consulta: un servidor colgado falla en vez de bloquear el worker
+        conexion.timeout = timeout_conexion
+        return conexion
+
+    return PoolConexiones(conectar, maximo, espera)
+
+
+def crear_bbdd_sqlite(ruta, citas=DATA_DIR / 'citas.json', faqs=DATA_DIR / 'faqs.json'):
+    """Crea (si no existe) una copia local de Reservas y faq_hospital_dipreca sembrada desde los JSON de data/"""
+    conexion = sqlite3.connect(str(ruta), isolation_level=None)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS Reservas ("
+        " id INTEGER PRIMARY KEY, fecha TEXT NOT NULL, hora TEXT NOT NULL,"
+        " medico TEXT, especialidad TEXT, disponible INTEGER NOT NULL, telefono TEXT)"
+    )
+    if 'telefono' not in [columna[1] for columna in conexion.execute("PRAGMA table_info(Reservas)")]:
+        conexion.execute("ALTER TABLE Reservas ADD COLUMN telefono TEXT")
+    conexion.execute("CREATE INDEX IF NOT EXISTS ix_reservas_fecha ON Reservas (disponible, fecha, hora)")
+    conexion.execute(
+        "CREATE TABLE IF NOT EXISTS faq_hospital_dipreca (id INTEGER PRIMARY KEY, pregunta TEXT, respuesta TEXT)"
+    )
+    with conexion:
+        conexion.execute("BEGIN IMMEDIATE")
+        if citas and Path(citas).exists():
+            with open(citas, 'r', encoding='utf-8') as f:
+                conexion.executemany(
+                    "INSERT OR IGNORE INTO Reservas (id, fecha, hora, medico, especialidad, disponible)"
+                    " VALUES (:id, :fecha, :hora, :medico, :especialidad, :disponible)",
+                    json.load(f)['citas'],
+                )
+        if faqs and Path(faqs).exists():
+            with open(faqs, 'r', encoding='utf-8') as f:
+                conexion.executemany(
+                    "INSERT OR IGNORE INTO faq_hospital_dipreca (id, pregunta, respuesta) VALUES (?, ?, ?)",
+                    ((faq['id'], faq['pregunta'], faq['respuesta']) for faq in json.load(f)['faqs']),
+                )
+    conexion.close()
+
+
+def crear_pool_sqlite(ruta, maximo=10, espera=5):
+    def conectar():
+        conexion = sqlite3.connect(str(ruta), timeout=10, isolation_level=None, check_same_thread=False)
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        return conexion
+
+    return PoolConexiones(conectar, maximo, espera)
+
+
+def config_sqlserver_desde_entorno():
+    """Conexión a SQL Server desde BBDD_SERVIDOR, BBDD_BASE, BBDD_USUARIO, BBDD_CLAVE y BBDD_DRIVER"""
+    faltantes = [v for v in ('BBDD_SERVIDOR', 'BBDD_BASE', 'BBDD_USUARIO', 'BBDD_CLAVE') if v not in os.environ]
+    if faltantes:
+        raise KeyError(f"Faltan variables de entorno para SQL Server: {', '.join(faltantes)}")
+    return {
+        'driver': os.environ.get('BBDD_DRIVER', '{ODBC Driver 17 for SQL Server}'),
+        'server': os.environ['BBDD_SERVIDOR'],
+        'database': os.environ['BBDD_BASE'],
+        'uid': os.environ['BBDD_USUARIO'],
+        'pwd': os.environ['BBDD_CLAVE'],
+    }
+
+
+def crear_repositorio(config_sqlserver=None, backend=None):
+    """BBDD_BACKEND=sqlserver (por defecto) o sqlite; BBDD_RUTA es el archivo local sembrado desde data/
+
+    Sin config_sqlserver la conexión se toma de config_sqlserver_desde_entorno().
+    """
+    backend = backend or os.environ.get('BBDD_BACKEND', 'sqlserver')
+    maximo = int(os.environ.get('BBDD_POOL_MAXIMO', 10))
+    espera = float(os.environ.get('BBDD_POOL_ESPERA', 5))
+    if backend == 'sqlite':
+        ruta = os.environ.get('BBDD_RUTA', 'bbdd_local.db')
+        crear_bbdd_sqlite(ruta)
+        return RepositorioReservas(crear_pool_sqlite(ruta, maximo, espera), 'sqlite')
+    if backend != 'sqlserver':
+        raise ValueError(f"Backend de base de datos desconocido: {backend}")
+    pool = crear_pool_sqlserver(
+        config_sqlserver or config_sqlserver_desde_entorno(), maximo, espera, timeout_conexion=int(os.environ.get('BBDD_TIMEOUT', 5))
+    )
+    return RepositorioReservas(pool, 'sqlserver')
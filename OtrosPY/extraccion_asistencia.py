@@ -0,0 +1,104 @@
+import os
+
+import pandas as pd
+
+TAMANO_CHUNK = int(os.environ.get('EXTRACCION_TAMANO_CHUNK', 100000))
+
+CONSULTA_ASISTENCIA = """
+SELECT RUN, NOMBRE_DIA, FECHA_ADD, HORA, EDAD, COD_SEXO, COD_ASISTENCIA, ID_GRUPO,
+       NOMBRE_GRUPO, NOMBRE_PRESTACION, CONFIRMACION_TELEFONICA
+FROM JMC_PREDICCION_ASISTENCIA
+"""
+
+DIAS_SEMANA = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO"]
+
+# Categorías conocidas de antemano: todos los chunks comparten el mismo dtype
+CATEGORIAS_FIJAS = {
+    "NOMBRE_DIA": pd.CategoricalDtype(DIAS_SEMANA),
+    "COD_SEXO": pd.CategoricalDtype(["F", "M"]),
+    "COD_ASISTENCIA": pd.CategoricalDtype(["A", "S", "N"]),
+}
+# Categorías que sólo se conocen al leer: se unen al final, ordenadas como haría astype("category")
+CATEGORIAS_ABIERTAS = ("NOMBRE_GRUPO", "NOMBRE_PRESTACION")
+
+ASISTIO = {"A": 1, "S": 1, "N": 0}
+
+
+def preparar_chunk(chunk):
+    """Convierte un chunk recién leído a tipos compactos y agrega ASISTENCIA.
+
+    HORA queda como la hora del día (float32, NaN si no se pudo leer) y
+    ASISTENCIA como 1/0 (NaN para códigos que no son A, S ni N), igual que
+    en asistencia.py.
+    """
+    chunk["FECHA_ADD"] = pd.to_datetime(chunk["FECHA_ADD"])
+    chunk["HORA"] = pd.to_datetime(chunk["HORA"], format="%H:%M:%S", errors="coerce").dt.hour.astype("float32")
+    chunk["ASISTENCIA"] = chunk["COD_ASISTENCIA"].map(ASISTIO).astype("float32")
+    for columna, dtype in CATEGORIAS_FIJAS.items():
+        chunk[columna] = chunk[columna].astype(dtype)
+    for columna in CATEGORIAS_ABIERTAS:
+        chunk[columna] = chunk[columna].astype("category")
+    for columna in chunk.select_dtypes("integer").columns:
+        chunk[columna] = pd.to_numeric(chunk[columna], downcast="integer")
+    for columna in chunk.select_dtypes("float").columns:
+        chunk[columna] = pd.to_numeric(chunk[columna], downcast="float")
+    return chunk
+
+
+def acumular_historial(acumulado, chunk):
+    """Suma al acumulado por RUN las citas (ASISTENCIA no nula) y asistencias del chunk"""
+    parcial = chunk.groupby("RUN", sort=False)["ASISTENCIA"].agg(["count", "sum"])
+    if acumulado is None:
+        return parcial
+    return acumulado.add(parcial, fill_value=0)
+
+
+def cerrar_historial(acumulado):
+    """TOTAL_CITAS, TOTAL_ASISTENCIAS y PORCENTAJE_ASISTENCIA indexados por RUN"""
+    if acumulado is None:
+        acumulado = pd.DataFrame({"count": [], "sum": []})
+    historial = pd.DataFrame({
+        "TOTAL_CITAS": acumulado["count"].astype("int32"),
+        "TOTAL_ASISTENCIAS": acumulado["sum"].astype("int32"),
+    })
+    historial["PORCENTAJE_ASISTENCIA"] = historial["TOTAL_ASISTENCIAS"] / historial["TOTAL_CITAS"]
+    historial.index.name = "RUN"
+    return historial
+
+
+def unir_chunks(partes):
+    """Concatena los chunks igualando antes las categorías abiertas para que no vuelvan a object"""
+    for columna in CATEGORIAS_ABIERTAS:
+        categorias = set()
+        for parte in partes:
+            categorias.update(parte[columna].cat.categories)
+        categorias = sorted(categorias)
+        for parte in partes:
+            parte[columna] = parte[columna].cat.set_categories(categorias)
+    return pd.concat(partes, ignore_index=True)
+
+
+def procesar_chunks(chunks, con_historial=True):
+    """Compacta y une chunks crudos del extracto; devuelve (df, historial por RUN).
+
+    Cada chunk se compacta apenas llega, así que el pico de memoria es el de
+    un chunk con los tipos por defecto más el extracto ya compactado; el
+    historial se va sumando en el mismo recorrido. Con con_historial=False no
+    se suma y el historial devuelto es None (viene de historial_asistencia.py).
+    """
+    partes = []
+    acumulado = None
+    for chunk in chunks:
+        chunk = preparar_chunk(chunk)
+        if con_historial:
+            acumulado = acumular_historial(acumulado, chunk)
+        partes.append(chunk)
+    historial = cerrar_historial(acumulado) if con_historial else None
+    if not partes:
+        return pd.DataFrame(), historial
+    return unir_chunks(partes), historial
+
+
+def leer_asistencia(conexion, tamano_chunk=TAMANO_CHUNK, consulta=CONSULTA_ASISTENCIA):
+    """Lee el extracto desde la base por chunks de `tamano_chunk` filas y devuelve (df, historial por RUN)"""
+    return procesar_chunks(pd.read_sql(consulta, conexion, chunksize=tamano_chunk))
@@ -0,0 +1,182 @@
+import itertools
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from extraccion_asistencia import ASISTIO, acumular_historial, cerrar_historial
+
+RUTA = os.environ.get('HISTORIAL_RUTA', 'historial_asistencia.db')
+
+TOTAL_CITAS = "CITAS_CERRADAS + CITAS_VENTANA + CITAS_SIN_FECHA"
+TOTAL_ASISTENCIAS = "ASISTENCIAS_CERRADAS + ASISTENCIAS_VENTANA + ASISTENCIAS_SIN_FECHA"
+
+
+class HistorialAsistencia:
+    """TOTAL_CITAS, TOTAL_ASISTENCIAS y PORCENTAJE_ASISTENCIA por RUN en SQLite, al día con una CacheExtracto.
+
+    Por cada RUN se guarda aparte lo contado en filas anteriores al corte
+    (cerradas), en la ventana desde el corte, que es lo único que la copia
+    local puede volver a reemplazar en su próxima actualización, y en filas sin
+    fecha, que la copia vuelve a pedir enteras cada vez. sincronizar() relee
+    sólo la ventana y las filas sin fecha: suma a las cerradas lo que ya quedó
+    antes del corte nuevo y reemplaza lo demás, todo en una transacción.
+    """
+
+    def __init__(self, ruta=None):
+        self.conexion = sqlite3.connect(str(ruta or RUTA), timeout=10, isolation_level=None, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS historial ("
+            " RUN TEXT PRIMARY KEY,"
+            " CITAS_CERRADAS INTEGER NOT NULL DEFAULT 0, ASISTENCIAS_CERRADAS INTEGER NOT NULL DEFAULT 0,"
+            " CITAS_VENTANA INTEGER NOT NULL DEFAULT 0, ASISTENCIAS_VENTANA INTEGER NOT NULL DEFAULT 0,"
+            " CITAS_SIN_FECHA INTEGER NOT NULL DEFAULT 0, ASISTENCIAS_SIN_FECHA INTEGER NOT NULL DEFAULT 0"
+            ") WITHOUT ROWID"
+        )
+        self.conexion.execute("CREATE TABLE IF NOT EXISTS estado (clave TEXT PRIMARY KEY, valor TEXT)")
+        self._migrar()
+        # Para vaciar la ventana sin recorrer toda la tabla (ASISTENCIAS_VENTANA <= CITAS_VENTANA)
+        self.conexion.execute(
+            "CREATE INDEX IF NOT EXISTS ix_historial_ventana ON historial (RUN) WHERE CITAS_VENTANA > 0"
+        )
+        self.conexion.execute(
+            "CREATE INDEX IF NOT EXISTS ix_historial_sin_fecha ON historial (RUN) WHERE CITAS_SIN_FECHA > 0"
+        )
+        self.lock = threading.Lock()
+
+    def _migrar(self):
+        """Agrega los contadores sin fecha a un archivo anterior y fuerza reconstruirlo en la próxima sincronización"""
+        self.conexion.execute("BEGIN IMMEDIATE")
+        columnas = [fila[1] for fila in self.conexion.execute("PRAGMA table_info(historial)")]
+        if 'CITAS_SIN_FECHA' not in columnas:
+            self.conexion.execute("ALTER TABLE historial ADD COLUMN CITAS_SIN_FECHA INTEGER NOT NULL DEFAULT 0")
+            self.conexion.execute("ALTER TABLE historial ADD COLUMN ASISTENCIAS_SIN_FECHA INTEGER NOT NULL DEFAULT 0")
+            # Las filas sin fecha pudieron quedar sumadas en las cerradas
+            self.conexion.execute("DELETE FROM estado")
+        self.conexion.execute("COMMIT")
+
+    def _estado(self):
+        with self.lock:
+            return dict(self.conexion.execute("SELECT clave, valor FROM estado"))
+
+    def sincronizar(self, extracto):
+        """Lleva los contadores a lo que hay en la copia local `extracto`; devuelve las filas leídas.
+
+        Se reconstruye desde cero si la copia es de otra consulta, volvió atrás o
+        cambió su solape (podría tocar filas anteriores al corte guardado).
+        """
+        marca = extracto.marca()
+        estado = self._estado()
+        completo = (
+            marca is None
+            or estado.get('consulta') != extracto.huella
+            or estado.get('solape') != str(extracto.solape_dias)
+            or 'marca' not in estado
+            or marca < pd.Timestamp(estado['marca'])
+        )
+        desde = None if completo else pd.Timestamp(estado['corte'])
+        corte = None if marca is None else marca.normalize() - pd.Timedelta(days=extracto.solape_dias)
+
+        cerradas, ventana, sin_fecha, filas = None, None, None, 0
+        columnas = ['RUN', 'COD_ASISTENCIA', extracto.columna_fecha]
+        chunks = extracto.chunks(columnas, desde=desde)
+        if desde is not None:
+            # chunks(desde=...) no incluye las filas sin fecha; se cuentan siempre de nuevo
+            chunks = itertools.chain(chunks, [extracto.sin_fecha(columnas)])
+        for chunk in chunks:
+            if chunk is None:
+                continue
+            chunk['ASISTENCIA'] = chunk['COD_ASISTENCIA'].map(ASISTIO)
+            fechas = chunk[extracto.columna_fecha]
+            sin = fechas.isna()
+            en_ventana = fechas >= corte if corte is not None else ~sin
+            cerradas = acumular_historial(cerradas, chunk[~sin & ~en_ventana])
+            ventana = acumular_historial(ventana, chunk[~sin & en_ventana])
+            sin_fecha = acumular_historial(sin_fecha, chunk[sin])
+            filas += len(chunk)
+
+        with self.lock:
+            self.conexion.execute("BEGIN IMMEDIATE")
+            try:
+                if completo:
+                    self.conexion.execute("DELETE FROM historial")
+                else:
+                    self.conexion.execute(
+                        "UPDATE historial SET CITAS_VENTANA = 0, ASISTENCIAS_VENTANA = 0 WHERE CITAS_VENTANA > 0"
+                    )
+                    self.conexion.execute(
+                        "UPDATE historial SET CITAS_SIN_FECHA = 0, ASISTENCIAS_SIN_FECHA = 0 WHERE CITAS_SIN_FECHA > 0"
+                    )
+                if cerradas is not None and len(cerradas):
+                    self.conexion.executemany(
+                        "INSERT INTO historial (RUN, CITAS_CERRADAS, ASISTENCIAS_CERRADAS) VALUES (?, ?, ?)"
+                        " ON CONFLICT (RUN) DO UPDATE SET"
+                        " CITAS_CERRADAS = CITAS_CERRADAS + excluded.CITAS_CERRADAS,"
+                        " ASISTENCIAS_CERRADAS = ASISTENCIAS_CERRADAS + excluded.ASISTENCIAS_CERRADAS",
+                        _contadores(cerradas),
+                    )
+                if ventana is not None and len(ventana):
+                    self.conexion.executemany(
+                        "INSERT INTO historial (RUN, CITAS_VENTANA, ASISTENCIAS_VENTANA) VALUES (?, ?, ?)"
+                        " ON CONFLICT (RUN) DO UPDATE SET"
+                        " CITAS_VENTANA = excluded.CITAS_VENTANA, ASISTENCIAS_VENTANA = excluded.ASISTENCIAS_VENTANA",
+                        _contadores(ventana),
+                    )
+                if sin_fecha is not None and len(sin_fecha):
+                    self.conexion.executemany(
+                        "INSERT INTO historial (RUN, CITAS_SIN_FECHA, ASISTENCIAS_SIN_FECHA) VALUES (?, ?, ?)"
+                        " ON CONFLICT (RUN) DO UPDATE SET"
+                        " CITAS_SIN_FECHA = excluded.CITAS_SIN_FECHA,"
+                        " ASISTENCIAS_SIN_FECHA = excluded.ASISTENCIAS_SIN_FECHA",
+                        _contadores(sin_fecha),
+                    )
+                self.conexion.executemany("INSERT OR REPLACE INTO estado (clave, valor) VALUES (?, ?)", [
+                    ('consulta', extracto.huella),
+                    ('solape', str(extracto.solape_dias)),
+                    ('marca', None if marca is None else marca.isoformat()),
+                    ('corte', None if corte is None else corte.isoformat()),
+                ])
+                if marca is None:
+                    self.conexion.execute("DELETE FROM estado WHERE clave IN ('marca', 'corte')")
+                self.conexion.execute("COMMIT")
+            except Exception:
+                self.conexion.execute("ROLLBACK")
+                raise
+        return filas
+
+    def obtener(self, run):
+        """{TOTAL_CITAS, TOTAL_ASISTENCIAS, PORCENTAJE_ASISTENCIA} del RUN, o None si no tiene citas registradas"""
+        with self.lock:
+            fila = self.conexion.execute(
+                f"SELECT {TOTAL_CITAS}, {TOTAL_ASISTENCIAS} FROM historial WHERE RUN = ?",
+                (str(run),),
+            ).fetchone()
+        if fila is None:
+            return None
+        citas, asistencias = fila
+        return {
+            'TOTAL_CITAS': citas,
+            'TOTAL_ASISTENCIAS': asistencias,
+            'PORCENTAJE_ASISTENCIA': asistencias / citas if citas else None,
+        }
+
+    def tabla(self):
+        """Todo el historial indexado por RUN (texto), con las mismas columnas que cerrar_historial()"""
+        with self.lock:
+            acumulado = pd.read_sql(
+                f"SELECT RUN, {TOTAL_CITAS} AS count, {TOTAL_ASISTENCIAS} AS sum FROM historial",
+                self.conexion, index_col='RUN',
+            )
+        return cerrar_historial(acumulado)
+
+
+def _contadores(acumulado):
+    # RUN como texto, igual que en PROBABILIDAD_ASISTENCIA
+    return zip(
+        acumulado.index.astype(str),
+        acumulado['count'].astype(int).tolist(),
+        acumulado['sum'].astype(int).tolist(),
+    )
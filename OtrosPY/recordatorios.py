@@ -0,0 +1,285 @@
+"""Recordatorio masivo por WhatsApp de las citas del día siguiente.
+
+Uso:
+    python recordatorios.py [--dia 2025-04-17] [--concurrencia 8] [--por-segundo 20] [--salida recordatorios.db]
+
+Las citas del día se leen en una sola consulta y cada recordatorio se anota en
+una bandeja de salida SQLite antes de enviarse. La clave de cada mensaje es la
+cita, así que volver a correr el script (o retomarlo tras una caída) no repite
+los ya enviados. Un mensaje que quedó "enviando" cuando el proceso murió no se
+sabe si llegó: se marca como incierto y no se reintenta solo.
+
+Credenciales por TWILIO_ACCOUNT_SID / TWILIO_AUTH_TOKEN; TWILIO_API_URL permite
+apuntar a un Twilio falso para pruebas. La base se configura con las variables
+BBDD_* de datos_reservas.py (BBDD_SERVIDOR, BBDD_USUARIO, etc. o BBDD_BACKEND=sqlite).
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytz
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from datos_reservas import crear_repositorio
+
+twilio_whatsapp_number = 'whatsapp:+14155238886'
+
+MAX_INTENTOS = 5
+
+
+class ErrorReintentable(Exception):
+    """Twilio no creó el mensaje (429, 503 o sin conexión): se puede volver a intentar"""
+
+
+class ErrorDefinitivo(Exception):
+    """Twilio rechazó el mensaje (número inválido, etc.): reintentar no sirve"""
+
+
+class BandejaSalida:
+    """Estado de cada recordatorio en SQLite: pendiente -> enviando -> enviado | fallido | incierto"""
+
+    def __init__(self, ruta):
+        self.conexion = sqlite3.connect(str(ruta), timeout=10, isolation_level=None, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute(
+            "CREATE TABLE IF NOT EXISTS salida ("
+            " clave TEXT PRIMARY KEY, destino TEXT NOT NULL, cuerpo TEXT NOT NULL,"
+            " estado TEXT NOT NULL DEFAULT 'pendiente', intentos INTEGER NOT NULL DEFAULT 0,"
+            " proximo_intento REAL NOT NULL DEFAULT 0, sid TEXT, error TEXT)"
+        )
+        self.conexion.execute("CREATE INDEX IF NOT EXISTS ix_salida_estado ON salida (estado, proximo_intento)")
+        self.lock = threading.Lock()
+
+    def agregar(self, mensajes):
+        """mensajes: (clave, destino, cuerpo); los que ya estaban en la bandeja se ignoran"""
+        with self.lock:
+            antes = self.conexion.total_changes
+            self.conexion.execute("BEGIN IMMEDIATE")
+            self.conexion.executemany(
+                "INSERT OR IGNORE INTO salida (clave, destino, cuerpo) VALUES (?, ?, ?)", mensajes
+            )
+            self.conexion.execute("COMMIT")
+            return self.conexion.total_changes - antes
+
+    def recuperar_interrumpidos(self):
+        with self.lock:
+            return self.conexion.execute(
+                "UPDATE salida SET estado = 'incierto', error = 'interrumpido durante el envío'"
+                " WHERE estado = 'enviando'"
+            ).rowcount
+
+    def pendientes(self, limite):
+        with self.lock:
+            return self.conexion.execute(
+                "SELECT clave, destino, cuerpo, intentos FROM salida"
+                " WHERE estado = 'pendiente' AND proximo_intento <= ? ORDER BY proximo_intento LIMIT ?",
+                (time.time(), limite),
+            ).fetchall()
+
+    def proximo_reintento(self):
+        with self.lock:
+            return self.conexion.execute(
+                "SELECT MIN(proximo_intento) FROM salida WHERE estado = 'pendiente'"
+            ).fetchone()[0]
+
+    def tomar(self, clave):
+        """Marca el mensaje como enviando justo antes del POST; False si otro ya lo tomó"""
+        with self.lock:
+            return self.conexion.execute(
+                "UPDATE salida SET estado = 'enviando' WHERE clave = ? AND estado = 'pendiente'", (clave,)
+            ).rowcount == 1
+
+    def marcar(self, clave, estado, sid=None, error=None):
+        with self.lock:
+            self.conexion.execute(
+                "UPDATE salida SET estado = ?, sid = ?, error = ?, intentos = intentos + 1 WHERE clave = ?",
+                (estado, sid, error, clave),
+            )
+
+    def reprogramar(self, clave, espera, error):
+        with self.lock:
+            self.conexion.execute(
+                "UPDATE salida SET estado = 'pendiente', error = ?, intentos = intentos + 1,"
+                " proximo_intento = ? WHERE clave = ?",
+                (error, time.time() + espera, clave),
+            )
+
+    def resumen(self):
+        with self.lock:
+            return dict(self.conexion.execute("SELECT estado, COUNT(*) FROM salida GROUP BY estado"))
+
+
+class LimitadorTasa:
+    """Token bucket compartido por todos los hilos; esperar() bloquea hasta que haya cupo"""
+
+    def __init__(self, por_segundo, rafaga=1):
+        self.intervalo = 1.0 / por_segundo
+        self.rafaga = rafaga
+        self.siguiente = time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        with self.lock:
+            ahora = time.monotonic()
+            turno = max(self.siguiente, ahora - self.intervalo * (self.rafaga - 1))
+            self.siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+class ClienteTwilio:
+    """POST a Messages.json sobre una sola sesión keep-alive con tantas conexiones como hilos"""
+
+    def __init__(self, account_sid, auth_token, numero_origen, base_url='https://api.twilio.com',
+                 conexiones=8, timeout=(5, 30)):
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.numero_origen = numero_origen
+        self.timeout = timeout
+        self.sesion = requests.Session()
+        self.sesion.auth = (account_sid, auth_token)
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self.sesion.mount('https://', adaptador)
+        self.sesion.mount('http://', adaptador)
+
+    def enviar(self, destino, cuerpo):
+        try:
+            respuesta = self.sesion.post(
+                self.url, data={'To': destino, 'From': self.numero_origen, 'Body': cuerpo}, timeout=self.timeout
+            )
+        except requests.exceptions.ConnectTimeout as e:
+            raise ErrorReintentable(str(e))
+        except requests.exceptions.ConnectionError as e:
+            # Sólo si ni siquiera se abrió la conexión hay certeza de que el mensaje no salió
+            if isinstance(getattr(e.args[0] if e.args else None, 'reason', None), NewConnectionError):
+                raise ErrorReintentable(str(e))
+            raise
+        if respuesta.status_code in (429, 503):
+            raise ErrorReintentable(f"{respuesta.status_code} {respuesta.text[:200]}")
+        if 400 <= respuesta.status_code < 500:
+            raise ErrorDefinitivo(f"{respuesta.status_code} {respuesta.text[:200]}")
+        respuesta.raise_for_status()
+        return respuesta.json().get('sid')
+
+
+def texto_recordatorio(fecha, hora, medico, especialidad):
+    return (
+        f"📅 *Recordatorio de cita*\n\n"
+        f"Mañana {fecha.strftime('%d-%m-%Y')} a las {hora.strftime('%H:%M')} tienes hora con "
+        f"*{medico}* ({especialidad}) en el Hospital DIPRECA.\n\n"
+        f"Si no puedes asistir, avísanos respondiendo este mensaje."
+    )
+
+
+def preparar(bbdd, bandeja, dia):
+    """Anota en la bandeja un recordatorio por cada cita reservada del día; devuelve (citas, nuevos)"""
+    citas = bbdd.cupos_reservados(dia)
+    nuevos = bandeja.agregar(
+        (f"{cupo_id}:{fecha.isoformat()}", telefono, texto_recordatorio(fecha, hora, medico, especialidad))
+        for cupo_id, fecha, hora, medico, especialidad, telefono in citas
+    )
+    return len(citas), nuevos
+
+
+def difundir(bandeja, cliente, concurrencia=8, por_segundo=20, max_intentos=MAX_INTENTOS, cada=5):
+    """Envía todo lo pendiente de la bandeja y devuelve (enviados, segundos)"""
+    limitador = LimitadorTasa(por_segundo, rafaga=concurrencia)
+    # Hasta 2x concurrencia mensajes en la cola del pool: los hilos nunca esperan a que termine un lote
+    cupos = threading.BoundedSemaphore(concurrencia * 2)
+    en_curso = set()
+    enviados = 0
+    lock = threading.Lock()
+
+    def enviar(fila):
+        nonlocal enviados
+        clave, destino, cuerpo, intentos = fila
+        try:
+            limitador.esperar()
+            if not bandeja.tomar(clave):
+                return
+            try:
+                sid = cliente.enviar(destino, cuerpo)
+            except ErrorReintentable as e:
+                if intentos + 1 >= max_intentos:
+                    bandeja.marcar(clave, 'fallido', error=str(e))
+                else:
+                    bandeja.reprogramar(clave, min(60, 2 ** intentos), str(e))
+            except ErrorDefinitivo as e:
+                bandeja.marcar(clave, 'fallido', error=str(e))
+            except Exception as e:
+                # Timeout de lectura, conexión cortada a mitad, 5xx: Twilio pudo haberlo creado igual
+                bandeja.marcar(clave, 'incierto', error=str(e))
+            else:
+                bandeja.marcar(clave, 'enviado', sid=sid)
+                with lock:
+                    enviados += 1
+        finally:
+            with lock:
+                en_curso.discard(clave)
+            cupos.release()
+
+    inicio = time.perf_counter()
+    ultimo_reporte = inicio
+    with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='recordatorio') as pool:
+        while True:
+            with lock:
+                ocupados = set(en_curso)
+            lote = [fila for fila in bandeja.pendientes(concurrencia * 4 + len(ocupados)) if fila[0] not in ocupados]
+            if not lote:
+                proximo = bandeja.proximo_reintento()
+                if proximo is None and not ocupados:
+                    break
+                time.sleep(0.05 if proximo is None else min(1.0, max(0.05, proximo - time.time())))
+                continue
+            for fila in lote:
+                cupos.acquire()
+                with lock:
+                    en_curso.add(fila[0])
+                pool.submit(enviar, fila)
+            if time.perf_counter() - ultimo_reporte >= cada:
+                ultimo_reporte = time.perf_counter()
+                print(f"📤 {enviados} enviados ({enviados / (ultimo_reporte - inicio):.1f} msg/s)")
+    return enviados, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dia', help="YYYY-MM-DD; por defecto mañana en Santiago")
+    parser.add_argument('--concurrencia', type=int, default=8)
+    parser.add_argument('--por-segundo', type=float, default=20, help="tope de mensajes por segundo de la cuenta")
+    parser.add_argument('--salida', default='recordatorios.db', help="bandeja de salida SQLite")
+    args = parser.parse_args()
+
+    if args.dia:
+        dia = datetime.strptime(args.dia, '%Y-%m-%d').date()
+    else:
+        dia = datetime.now(pytz.timezone('America/Santiago')).date() + timedelta(days=1)
+
+    bandeja = BandejaSalida(args.salida)
+    interrumpidos = bandeja.recuperar_interrumpidos()
+    if interrumpidos:
+        print(f"⚠️ {interrumpidos} mensajes quedaron a medio enviar en la ejecución anterior; se marcan como inciertos")
+
+    citas, nuevos = preparar(crear_repositorio(), bandeja, dia)
+    print(f"🔎 {citas} citas para el {dia.strftime('%d-%m-%Y')}, {nuevos} recordatorios nuevos en la bandeja")
+
+    cliente = ClienteTwilio(
+        os.environ['TWILIO_ACCOUNT_SID'],
+        os.environ['TWILIO_AUTH_TOKEN'],
+        os.environ.get('TWILIO_WHATSAPP_NUMBER', twilio_whatsapp_number),
+        base_url=os.environ.get('TWILIO_API_URL', 'https://api.twilio.com'),
+        conexiones=args.concurrencia,
+    )
+    enviados, segundos = difundir(bandeja, cliente, args.concurrencia, args.por_segundo)
+    print(f"✅ {enviados} enviados en {segundos:.1f}s ({enviados / segundos if segundos else 0:.1f} msg/s)")
+    print(f"📊 Bandeja: {bandeja.resumen()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import json
+import threading
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import pytz
+from sortedcontainers import SortedList
+
+from faq_index import normalizar
+
+ZONA_HORARIA = pytz.timezone('America/Santiago')
+
+
+def ahora_santiago():
+    # Los cupos se guardan sin zona horaria, en hora local de Santiago
+    return datetime.now(ZONA_HORARIA).replace(tzinfo=None)
+
+
+class Cupo:
+    __slots__ = ('id', 'inicio', 'disponible', 'medico', 'especialidad')
+
+    def __init__(self, id, inicio, disponible, medico, especialidad):
+        self.id = id
+        self.inicio = inicio
+        self.disponible = disponible
+        self.medico = medico
+        self.especialidad = especialidad
+
+    @classmethod
+    def desde_dict(cls, datos):
+        inicio = datetime.strptime(f"{datos['fecha']} {datos['hora']}", '%Y-%m-%d %H:%M:%S')
+        return cls(datos['id'], inicio, bool(datos['disponible']), datos['medico'], datos['especialidad'])
+
+    def a_dict(self):
+        return {
+            'id': self.id,
+            'fecha': self.inicio.strftime('%Y-%m-%d'),
+            'hora': self.inicio.strftime('%H:%M:%S'),
+            'disponible': int(self.disponible),
+            'medico': self.medico,
+            'especialidad': self.especialidad,
+        }
+
+    @property
+    def clave(self):
+        return (self.inicio, self.id)
+
+
+class AgendaCupos:
+    """Cupos de atención en memoria con índices de cupos libres por fecha, especialidad y médico.
+
+    Cada índice es un SortedList de (inicio, id), así que "los próximos N cupos
+    libres de X desde T" cuesta O(log n + N), y reservar o liberar un cupo
+    O(log n) por índice.
+    """
+
+    def __init__(self, cupos=()):
+        self.cupos = {}
+        self.libres = SortedList()
+        self.por_fecha = {}
+        self.por_especialidad = {}
+        self.por_medico = {}
+        self.nombres_especialidad = {}
+        self.lock = threading.RLock()
+        for cupo in cupos:
+            self.agregar(cupo)
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        with open(ruta, 'r', encoding='utf-8') as f:
+            return cls(Cupo.desde_dict(datos) for datos in json.load(f)['citas'])
+
+    def _indices(self, cupo):
+        yield self.libres
+        yield self.por_fecha.setdefault(cupo.inicio.date(), SortedList())
+        yield self.por_especialidad.setdefault(normalizar(cupo.especialidad), SortedList())
+        yield self.por_medico.setdefault(normalizar(cupo.medico), SortedList())
+
+    def agregar(self, cupo):
+        with self.lock:
+            if cupo.id in self.cupos:
+                raise ValueError(f"Cupo duplicado: {cupo.id}")
+            self.cupos[cupo.id] = cupo
+            self.nombres_especialidad.setdefault(normalizar(cupo.especialidad), cupo.especialidad)
+            if cupo.disponible:
+                for indice in self._indices(cupo):
+                    indice.add(cupo.clave)
+
+    def reservar(self, cupo_id):
+        """Marca el cupo como ocupado; devuelve False si no existe o ya estaba tomado"""
+        with self.lock:
+            cupo = self.cupos.get(cupo_id)
+            if cupo is None or not cupo.disponible:
+                return False
+            cupo.disponible = False
+            for indice in self._indices(cupo):
+                indice.discard(cupo.clave)
+            return True
+
+    def liberar(self, cupo_id):
+        with self.lock:
+            cupo = self.cupos.get(cupo_id)
+            if cupo is None or cupo.disponible:
+                return False
+            cupo.disponible = True
+            for indice in self._indices(cupo):
+                indice.add(cupo.clave)
+            return True
+
+    def obtener(self, cupo_id):
+        return self.cupos.get(cupo_id)
+
+    def especialidades(self, desde=None):
+        """Especialidades con al menos un cupo libre desde `desde`, en orden alfabético"""
+        with self.lock:
+            return sorted(
+                nombre for clave, nombre in self.nombres_especialidad.items()
+                if self._siguientes(self.por_especialidad.get(clave), desde, 1)
+            )
+
+    def buscar_especialidad(self, texto):
+        return self.nombres_especialidad.get(normalizar(texto))
+
+    def _siguientes(self, indice, desde, n):
+        if not indice:
+            return []
+        minimo = (desde,) if desde is not None else None
+        return list(islice(indice.irange(minimum=minimo), n))
+
+    def proximos_libres(self, n=3, especialidad=None, medico=None, fecha=None, desde=None):
+        """Los próximos n cupos libres (ordenados por hora) que cumplen los filtros"""
+        with self.lock:
+            if medico is not None:
+                indice = self.por_medico.get(normalizar(medico))
+            elif especialidad is not None:
+                indice = self.por_especialidad.get(normalizar(especialidad))
+            elif fecha is not None:
+                indice = self.por_fecha.get(fecha)
+            else:
+                indice = self.libres
+            if not indice:
+                return []
+
+            # La fecha se traduce a un rango sobre el índice elegido
+            minimo, maximo = desde, None
+            if fecha is not None:
+                inicio_dia = datetime.combine(fecha, time.min)
+                minimo = max(minimo, inicio_dia) if minimo else inicio_dia
+                maximo = (inicio_dia + timedelta(days=1),)
+            claves = indice.irange(
+                minimum=(minimo,) if minimo else None, maximum=maximo, inclusive=(True, False)
+            )
+            cupos = (self.cupos[cupo_id] for _, cupo_id in claves)
+            if medico is not None and especialidad is not None:
+                clave_especialidad = normalizar(especialidad)
+                cupos = (cupo for cupo in cupos if normalizar(cupo.especialidad) == clave_especialidad)
+            return list(islice(cupos, n))
+
+    def __len__(self):
+        return len(self.cupos)
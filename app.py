@@ -1,82 +1,365 @@
-from flask import Flask, request
-from twilio.twiml.messaging_response import MessagingResponse
+from flask import Flask, g, request
 import json
 from pathlib import Path
 import logging
+import functools
+import hmac
 import os
-from fuzzywuzzy import fuzz
+import threading
+import time
+from faq_index import IndiceFAQ
+from cache_respuestas import CacheRespuestas
+from vigilante_archivo import VigilanteArchivo
+from sesiones import AlmacenMemoria, Sesion, crear_almacen_sesiones
+from agenda import AgendaCupos, ahora_santiago
+from bitacora import Bitacora, cargar_agenda as cargar_agenda_con_bitacora
+from reservas import crear_reservas
+from respuestas_twiml import TWIML_VACIO, prerenderizar, renderizar_twiml
+import metricas
+from perfilador import DIRECTORIO_POR_DEFECTO as DIRECTORIO_PERFILES, Perfilador, reiniciar_control
+from idempotencia import crear_registro_mensajes
+from limites import LimitadorPorNumero, LimiteConcurrencia
+from envio_asincrono import TWILIO_API_URL, ClienteMensajes, ProcesadorAsincrono
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 DATA_DIR = Path(__file__).parent / 'data'
-user_state = {}  # Aquí guardamos el estado de cada número
+user_state = crear_almacen_sesiones(observador=metricas.sesiones_descartadas)  # Aquí guardamos el estado de cada número
+
+def leer_faqs():
+    with open(DATA_DIR / 'faqs.json', 'r', encoding='utf-8') as f:
+        return json.load(f)['faqs']
 
 def cargar_faqs():
     try:
-        with open(DATA_DIR / 'faqs.json', 'r', encoding='utf-8') as f:
-            return json.load(f)['faqs']
+        return leer_faqs()
     except Exception as e:
         logger.error(f"Error cargando FAQs: {str(e)}")
         return []
 
+def construir_motor_faq(faqs, motor=None):
+    # FAQ_MOTOR=fuzzy (por defecto) usa fuzz.ratio; FAQ_MOTOR=tfidf usa similitud TF-IDF
+    motor = motor or os.environ.get('FAQ_MOTOR', 'fuzzy')
+    if motor == 'tfidf':
+        from faq_tfidf import MotorTFIDF
+        return MotorTFIDF(faqs)
+    if motor != 'fuzzy':
+        logger.warning(f"Motor de FAQ desconocido '{motor}', se usa fuzzy")
+    return IndiceFAQ(faqs)
+
+# ARRANQUE_DIFERIDO=1: un motor que requiere librerías pesadas (tfidf -> scikit-learn) se construye en
+# segundo plano; mientras tanto responde el índice fuzzy y /ready contesta 503
+ARRANQUE_DIFERIDO = os.environ.get('ARRANQUE_DIFERIDO') == '1' and os.environ.get('FAQ_MOTOR', 'fuzzy') != 'fuzzy'
+LISTO = threading.Event()
+
 FAQS = cargar_faqs()
+INDICE_FAQS = construir_motor_faq(FAQS, 'fuzzy' if ARRANQUE_DIFERIDO else None)
+CACHE_FAQS = CacheRespuestas(int(os.environ.get('FAQ_CACHE_TAMANO', 1024)), observador=metricas.cache_faq)
+
+def recargar_faqs():
+    """Relee faqs.json y reemplaza el motor de una sola vez; si falla se mantiene la versión anterior"""
+    global FAQS, INDICE_FAQS
+    try:
+        faqs = leer_faqs()
+        motor = construir_motor_faq(faqs)
+    except Exception as e:
+        logger.error(f"Error recargando FAQs, se mantiene la versión anterior: {str(e)}")
+        return False
+    # El motor se publica ya construido: las consultas ven el anterior o el nuevo, nunca uno a medias
+    INDICE_FAQS = motor
+    FAQS = faqs
+    prerenderizar_respuestas()
+    logger.info(f"FAQs recargadas: {len(faqs)} entradas")
+    return True
+
+# FAQ_RECARGA_SEGUNDOS=0 desactiva la recarga en caliente
+INTERVALO_RECARGA = float(os.environ.get('FAQ_RECARGA_SEGUNDOS', 5))
+if INTERVALO_RECARGA > 0:
+    VIGILANTE_FAQS = VigilanteArchivo(DATA_DIR / 'faqs.json', recargar_faqs, INTERVALO_RECARGA).iniciar()
 
 def buscar_respuesta_faq(pregunta_usuario):
-    pregunta_usuario = pregunta_usuario.lower().strip()
-    mejor_respuesta = None
-    mejor_puntaje = 0
+    with metricas.medir('faq'):
+        respuesta = CACHE_FAQS.buscar(pregunta_usuario, INDICE_FAQS)
+    metricas.consulta_faq(respuesta is not None)
+    return respuesta
+
+RUTA_CITAS = Path(os.environ.get('CITAS_RUTA', DATA_DIR / 'citas.json'))
+RUTA_BITACORA_CITAS = Path(os.environ.get('CITAS_BITACORA', RUTA_CITAS.with_suffix('.journal')))
+# Foto compactada de citas + bitácora; fuera de git, citas.json queda sólo como semilla
+RUTA_FOTO_CITAS = Path(os.environ.get('CITAS_FOTO', RUTA_CITAS.with_suffix('.foto.json')))
+
+def cargar_agenda():
+    try:
+        return cargar_agenda_con_bitacora(RUTA_FOTO_CITAS, RUTA_BITACORA_CITAS, RUTA_CITAS)
+    except Exception as e:
+        logger.error(f"Error cargando citas: {str(e)}")
+        return AgendaCupos()
+
+AGENDA = cargar_agenda()
+BITACORA_CITAS = Bitacora(RUTA_BITACORA_CITAS, RUTA_FOTO_CITAS, RUTA_CITAS)
+RESERVAS = crear_reservas(AGENDA.cupos.values())
+CUPOS_A_OFRECER = 3
+SIN_CUPOS = "⛔ No hay horas disponibles por ahora. Intenta más tarde."
+PEDIR_NOMBRE = "👤 ¿Cuál es tu nombre para la cita?"
+MENSAJE_POR_DEFECTO = (
+    "¡Hola! 👋 ¿En qué puedo ayudarte?\n\n"
+    "Puedes preguntarme sobre:\n"
+    "⏰ Horarios de atención\n"
+    "📍 Ubicación\n"
+    "📄 Requisitos para citas\n"
+    "⚠️ Contacto de emergencia\n\n"
+    "O escribe *AGENDAR* para información sobre citas. 📅"
+)
+ERROR_INTERNO = "⚠️ Error interno. Por favor, intenta nuevamente."
+ESPERA_POR_FAVOR = "⏳ Estás enviando muchos mensajes. Espera unos segundos e intenta nuevamente."
+MENSAJES_FIJOS = (SIN_CUPOS, PEDIR_NOMBRE, MENSAJE_POR_DEFECTO, ERROR_INTERNO, ESPERA_POR_FAVOR)
+
+TWIML_PRERENDERIZADO = {}
+
+def prerenderizar_respuestas():
+    """Serializa una vez el TwiML de los mensajes fijos y de todas las respuestas FAQ"""
+    global TWIML_PRERENDERIZADO
+    TWIML_PRERENDERIZADO = prerenderizar(MENSAJES_FIJOS + tuple(faq['respuesta'] for faq in FAQS))
+
+prerenderizar_respuestas()
+
+def texto_especialidades(especialidades):
+    texto = "🩺 ¿Para qué especialidad deseas la cita?\n\n"
+    for i, especialidad in enumerate(especialidades, 1):
+        texto += f"{i}. {especialidad}\n"
+    texto += "\nEscribe el *número* o el nombre de la especialidad."
+    return texto
+
+def texto_opciones(cupos):
+    texto = "📅 *Opciones de cita disponibles:*\n\n"
+    for i, cupo in enumerate(cupos, 1):
+        texto += f"{i}. {cupo.inicio.strftime('%d-%m-%Y %H:%M')} - {cupo.medico}\n"
+    texto += "\nEscribe el *número* de la opción que deseas reservar ✅"
+    return texto
+
+def ofrecer_cupos(especialidad, desde):
+    """Próximos cupos libres según el índice local, confirmados contra el almacén de reservas compartido"""
+    while True:
+        cupos = AGENDA.proximos_libres(CUPOS_A_OFRECER, especialidad=especialidad, desde=desde)
+        libres = RESERVAS.libres(cupo.id for cupo in cupos)
+        if len(libres) == len(cupos):
+            return cupos
+        # Otro worker reservó alguno: se actualiza el índice local y se vuelve a consultar
+        for cupo in cupos:
+            if cupo.id not in libres:
+                AGENDA.reservar(cupo.id)
 
-    for faq in FAQS:
-        puntaje_pregunta = fuzz.ratio(pregunta_usuario, faq['pregunta'].lower())
-        keywords = [kw.strip().lower() for kw in faq.get('keywords', '').split(',')]
-        puntaje_keywords = max([fuzz.ratio(pregunta_usuario, kw) for kw in keywords] + [0])
-        puntaje_total = max(puntaje_keywords, puntaje_pregunta * 0.8)
+def reservar_cupo(cupo_id):
+    reservado = RESERVAS.reservar(cupo_id)
+    AGENDA.reservar(cupo_id)  # El cupo queda tomado en el índice local, lo haya ganado este worker u otro
+    if reservado:
+        # Se confirma al paciente sólo cuando el cambio ya está en disco
+        BITACORA_CITAS.registrar('reservar', id=cupo_id)
+    return reservado
 
-        if puntaje_total > 50 and puntaje_total > mejor_puntaje:
-            mejor_puntaje = puntaje_total
-            mejor_respuesta = faq['respuesta']
+def elegir_especialidad(user_msg, especialidades):
+    if user_msg.isdigit():
+        seleccion = int(user_msg) - 1
+        return especialidades[seleccion] if 0 <= seleccion < len(especialidades) else None
+    especialidad = AGENDA.buscar_especialidad(user_msg)
+    return especialidad if especialidad in especialidades else None
 
-    return mejor_respuesta
+# Perfilado por muestreo, apagado por defecto: PERFIL_TASA=0.01 perfila el 1% de los mensajes.
+# La tasa se fija al arrancar el servidor (reiniciar_control), no en cada worker
+PERFILADOR = Perfilador(os.environ.get('PERFILES_DIR', DIRECTORIO_PERFILES))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
 
+def admin_autorizado():
+    # Sin ADMIN_TOKEN configurado los endpoints de administración quedan deshabilitados
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+MENSAJES_PROCESADOS = crear_registro_mensajes()
+# Cuánto espera un reintento a que termine el procesamiento original antes de responder vacío
+ESPERA_REINTENTO = float(os.environ.get('DEDUP_ESPERA_SEGUNDOS', 5))
+
+def idempotente(vista):
+    """Procesa cada MessageSid una sola vez; los reintentos de Twilio reciben la respuesta ya renderizada"""
+    @functools.wraps(vista)
+    def envoltura():
+        sid = request.form.get('MessageSid')
+        if not sid:
+            return vista()
+        nuevo, respuesta = MENSAJES_PROCESADOS.reclamar(sid)
+        if not nuevo:
+            metricas.reintento()
+            if respuesta is None:
+                respuesta = MENSAJES_PROCESADOS.esperar(sid, ESPERA_REINTENTO)
+            return respuesta or TWIML_VACIO, 200, {'Content-Type': 'text/xml'}
+        try:
+            resultado = vista()
+        except Exception:
+            MENSAJES_PROCESADOS.liberar(sid)
+            raise
+        if g.get('error_interno'):
+            # Tras un error interno se permite que el reintento vuelva a procesar el mensaje
+            MENSAJES_PROCESADOS.liberar(sid)
+        else:
+            MENSAJES_PROCESADOS.completar(sid, resultado[0])
+        return resultado
+    return envoltura
+
+# Los buckets viven en memoria de cada worker: con N workers de gunicorn un número
+# puede llegar a N veces LIMITE_RAFAGA y LIMITE_POR_SEGUNDO, según cómo se repartan sus requests
+LIMITADOR = LimitadorPorNumero(
+    capacidad=float(os.environ.get('LIMITE_RAFAGA', 8)),
+    recarga=float(os.environ.get('LIMITE_POR_SEGUNDO', 0.5)),
+    maximo_numeros=int(os.environ.get('LIMITE_NUMEROS', 50000)),
+)
+# Requests simultáneos por worker (relevante con workers de varios hilos)
+CONCURRENCIA = LimiteConcurrencia(int(os.environ.get('LIMITE_CONCURRENCIA', 16)))
+# LIMITE_RESPUESTA=vacio no contesta nada, útil para cortar bucles de reenvío
+RESPONDER_AVISO_LIMITE = os.environ.get('LIMITE_RESPUESTA', 'aviso') != 'vacio'
+
+def respuesta_limitada(motivo):
+    metricas.rechazo(motivo)
+    if RESPONDER_AVISO_LIMITE:
+        return build_twiml_response(ESPERA_POR_FAVOR)
+    return TWIML_VACIO, 200, {'Content-Type': 'text/xml'}
+
+def con_limites(vista):
+    """Descarta con una respuesta prerenderizada lo que excede el límite por número o la concurrencia"""
+    @functools.wraps(vista)
+    def envoltura():
+        if not LIMITADOR.permitir(request.form.get('From')):
+            return respuesta_limitada('numero')
+        return CONCURRENCIA.ejecutar(vista, lambda: respuesta_limitada('concurrencia'))
+    return envoltura
+
+# MODO_ASINCRONO=1: /whatsapp responde de inmediato con TwiML vacío y la respuesta se envía luego por la API REST
+if os.environ.get('MODO_ASINCRONO') == '1':
+    PROCESADOR = ProcesadorAsincrono(
+        hilos=int(os.environ.get('ASINCRONO_HILOS', 8)),
+        maximo_pendientes=int(os.environ.get('ASINCRONO_PENDIENTES', 1000)),
+    )
+    CLIENTE_MENSAJES = ClienteMensajes(
+        os.environ['TWILIO_ACCOUNT_SID'],
+        os.environ['TWILIO_AUTH_TOKEN'],
+        os.environ.get('TWILIO_WHATSAPP_NUMBER', 'whatsapp:+14155238886'),
+        base_url=os.environ.get('TWILIO_API_URL', TWILIO_API_URL),
+    )
+else:
+    PROCESADOR = None
+    CLIENTE_MENSAJES = None
+
+def responder_por_api(vista, formulario):
+    # Se reconstruye el request para que el flujo normal corra igual que en modo síncrono
+    with app.test_request_context('/whatsapp', method='POST', data=formulario):
+        vista()
+        texto = g.get('texto_respuesta')
+    if texto:
+        CLIENTE_MENSAJES.enviar(formulario.get('From'), texto)
+
+def asincrono(vista):
+    """En modo asíncrono encola el mensaje y confirma a Twilio sin esperar el procesamiento"""
+    @functools.wraps(vista)
+    def envoltura():
+        if PROCESADOR is None:
+            return vista()
+        # Los mensajes de un mismo número se procesan de a uno y en orden de llegada
+        formulario = request.form.to_dict()
+        if not PROCESADOR.encolar(responder_por_api, vista, formulario, clave=formulario.get('From')):
+            return respuesta_limitada('cola')
+        return TWIML_VACIO, 200, {'Content-Type': 'text/xml'}
+    return envoltura
+
+# La deduplicación va primero: un reintento de Twilio no gasta cupo del límite
+# ni se vuelve a encolar, recibe la respuesta que ya se dio a ese MessageSid
 @app.route("/whatsapp", methods=['POST'])
+@idempotente
+@con_limites
+@asincrono
+@PERFILADOR.muestrear('whatsapp')
 def whatsapp_reply():
+    inicio = time.perf_counter()
+    estado = None
     try:
         user_msg = request.form.get('Body', '').strip()
         user_number = request.form.get('From')  # Número del usuario
         user_msg_lower = user_msg.lower()
 
         # Estado actual del usuario
-        estado = user_state.get(user_number, {}).get('estado')
+        sesion = user_state.obtener(user_number)
+        estado = sesion.estado if sesion else None
 
         # 🌀 Manejo del flujo de agendamiento
         if estado == 'pidiendo_nombre':
-            user_state[user_number]['nombre'] = user_msg
-            user_state[user_number]['estado'] = 'pidiendo_dia'
-            return build_twiml_response("📅 ¿Qué día deseas agendar la cita?")
-
-        elif estado == 'pidiendo_dia':
-            user_state[user_number]['dia'] = user_msg
-            user_state[user_number]['estado'] = 'pidiendo_hora'
-            return build_twiml_response("🕒 ¿A qué hora deseas tu cita?")
-
-        elif estado == 'pidiendo_hora':
-            user_state[user_number]['hora'] = user_msg
-            datos = user_state[user_number]
-            user_state.pop(user_number, None)  # Limpiar estado
+            especialidades = AGENDA.especialidades(desde=ahora_santiago())
+            if not especialidades:
+                user_state.eliminar(user_number)
+                metricas.transicion(estado, 'sin_cupos')
+                return build_twiml_response(SIN_CUPOS)
+            sesion.nombre = user_msg
+            sesion.estado = 'pidiendo_especialidad'
+            user_state.guardar(user_number, sesion)
+            metricas.transicion(estado, sesion.estado)
+            return build_twiml_response(texto_especialidades(especialidades))
+
+        elif estado == 'pidiendo_especialidad':
+            ahora = ahora_santiago()
+            especialidades = AGENDA.especialidades(desde=ahora)
+            especialidad = elegir_especialidad(user_msg, especialidades)
+            if especialidad is None:
+                if not especialidades:
+                    user_state.eliminar(user_number)
+                    metricas.transicion(estado, 'sin_cupos')
+                    return build_twiml_response(SIN_CUPOS)
+                return build_twiml_response("❌ Especialidad no válida.\n\n" + texto_especialidades(especialidades))
+            cupos = ofrecer_cupos(especialidad, ahora)
+            if not cupos:
+                user_state.eliminar(user_number)
+                metricas.transicion(estado, 'sin_cupos')
+                return build_twiml_response(SIN_CUPOS)
+            sesion.especialidad = especialidad
+            sesion.opciones = [cupo.id for cupo in cupos]
+            sesion.estado = 'eligiendo_cupo'
+            user_state.guardar(user_number, sesion)
+            metricas.transicion(estado, sesion.estado)
+            return build_twiml_response(texto_opciones(cupos))
+
+        elif estado == 'eligiendo_cupo':
+            if not user_msg.isdigit() or not 1 <= int(user_msg) <= len(sesion.opciones):
+                return build_twiml_response(
+                    f"❌ Opción no válida. Por favor escribe un número del 1 al {len(sesion.opciones)}."
+                )
+            cupo_id = sesion.opciones[int(user_msg) - 1]
+            if not reservar_cupo(cupo_id):
+                # Otro paciente tomó la hora: se ofrecen las siguientes libres
+                cupos = ofrecer_cupos(sesion.especialidad, ahora_santiago())
+                if not cupos:
+                    user_state.eliminar(user_number)
+                    metricas.transicion(estado, 'sin_cupos')
+                    return build_twiml_response(SIN_CUPOS)
+                sesion.opciones = [cupo.id for cupo in cupos]
+                user_state.guardar(user_number, sesion)
+                metricas.transicion(estado, 'cupo_tomado')
+                return build_twiml_response("⚠️ Esa hora acaba de ser tomada.\n\n" + texto_opciones(cupos))
+
+            cupo = AGENDA.obtener(cupo_id)
+            user_state.eliminar(user_number)  # Limpiar estado
+            metricas.transicion(estado, 'agendada')
             return build_twiml_response(
                 f"✅ Cita agendada:\n"
-                f"👤 Nombre: {datos['nombre']}\n"
-                f"📅 Día: {datos['dia']}\n"
-                f"🕒 Hora: {datos['hora']}\n\n"
+                f"👤 Nombre: {sesion.nombre}\n"
+                f"🩺 Especialidad: {cupo.especialidad}\n"
+                f"👨‍⚕️ Médico: {cupo.medico}\n"
+                f"📅 Día: {cupo.inicio.strftime('%d-%m-%Y')}\n"
+                f"🕒 Hora: {cupo.inicio.strftime('%H:%M')}\n\n"
                 "¡Gracias por agendar con nosotros!"
             )
 
         # 🚀 Inicio del flujo de agendamiento
         if "agendar" in user_msg_lower:
-            user_state[user_number] = {'estado': 'pidiendo_nombre'}
-            return build_twiml_response("👤 ¿Cuál es tu nombre para la cita?")
+            user_state.guardar(user_number, Sesion('pidiendo_nombre'))
+            metricas.transicion(estado, 'pidiendo_nombre')
+            return build_twiml_response(PEDIR_NOMBRE)
 
         # 📚 Si no está en un flujo, intentamos responder con FAQ
         respuesta_faq = buscar_respuesta_faq(user_msg)
@@ -84,27 +367,62 @@ def whatsapp_reply():
             return build_twiml_response(respuesta_faq)
 
         # 🧭 Mensaje por defecto
-        return build_twiml_response(
-            "¡Hola! 👋 ¿En qué puedo ayudarte?\n\n"
-            "Puedes preguntarme sobre:\n"
-            "⏰ Horarios de atención\n"
-            "📍 Ubicación\n"
-            "📄 Requisitos para citas\n"
-            "⚠️ Contacto de emergencia\n\n"
-            "O escribe *AGENDAR* para información sobre citas. 📅"
-        )
+        return build_twiml_response(MENSAJE_POR_DEFECTO)
 
     except Exception as e:
         logger.error(f"Error: {str(e)}")
-        return build_twiml_response("⚠️ Error interno. Por favor, intenta nuevamente.")
+        g.error_interno = True
+        return build_twiml_response(ERROR_INTERNO)
+
+    finally:
+        metricas.observar_etapa(f"estado_{estado or 'inicio'}", time.perf_counter() - inicio)
+        if isinstance(user_state, AlmacenMemoria):
+            metricas.sesiones_activas(len(user_state))
 
 def build_twiml_response(message_text):
-    response = MessagingResponse()
-    response.message(message_text)
-    return str(response), 200, {'Content-Type': 'text/xml'}
+    # Los textos fijos y las FAQ ya vienen serializados; sólo los dinámicos pasan por MessagingResponse
+    g.texto_respuesta = message_text  # En modo asíncrono es lo que se envía por la API REST
+    with metricas.medir('twiml'):
+        twiml = TWIML_PRERENDERIZADO.get(message_text)
+        if twiml is None:
+            twiml = renderizar_twiml(message_text)
+    return twiml, 200, {'Content-Type': 'text/xml'}
 
-if __name__ == "__main__":
+@app.route("/metrics")
+def metrics():
+    # Con SQLite el total es compartido y contarlo cuesta una consulta, así que sólo se hace al exportar
+    metricas.sesiones_activas(len(user_state))
+    contenido, tipo = metricas.exportar()
+    return contenido, 200, {'Content-Type': tipo}
 
+@app.route("/admin/perfilado", methods=['GET', 'POST'])
+def admin_perfilado():
+    if not admin_autorizado():
+        return "No autorizado", 403
+    if request.method == 'POST':
+        try:
+            PERFILADOR.fijar_tasa(request.values.get('tasa'))
+        except (TypeError, ValueError):
+            return {'error': "El parámetro 'tasa' debe ser un número entre 0 y 1"}, 400
+    return {'tasa': PERFILADOR.tasa, 'perfiles_worker': PERFILADOR.perfiles, 'directorio': PERFILADOR.directorio}
 
+@app.route("/ready")
+def ready():
+    if LISTO.is_set():
+        return {'listo': True, 'motor_faq': type(INDICE_FAQS).__name__}
+    return {'listo': False, 'motor_faq': type(INDICE_FAQS).__name__}, 503
 
-app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
\ No newline at end of file
+def completar_arranque():
+    try:
+        recargar_faqs()
+    finally:
+        LISTO.set()
+
+if ARRANQUE_DIFERIDO:
+    threading.Thread(target=completar_arranque, name='arranque', daemon=True).start()
+else:
+    LISTO.set()
+
+if __name__ == "__main__":
+    PERFILADOR.fijar_tasa(reiniciar_control(PERFILADOR.directorio))
+    app.run(host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
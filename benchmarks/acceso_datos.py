@@ -0,0 +1,94 @@
+"""Mide el costo de abrir conexión por consulta vs el pool, y del filtro CONVERT(DATE, ...) vs rango de fechas.
+
+Uso:
+    python benchmarks/acceso_datos.py [--dias 365] [--cupos-dia 2000] [--consultas 2000]
+
+Usa el backend SQLite de OtrosPY/datos_reservas.py con una tabla Reservas
+sintética (`--dias` x `--cupos-dia` filas). En SQLite `date(fecha) = ?` juega el
+papel de `CONVERT(DATE, fecha) = ?`: envolver la columna en una función impide
+usar el índice y obliga a recorrer toda la tabla.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from datos_reservas import RepositorioReservas, crear_bbdd_sqlite, crear_pool_sqlite  # noqa: E402
+
+CONSULTA_FUNCION = (
+    "SELECT fecha, hora, medico, especialidad, id FROM Reservas"
+    " WHERE date(fecha) = ? AND disponible = 1 ORDER BY hora LIMIT 3"
+)
+
+
+def sembrar(ruta, dias, cupos_dia, semilla=0):
+    rnd = random.Random(semilla)
+    crear_bbdd_sqlite(ruta, citas=None, faqs=None)
+    inicio = date(2025, 1, 1)
+    conexion = sqlite3.connect(ruta, isolation_level=None)
+    conexion.execute("BEGIN")
+    conexion.executemany(
+        "INSERT INTO Reservas (fecha, hora, medico, especialidad, disponible) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"{(inicio + timedelta(days=d)).isoformat()} 00:00:00", f"{8 + i % 10:02d}:{i % 2 * 30:02d}:00",
+             f"Médico {i % 50}", f"Especialidad {i % 12}", int(rnd.random() < 0.3))
+            for d in range(dias) for i in range(cupos_dia)
+        ),
+    )
+    conexion.execute("COMMIT")
+    conexion.close()
+    return [inicio + timedelta(days=d) for d in range(dias)]
+
+
+def medir(funcion, dias, consultas, semilla=1):
+    rnd = random.Random(semilla)
+    inicio = time.perf_counter()
+    for _ in range(consultas):
+        funcion(rnd.choice(dias))
+    return (time.perf_counter() - inicio) / consultas * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--cupos-dia', type=int, default=2000)
+    parser.add_argument('--consultas', type=int, default=2000)
+    args = parser.parse_args()
+
+    ruta = str(Path(tempfile.mkdtemp()) / 'reservas.db')
+    dias = sembrar(ruta, args.dias, args.cupos_dia)
+    repositorio = RepositorioReservas(crear_pool_sqlite(ruta), 'sqlite')
+
+    def funcion_en_columna(dia):
+        conexion = sqlite3.connect(ruta)
+        conexion.execute(CONSULTA_FUNCION, (dia.isoformat(),)).fetchall()
+        conexion.close()
+
+    def sin_pool(dia):
+        sueltas = RepositorioReservas(crear_pool_sqlite(ruta, maximo=1), 'sqlite')
+        sueltas.cupos_disponibles(dia)
+        sueltas.pool.cerrar()
+
+    # Las tres variantes deben devolver lo mismo
+    for dia in dias[:5]:
+        conexion = sqlite3.connect(ruta)
+        esperado = conexion.execute(CONSULTA_FUNCION, (dia.isoformat(),)).fetchall()
+        conexion.close()
+        assert [f[4] for f in esperado] == [f[4] for f in repositorio.cupos_disponibles(dia)]
+
+    consultas_lentas = max(1, args.consultas // 20)
+    print(f"{args.dias * args.cupos_dia} filas en Reservas")
+    print(f"{'variante':<38} {'ms/consulta':>12}")
+    print(f"{'date(fecha) = ?, conexión nueva':<38} {medir(funcion_en_columna, dias, consultas_lentas):>12.3f}")
+    print(f"{'rango de fechas, conexión nueva':<38} {medir(sin_pool, dias, args.consultas):>12.3f}")
+    print(f"{'rango de fechas, pool':<38} {medir(repositorio.cupos_disponibles, dias, args.consultas):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
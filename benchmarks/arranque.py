@@ -0,0 +1,66 @@
+"""Arranque en frío de un worker: tiempo de import de app.py, primera respuesta y /ready.
+
+Uso:
+    python benchmarks/arranque.py [--repeticiones 5]
+
+Cada repetición es un intérprete nuevo (como un worker recién creado por
+gunicorn o el autoscaler) que importa la app, responde un mensaje a /whatsapp
+y espera a que /ready conteste 200. Se comparan las configuraciones de
+CONFIGURACIONES y se reporta la mediana de cada medida en milisegundos.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+CONFIGURACIONES = {
+    'fuzzy': {},
+    'tfidf': {'FAQ_MOTOR': 'tfidf'},
+    'tfidf diferido': {'FAQ_MOTOR': 'tfidf', 'ARRANQUE_DIFERIDO': '1'},
+}
+
+WORKER = """
+import json, time
+inicio = time.perf_counter()
+import app as modulo
+importado = time.perf_counter()
+cliente = modulo.app.test_client()
+cliente.post('/whatsapp', data={'Body': 'horario de visitas', 'From': 'whatsapp:+56900000000', 'MessageSid': 'SM1'})
+respuesta = time.perf_counter()
+while cliente.get('/ready').status_code != 200:
+    time.sleep(0.005)
+listo = time.perf_counter()
+print(json.dumps({'import': importado - inicio, 'primera_respuesta': respuesta - inicio, 'ready': listo - inicio}))
+"""
+
+
+def medir(entorno, repeticiones):
+    muestras = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', WORKER],
+            cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True,
+        )
+        muestras.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return {clave: statistics.median(m[clave] for m in muestras) * 1000 for clave in muestras[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    base = dict(os.environ, FAQ_RECARGA_SEGUNDOS='0')
+    print(f"{'configuración':<16} {'import_ms':>10} {'1a_resp_ms':>11} {'ready_ms':>9}")
+    for nombre, variables in CONFIGURACIONES.items():
+        r = medir(dict(base, **variables), args.repeticiones)
+        print(f"{nombre:<16} {r['import']:>10.0f} {r['primera_respuesta']:>11.0f} {r['ready']:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Reentrenamiento diario: leer todo JMC_PREDICCION_ASISTENCIA vs copia local en Parquet con marca de FECHA_ADD.
+
+Uso:
+    python benchmarks/cache_extractos.py [--filas 2000000] [--nuevas 5000]
+
+Siembra un extracto sintético en SQLite (cinco años de FECHA_ADD), llena la
+copia local una vez y luego simula un día: llegan `--nuevas` filas con fecha
+de mañana y un par de filas atrasadas con la fecha de la marca. Se compara el
+tiempo de bajar todo de nuevo contra actualizar() + leer la copia, y se
+verifica que la copia quede igual a la tabla.
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from cache_extractos import CacheExtracto  # noqa: E402
+from carga_masiva import reemplazar_tabla  # noqa: E402
+from extraccion_asistencia import CONSULTA_ASISTENCIA, DIAS_SEMANA, leer_asistencia, procesar_chunks  # noqa: E402
+
+COLUMNAS = {
+    'RUN': 'INT', 'NOMBRE_DIA': 'VARCHAR(10)', 'FECHA_ADD': 'DATETIME', 'HORA': 'VARCHAR(8)', 'EDAD': 'INT',
+    'COD_SEXO': 'CHAR(1)', 'COD_ASISTENCIA': 'CHAR(1)', 'ID_GRUPO': 'INT', 'NOMBRE_GRUPO': 'VARCHAR(100)',
+    'NOMBRE_PRESTACION': 'VARCHAR(200)', 'CONFIRMACION_TELEFONICA': 'CHAR(1)',
+}
+
+
+def filas_sinteticas(filas, desde, dias, semilla):
+    rnd = np.random.default_rng(semilla)
+    fechas = (pd.Timestamp(desde) + pd.to_timedelta(rnd.integers(0, dias, filas), unit='D')
+              + pd.to_timedelta(rnd.integers(0, 86400, filas), unit='s'))
+    return pd.DataFrame({
+        'RUN': rnd.integers(5_000_000, 5_500_000, filas),
+        'NOMBRE_DIA': np.array(DIAS_SEMANA)[fechas.dayofweek],
+        'FECHA_ADD': fechas.strftime('%Y-%m-%d %H:%M:%S'),
+        'HORA': pd.Series(rnd.integers(8, 20, filas)).map('{:02d}:00:00'.format).to_numpy(),
+        'EDAD': rnd.integers(0, 100, filas),
+        'COD_SEXO': rnd.choice(['F', 'M'], filas),
+        'COD_ASISTENCIA': rnd.choice(['A', 'S', 'N'], filas, p=[0.6, 0.1, 0.3]),
+        'ID_GRUPO': rnd.integers(1, 40, filas),
+        'NOMBRE_GRUPO': rnd.choice([f'GRUPO {i}' for i in range(40)], filas),
+        'NOMBRE_PRESTACION': rnd.choice([f'PRESTACION {i:04d}' for i in range(600)], filas),
+        'CONFIRMACION_TELEFONICA': rnd.choice(['S', 'N'], filas),
+    })
+
+
+def insertar(conexion, df):
+    conexion.executemany(
+        f"INSERT INTO JMC_PREDICCION_ASISTENCIA ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})",
+        df[list(COLUMNAS)].astype(object).values.tolist(),
+    )
+    conexion.commit()
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def huella(df):
+    """Suma de hashes por fila, independiente del orden"""
+    df = df[list(COLUMNAS)].copy()
+    df['FECHA_ADD'] = pd.to_datetime(df['FECHA_ADD'])
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=2_000_000)
+    parser.add_argument('--nuevas', type=int, default=5000)
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp())
+    conexion = sqlite3.connect(directorio / 'hospital.db')
+    reemplazar_tabla(conexion, 'JMC_PREDICCION_ASISTENCIA', filas_sinteticas(args.filas, '2020-01-01', 5 * 365, 0),
+                     COLUMNAS, tamano_lote=100_000)
+
+    extracto = CacheExtracto('asistencia', CONSULTA_ASISTENCIA, directorio=directorio / 'extractos')
+    segundos, filas = cronometrar(lambda: extracto.actualizar(conexion))
+    print(f"llenado inicial: {filas} filas en {segundos:.1f}s, {len(extracto.particiones())} particiones, "
+          f"marca {extracto.marca()}")
+
+    # Un día después: filas de mañana y algunas que llegan tarde con la fecha de la marca
+    marca = extracto.marca()
+    manana = filas_sinteticas(args.nuevas, marca.normalize() + pd.Timedelta(days=1), 1, 1)
+    atrasadas = filas_sinteticas(3, marca.normalize(), 1, 2)
+    insertar(conexion, pd.concat([manana, atrasadas]))
+
+    print(f"\n{'variante':<38} {'segundos':>9}")
+    completo, _ = cronometrar(lambda: leer_asistencia(conexion))
+    print(f"{'read_sql de todo el extracto':<38} {completo:>9.2f}")
+    actualizar, filas = cronometrar(lambda: extracto.actualizar(conexion))
+    leer, _ = cronometrar(lambda: procesar_chunks(extracto.chunks()))
+    print(f"{f'actualizar() ({filas} filas bajadas)':<38} {actualizar:>9.2f}")
+    print(f"{'leer la copia local':<38} {leer:>9.2f}")
+    print(f"{'total con copia local':<38} {actualizar + leer:>9.2f}")
+
+    tabla = pd.read_sql(CONSULTA_ASISTENCIA, conexion)
+    copia = extracto.leer()
+    assert len(copia) == len(tabla), (len(copia), len(tabla))
+    assert huella(copia) == huella(tabla)
+    print(f"\nLa copia local tiene las mismas {len(copia)} filas que la tabla")
+
+
+if __name__ == '__main__':
+    main()
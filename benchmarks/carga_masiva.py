@@ -0,0 +1,121 @@
+"""Escritura de PROBABILIDAD_ASISTENCIA: iterrows + execute por fila vs carga por lotes con tabla auxiliar.
+
+Uso:
+    python benchmarks/carga_masiva.py [--filas 200000] [--lotes 1000,10000,50000]
+
+Usa SQLite en un archivo temporal (WAL). Mientras se escribe, un lector en
+otra conexión cuenta las filas de la tabla una y otra vez: con DELETE + INSERT
+fila a fila ve la tabla vacía o a medias; con la tabla auxiliar siempre ve la
+versión completa, anterior o nueva.
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from carga_masiva import reemplazar_tabla  # noqa: E402
+
+TABLA = 'PROBABILIDAD_ASISTENCIA'
+COLUMNAS = {
+    'RUN': 'VARCHAR(50)',
+    'PROBABILIDAD_ASISTENCIA': 'FLOAT',
+    'TOTAL_ASISTENCIAS': 'INT',
+    'PORCENTAJE_ASISTENCIA': 'FLOAT',
+}
+
+
+def datos(filas, semilla=0):
+    rnd = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'RUN': (rnd.choice(30_000_000, filas, replace=False) + 1_000_000).astype(str),
+        'PROBABILIDAD_ASISTENCIA': rnd.random(filas),
+        'TOTAL_ASISTENCIAS': rnd.integers(0, 50, filas),
+        'PORCENTAJE_ASISTENCIA': rnd.random(filas),
+    })
+
+
+def fila_a_fila(conexion, df):
+    """Lo que hacía asistencia.py: DELETE, un INSERT por fila dentro de iterrows y un commit al final"""
+    cursor = conexion.cursor()
+    cursor.execute(f"DELETE FROM {TABLA}")
+    conexion.commit()
+    for _, row in df.iterrows():
+        cursor.execute(
+            f"INSERT INTO {TABLA} (RUN, PROBABILIDAD_ASISTENCIA, TOTAL_ASISTENCIAS, PORCENTAJE_ASISTENCIA)"
+            " VALUES (?, ?, ?, ?)",
+            (row['RUN'], row['PROBABILIDAD_ASISTENCIA'], int(row['TOTAL_ASISTENCIAS']), row['PORCENTAJE_ASISTENCIA']),
+        )
+    conexion.commit()
+
+
+class Lector(threading.Thread):
+    """Cuenta filas continuamente y guarda el mínimo que llegó a ver"""
+
+    def __init__(self, ruta):
+        super().__init__(daemon=True)
+        self.ruta = ruta
+        self.minimo = None
+        self.parar = threading.Event()
+
+    def run(self):
+        conexion = sqlite3.connect(self.ruta, timeout=30)
+        while not self.parar.is_set():
+            try:
+                filas = conexion.execute(f"SELECT COUNT(*) FROM {TABLA}").fetchone()[0]
+            except sqlite3.OperationalError:
+                filas = 0  # la tabla no existía en ese instante
+            self.minimo = filas if self.minimo is None else min(self.minimo, filas)
+            time.sleep(0.001)
+
+
+def medir(ruta, cargar):
+    conexion = sqlite3.connect(ruta, timeout=30)
+    lector = Lector(ruta)
+    lector.start()
+    inicio = time.perf_counter()
+    cargar(conexion)
+    segundos = time.perf_counter() - inicio
+    lector.parar.set()
+    lector.join()
+    filas = conexion.execute(f"SELECT COUNT(*) FROM {TABLA}").fetchone()[0]
+    conexion.close()
+    return segundos, lector.minimo, filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--lotes', default='1000,10000,50000')
+    args = parser.parse_args()
+
+    ruta = str(Path(tempfile.mkdtemp()) / 'carga.db')
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.close()
+    anterior, nuevo = datos(args.filas, 0), datos(args.filas, 1)
+    # Versión "de ayer" ya publicada, para que el lector tenga algo que ver
+    conexion = sqlite3.connect(ruta)
+    reemplazar_tabla(conexion, TABLA, anterior, COLUMNAS)
+    conexion.close()
+
+    print(f"{args.filas} filas; el lector nunca debería ver menos que eso")
+    print(f"{'variante':<26} {'segundos':>9} {'filas/s':>10} {'mín. visto':>11}")
+    variantes = [('iterrows + execute', lambda c: fila_a_fila(c, nuevo))]
+    for lote in (int(x) for x in args.lotes.split(',')):
+        variantes.append((f"lotes de {lote}", lambda c, lote=lote: reemplazar_tabla(c, TABLA, nuevo, COLUMNAS, lote)))
+    for nombre, cargar in variantes:
+        segundos, minimo, filas = medir(ruta, cargar)
+        assert filas == args.filas
+        print(f"{nombre:<26} {segundos:>9.2f} {filas / segundos:>10.0f} {minimo:>11}")
+
+
+if __name__ == '__main__':
+    main()
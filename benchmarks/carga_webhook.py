@@ -0,0 +1,273 @@
+"""Prueba de carga y latencia del webhook /whatsapp.
+
+Uso:
+    python benchmarks/carga_webhook.py                          # en proceso (Flask test client)
+    python benchmarks/carga_webhook.py --gunicorn --workers 4   # levanta gunicorn local
+    python benchmarks/carga_webhook.py --url http://127.0.0.1:8000/whatsapp
+    python benchmarks/carga_webhook.py --salida hoy.json --comparar ayer.json
+
+Se reproducen formularios como los que envía Twilio (Body, From, MessageSid)
+en cuatro escenarios: FAQ con respuesta, FAQ sin respuesta, el flujo completo
+de agendamiento y miles de números distintos con conversaciones abiertas a la
+vez. Para no tocar data/ se genera una agenda sintética con cupos futuros en
+un directorio temporal (CITAS_RUTA); reservas y deduplicación de mensajes
+también quedan allí, y las sesiones pasan a SQLite cuando hay varios workers.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+MENSAJES_FAQ = ["horario", "ubicación", "requisitos", "teléfono", "urgencias", "especialidades",
+                "¿Dónde está ubicado el hospital?", "que documentos necesito"]
+MENSAJES_SIN_FAQ = ["hola", "buenas tardes", "gracias", "jajaja", "quiero pedir una pizza", "ok 👍"]
+ESPECIALIDADES = ["Cardiología", "Ginecología", "Pediatría", "Traumatología"]
+MEDICOS = {"Cardiología": "Dr. Tomás Valenzuela", "Ginecología": "Dra. Fernanda Soto",
+           "Pediatría": "Dra. Camila Herrera", "Traumatología": "Dr. Matías Riquelme"}
+
+
+def agenda_sintetica(ruta, dias=30):
+    """Cupos cada 15 minutos de 08:00 a 17:00, desde mañana, para cada especialidad"""
+    inicio = (datetime.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    citas = []
+    for dia in range(dias):
+        for especialidad in ESPECIALIDADES:
+            hora = inicio + timedelta(days=dia)
+            while hora.hour < 17:
+                citas.append({'id': len(citas) + 1, 'fecha': hora.strftime('%Y-%m-%d'),
+                              'hora': hora.strftime('%H:%M:%S'), 'disponible': 1,
+                              'medico': MEDICOS[especialidad], 'especialidad': especialidad})
+                hora += timedelta(minutes=15)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'citas': citas}, f, ensure_ascii=False)
+    return len(citas)
+
+
+def numero(i):
+    return f"whatsapp:+569{i:08d}"
+
+
+def escenarios(mensajes, numeros_simultaneos, rnd):
+    """Cada escenario es una lista de rondas; cada ronda, una lista de conversaciones (From, [Body...])"""
+    conversaciones_faq = [(numero(i), [rnd.choice(MENSAJES_FAQ)]) for i in range(mensajes)]
+    conversaciones_sin = [(numero(i), [rnd.choice(MENSAJES_SIN_FAQ)]) for i in range(mensajes)]
+    flujos = [
+        (numero(100000 + i), ["agendar", f"Paciente {i}", rnd.choice(ESPECIALIDADES), str(rnd.randint(1, 3))])
+        for i in range(max(mensajes // 4, 1))
+    ]
+    # Muchos números a la vez: todos avanzan un paso por ronda, así las sesiones quedan abiertas
+    masivos = [numero(200000 + i) for i in range(numeros_simultaneos)]
+    rondas_masivas = [
+        [(n, ["agendar"]) for n in masivos],
+        [(n, [f"Paciente {n[-4:]}"]) for n in masivos],
+        [(n, [rnd.choice(MENSAJES_FAQ)]) for n in masivos],
+    ]
+    return {
+        'faq_hit': [conversaciones_faq],
+        'faq_miss': [conversaciones_sin],
+        'flujo_agendar': [flujos],
+        'muchos_numeros': rondas_masivas,
+    }
+
+
+def formulario(de, cuerpo):
+    return {'Body': cuerpo, 'From': de, 'To': 'whatsapp:+14155238886', 'MessageSid': f"SM{uuid.uuid4().hex}"}
+
+
+class ClienteEnProceso:
+    def __init__(self):
+        import app
+        self.cliente = app.app.test_client()
+
+    def enviar(self, de, cuerpo):
+        respuesta = self.cliente.post('/whatsapp', data=formulario(de, cuerpo))
+        return respuesta.status_code
+
+
+class ClienteHTTP:
+    def __init__(self, url):
+        import requests
+        self.url = url
+        self.requests = requests
+        self.sesiones = {}
+
+    def enviar(self, de, cuerpo):
+        # Una sesión keep-alive por hilo, como varios clientes de Twilio en paralelo
+        hilo = threading.get_ident()
+        if hilo not in self.sesiones:
+            self.sesiones[hilo] = self.requests.Session()
+        sesion = self.sesiones[hilo]
+        return sesion.post(self.url, data=formulario(de, cuerpo), timeout=30).status_code
+
+
+def conversar(cliente, de, cuerpos):
+    resultados = []
+    for cuerpo in cuerpos:
+        inicio = time.perf_counter()
+        try:
+            codigo = cliente.enviar(de, cuerpo)
+        except Exception:
+            codigo = None
+        resultados.append(((time.perf_counter() - inicio) * 1000, codigo == 200))
+    return resultados
+
+
+def percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+
+def ejecutar(cliente, rondas, concurrencia):
+    resultados = []
+    inicio = time.perf_counter()
+    for ronda in rondas:
+        if concurrencia <= 1:
+            for de, cuerpos in ronda:
+                resultados += conversar(cliente, de, cuerpos)
+        else:
+            with ThreadPoolExecutor(concurrencia) as pool:
+                for parcial in pool.map(lambda c: conversar(cliente, *c), ronda):
+                    resultados += parcial
+    duracion = time.perf_counter() - inicio
+    latencias = sorted(ms for ms, _ in resultados)
+    return {
+        'peticiones': len(resultados),
+        'errores': sum(1 for _, ok in resultados if not ok),
+        'duracion_s': round(duracion, 3),
+        'rps': round(len(resultados) / duracion, 1),
+        'p50_ms': round(statistics.median(latencias), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+    }
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def esperar_servidor(puerto, proceso, limite=30):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise RuntimeError("gunicorn terminó antes de aceptar conexiones")
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+def comparar(actual, ruta_anterior):
+    with open(ruta_anterior, 'r', encoding='utf-8') as f:
+        anterior = json.load(f)['escenarios']
+    print(f"\nComparación con {ruta_anterior}:")
+    for nombre, datos in actual.items():
+        if nombre not in anterior:
+            continue
+        cambios = []
+        for metrica in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            antes = anterior[nombre][metrica]
+            variacion = (datos[metrica] - antes) / antes * 100 if antes else 0.0
+            cambios.append(f"{metrica} {variacion:+.1f}%")
+        print(f"  {nombre:<16} " + "  ".join(cambios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument('--url', help="webhook ya levantado (no se crea agenda sintética)")
+    destino.add_argument('--gunicorn', action='store_true', help="levantar gunicorn local")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrencia', type=int, default=16, help="clientes simultáneos (modo HTTP)")
+    parser.add_argument('--mensajes', type=int, default=2000, help="mensajes por escenario FAQ")
+    parser.add_argument('--numeros', type=int, default=3000, help="números simultáneos en muchos_numeros")
+    parser.add_argument('--escenario', action='append', help="ejecutar sólo estos escenarios")
+    parser.add_argument('--salida', help="guardar resultados en JSON")
+    parser.add_argument('--comparar', help="JSON de una corrida anterior")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    servidor = None
+    with tempfile.TemporaryDirectory() as directorio:
+        if not args.url:
+            ruta_citas = Path(directorio) / 'citas.json'
+            cupos = agenda_sintetica(ruta_citas)
+            # Todo lo que la app guarda en disco queda en el directorio temporal
+            os.environ.update({
+                'CITAS_RUTA': str(ruta_citas),
+                'FAQ_RECARGA_SEGUNDOS': '0',
+                'RESERVAS_RUTA': str(Path(directorio) / 'reservas.db'),
+                'DEDUP_RUTA': str(Path(directorio) / 'mensajes.db'),
+            })
+            if args.gunicorn:
+                os.environ.update({
+                    'SESIONES_BACKEND': 'sqlite', 'SESIONES_RUTA': str(Path(directorio) / 'sesiones.db'),
+                    'RESERVAS_BACKEND': 'sqlite',
+                })
+            print(f"Agenda sintética: {cupos} cupos en {ruta_citas}")
+
+        if args.gunicorn:
+            puerto = puerto_libre()
+            servidor = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'app:app', '-w', str(args.workers),
+                 '-b', f"127.0.0.1:{puerto}", '--log-level', 'warning'],
+                cwd=RAIZ,
+            )
+            esperar_servidor(puerto, servidor)
+            cliente, modo, concurrencia = ClienteHTTP(f"http://127.0.0.1:{puerto}/whatsapp"), 'gunicorn', args.concurrencia
+        elif args.url:
+            cliente, modo, concurrencia = ClienteHTTP(args.url), 'http', args.concurrencia
+        else:
+            # Los INFO del bot dentro del mismo proceso distorsionarían las latencias
+            logging.disable(logging.INFO)
+            cliente, modo, concurrencia = ClienteEnProceso(), 'en_proceso', 1
+
+        try:
+            resultados = {}
+            print(f"{'escenario':<16} {'pet':>7} {'err':>5} {'rps':>9} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+            for nombre, rondas in escenarios(args.mensajes, args.numeros, rnd).items():
+                if args.escenario and nombre not in args.escenario:
+                    continue
+                r = ejecutar(cliente, rondas, concurrencia)
+                resultados[nombre] = r
+                print(f"{nombre:<16} {r['peticiones']:>7} {r['errores']:>5} {r['rps']:>9.1f} "
+                      f"{r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['p99_ms']:>8.3f}")
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.wait(timeout=10)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump({
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'modo': modo,
+                'workers': args.workers if args.gunicorn else None,
+                'concurrencia': concurrencia,
+                'escenarios': resultados,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.salida}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Webhook de OtrosPY/appBBDD.py con la base caída: latencia por "agendar" con y sin cortocircuito.
+
+Uso:
+    python benchmarks/circuito_disponibilidad.py [--timeout 1.0] [--mensajes 20] [--latencia-ms 20]
+
+Se reemplaza la base por un backend de prueba que agrega `--latencia-ms` a cada
+consulta, falla al azar con `--tasa-fallos` y, mientras está "caído", tarda
+`--timeout` segundos y lanza TimeoutError como lo haría el driver ODBC. Se
+recorren tres fases (sana, caída, recuperada) y se verifica que con el circuito
+abierto se ofrezcan los últimos cupos conocidos marcados como tales.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+AVISO_RESPALDO = 'No pudimos consultar la agenda'
+
+
+class BackendInestable:
+    def __init__(self, real, latencia=0.0, tasa_fallos=0.0, timeout=1.0, semilla=0):
+        self.real = real
+        self.latencia = latencia
+        self.tasa_fallos = tasa_fallos
+        self.timeout = timeout
+        self.caido = False
+        self.llamadas = 0
+        self.rnd = random.Random(semilla)
+
+    def _esperar(self):
+        self.llamadas += 1
+        if self.caido:
+            time.sleep(self.timeout)
+            raise TimeoutError('Login timeout expired')
+        time.sleep(self.latencia)
+        if self.rnd.random() < self.tasa_fallos:
+            raise ConnectionError('Communication link failure')
+
+    def cupos_disponibles(self, dia, limite=3, especialidad=None):
+        self._esperar()
+        return self.real.cupos_disponibles(dia, limite, especialidad)
+
+    def reservar(self, cupo_id, telefono=None):
+        self._esperar()
+        return self.real.reservar(cupo_id, telefono)
+
+
+def fase(cliente, nombre, mensajes):
+    latencias = []
+    respaldo = sin_cupos = 0
+    for i in range(mensajes):
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/whatsapp', data={'From': f"{nombre}-{i}", 'Body': 'agendar'}).data.decode()
+        latencias.append(time.perf_counter() - inicio)
+        respaldo += AVISO_RESPALDO in respuesta
+        sin_cupos += 'No hay horas disponibles' in respuesta
+    return sum(latencias) / len(latencias) * 1000, respaldo, sin_cupos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--timeout', type=float, default=1.0, help="lo que tarda en fallar la base caída")
+    parser.add_argument('--mensajes', type=int, default=20, help="mensajes por fase")
+    parser.add_argument('--latencia-ms', type=float, default=20)
+    parser.add_argument('--tasa-fallos', type=float, default=0.0)
+    parser.add_argument('--espera', type=float, default=1.0, help="segundos con el circuito abierto")
+    args = parser.parse_args()
+
+    os.environ.update({
+        'BBDD_BACKEND': 'sqlite',
+        'BBDD_RUTA': str(Path(tempfile.mkdtemp()) / 'reservas.db'),
+        'DISPONIBILIDAD_TTL_SEGUNDOS': '0',
+        'CIRCUITO_ESPERA_SEGUNDOS': str(args.espera),
+    })
+    import appBBDD
+    from circuito import Cortocircuito
+
+    class Reloj(datetime):
+        # Los cupos de ejemplo en data/citas.json son del 16-04-2025
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 4, 16, 8, 0)
+
+    appBBDD.datetime = Reloj
+    appBBDD.print = lambda *a, **k: None
+    real = appBBDD.BBDD
+    cliente = appBBDD.app.test_client()
+
+    print(f"{'variante':<14} {'fase':<11} {'ms/agendar':>11} {'respaldo':>9} {'sin cupos':>10} {'consultas':>10}")
+    for variante, fallos_maximos in (('sin circuito', float('inf')), ('con circuito', 3)):
+        backend = BackendInestable(real, args.latencia_ms / 1000, args.tasa_fallos, args.timeout)
+        appBBDD.BBDD = backend
+        appBBDD.CIRCUITO = Cortocircuito(fallos_maximos, args.espera)
+        appBBDD.ULTIMOS_CUPOS.clear()
+        for nombre in ('sana', 'caida', 'recuperada'):
+            backend.caido = nombre == 'caida'
+            if nombre == 'recuperada':
+                time.sleep(args.espera)
+            antes = backend.llamadas
+            ms, respaldo, sin_cupos = fase(cliente, f"{variante}-{nombre}", args.mensajes)
+            print(f"{variante:<14} {nombre:<11} {ms:>11.1f} {respaldo:>9} {sin_cupos:>10} {backend.llamadas - antes:>10}")
+            if nombre == 'caida':
+                assert respaldo == args.mensajes, "con la base caída se deben ofrecer los últimos cupos conocidos"
+        assert appBBDD.CIRCUITO.estado == 'cerrado'
+
+
+if __name__ == '__main__':
+    main()
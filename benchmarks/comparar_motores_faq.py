@@ -0,0 +1,111 @@
+"""Compara exactitud y latencia de los motores de FAQ (fuzzy vs TF-IDF).
+
+Uso:
+    python benchmarks/comparar_motores_faq.py [--escala 5000] [--semilla 42]
+
+Las consultas se generan a partir de data/faqs.json: keywords y preguntas tal
+cual, sin tildes y con un error de tipeo, más mensajes ajenos al catálogo que
+no deberían tener respuesta. Con --escala se agregan FAQ sintéticas para medir
+cómo crece la latencia con el tamaño del catálogo.
+"""
+import argparse
+import json
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from faq_index import IndiceFAQ, normalizar  # noqa: E402
+from faq_tfidf import MotorTFIDF  # noqa: E402
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+MENSAJES_AJENOS = [
+    "quiero pedir una pizza",
+    "cuánto cuesta el dólar hoy",
+    "me gusta el fútbol",
+    "gracias",
+    "jajaja",
+    "buenas noches",
+    "xq no me contestas",
+    "ok",
+]
+
+
+def con_error(texto, rnd):
+    if len(texto) < 4:
+        return texto
+    i = rnd.randrange(len(texto))
+    return texto[:i] + rnd.choice(string.ascii_lowercase) + texto[i + 1:]
+
+
+def consultas_etiquetadas(faqs, rnd):
+    consultas = []
+    for faq in faqs:
+        textos = [faq['pregunta']] + [kw.strip() for kw in faq.get('keywords', '').split(',') if kw.strip()]
+        for texto in textos:
+            for variante in (texto, normalizar(texto), con_error(texto, rnd)):
+                consultas.append((variante, faq['respuesta']))
+    consultas += [(mensaje, None) for mensaje in MENSAJES_AJENOS]
+    return consultas
+
+
+def catalogo_sintetico(faqs, tamano, rnd):
+    palabras = [p for faq in faqs for p in (faq['pregunta'] + ' ' + faq['keywords']).replace(',', ' ').split()]
+    sinteticas = []
+    for i in range(tamano):
+        sinteticas.append({
+            'id': 10000 + i,
+            'pregunta': f"¿{' '.join(rnd.sample(palabras, 4))} {i}?",
+            'keywords': ', '.join(f"{rnd.choice(palabras)}{i}" for _ in range(5)),
+            'respuesta': f"Respuesta sintética {i}",
+        })
+    return faqs + sinteticas
+
+
+def medir(motor, consultas):
+    latencias = []
+    aciertos = 0
+    for texto, esperada in consultas:
+        inicio = time.perf_counter()
+        respuesta = motor.buscar(texto)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        aciertos += respuesta == esperada
+    latencias.sort()
+    return {
+        'exactitud': aciertos / len(consultas),
+        'p50_ms': statistics.median(latencias),
+        'p95_ms': latencias[int(len(latencias) * 0.95) - 1],
+        'media_ms': statistics.fmean(latencias),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--escala', type=int, default=0, help="FAQ sintéticas adicionales")
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.semilla)
+    with open(DATA_DIR / 'faqs.json', 'r', encoding='utf-8') as f:
+        faqs = json.load(f)['faqs']
+    consultas = consultas_etiquetadas(faqs, rnd)
+    catalogo = catalogo_sintetico(faqs, args.escala, rnd) if args.escala else faqs
+
+    print(f"Catálogo: {len(catalogo)} FAQ, {len(consultas)} consultas")
+    print(f"{'motor':<8} {'carga_ms':>9} {'exactitud':>10} {'p50_ms':>8} {'p95_ms':>8} {'media_ms':>9}")
+    for nombre, clase in (('fuzzy', IndiceFAQ), ('tfidf', MotorTFIDF)):
+        inicio = time.perf_counter()
+        motor = clase(catalogo)
+        carga_ms = (time.perf_counter() - inicio) * 1000
+        r = medir(motor, consultas)
+        print(f"{nombre:<8} {carga_ms:>9.1f} {r['exactitud']:>10.1%} {r['p50_ms']:>8.3f} "
+              f"{r['p95_ms']:>8.3f} {r['media_ms']:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark de contención: muchos procesos compitiendo por los mismos cupos.
+
+Uso:
+    python benchmarks/contencion_reservas.py [--procesos 8] [--cupos 200] [--intentos 2000]
+
+Cada proceso abre su propia conexión al mismo archivo SQLite (como un worker
+de gunicorn) e intenta reservar cupos elegidos al azar entre pocos cupos
+"calientes". Al final se verifica que ningún cupo haya sido ganado dos veces.
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agenda import Cupo  # noqa: E402
+from reservas import ReservasSQLite  # noqa: E402
+
+
+def competir(ruta, cupos, intentos, semilla, barrera, cola):
+    reservas = ReservasSQLite(ruta)
+    rnd = random.Random(semilla)
+    ganados = []
+    barrera.wait()
+    inicio = time.perf_counter()
+    for _ in range(intentos):
+        cupo_id = rnd.randrange(1, cupos + 1)
+        if reservas.reservar(cupo_id):
+            ganados.append(cupo_id)
+    cola.put((ganados, time.perf_counter() - inicio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--procesos', type=int, default=8)
+    parser.add_argument('--cupos', type=int, default=200)
+    parser.add_argument('--intentos', type=int, default=2000, help="intentos por proceso")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = Path(directorio) / 'reservas.db'
+        cupos = [Cupo(i, None, True, 'Dr. Prueba', 'General') for i in range(1, args.cupos + 1)]
+        ReservasSQLite(ruta, cupos)
+
+        barrera = multiprocessing.Barrier(args.procesos)
+        cola = multiprocessing.Queue()
+        procesos = [
+            multiprocessing.Process(target=competir, args=(ruta, args.cupos, args.intentos, i, barrera, cola))
+            for i in range(args.procesos)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        resultados = [cola.get() for _ in procesos]
+        for proceso in procesos:
+            proceso.join()
+
+    ganados = Counter(cupo_id for lista, _ in resultados for cupo_id in lista)
+    duracion = max(segundos for _, segundos in resultados)
+    intentos = args.procesos * args.intentos
+    dobles = sum(1 for veces in ganados.values() if veces > 1)
+
+    print(f"procesos={args.procesos} cupos={args.cupos} intentos={intentos}")
+    print(f"reservas exitosas: {sum(ganados.values())} (cupos distintos: {len(ganados)})")
+    print(f"intentos/s: {intentos / duracion:,.0f}")
+    print(f"reservas/s: {sum(ganados.values()) / duracion:,.0f}")
+    print(f"dobles reservas: {dobles}")
+    sys.exit(1 if dobles else 0)
+
+
+if __name__ == '__main__':
+    main()
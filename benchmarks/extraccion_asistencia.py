@@ -0,0 +1,154 @@
+"""Memoria y tiempo de cargar JMC_PREDICCION_ASISTENCIA: read_sql completo vs chunks con tipos compactos.
+
+Uso:
+    python benchmarks/extraccion_asistencia.py [--filas 3000000] [--chunk 100000] [--bbdd /tmp/asistencia.db]
+
+Genera (o reutiliza) un extracto sintético en SQLite con las columnas de
+JMC_PREDICCION_ASISTENCIA y corre cada variante en un proceso aparte hasta
+obtener las features del modelo, midiendo el pico de memoria (VmHWM) y el
+tiempo. Ambas variantes deben producir las mismas features e historial.
+"""
+import argparse
+import json
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from carga_masiva import reemplazar_tabla  # noqa: E402
+from extraccion_asistencia import CONSULTA_ASISTENCIA, DIAS_SEMANA, leer_asistencia  # noqa: E402
+
+FEATURES = ["EDAD", "COD_SEXO", "DIA_NUM", "HORA", "ID_GRUPO", "NOMBRE_PRESTACION",
+            "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"]
+DIAS = {dia: numero for numero, dia in enumerate(DIAS_SEMANA)}
+
+
+def generar(ruta, filas, semilla=0):
+    rnd = np.random.default_rng(semilla)
+    pacientes = max(1, filas // 6)
+    fechas = pd.Timestamp('2020-01-01') + pd.to_timedelta(rnd.integers(0, 5 * 365, filas), unit='D')
+    df = pd.DataFrame({
+        'RUN': rnd.integers(5_000_000, 5_000_000 + pacientes * 3, filas),
+        'NOMBRE_DIA': np.array(DIAS_SEMANA)[fechas.dayofweek],
+        'FECHA_ADD': fechas.strftime('%Y-%m-%d 00:00:00'),
+        'HORA': pd.Series(rnd.integers(8, 20, filas)).map('{:02d}:00:00'.format).to_numpy(),
+        'EDAD': rnd.integers(0, 100, filas),
+        'COD_SEXO': rnd.choice(['F', 'M'], filas),
+        'COD_ASISTENCIA': rnd.choice(['A', 'S', 'N', 'X'], filas, p=[0.6, 0.1, 0.29, 0.01]),
+        'ID_GRUPO': rnd.integers(1, 40, filas),
+        'NOMBRE_GRUPO': rnd.choice([f'GRUPO {i}' for i in range(40)], filas),
+        'NOMBRE_PRESTACION': rnd.choice([f'PRESTACION {i:04d}' for i in range(600)], filas),
+        'CONFIRMACION_TELEFONICA': rnd.choice(['S', 'N'], filas),
+    })
+    conexion = sqlite3.connect(ruta)
+    reemplazar_tabla(conexion, 'JMC_PREDICCION_ASISTENCIA', df, {
+        'RUN': 'INT', 'NOMBRE_DIA': 'VARCHAR(10)', 'FECHA_ADD': 'DATETIME', 'HORA': 'VARCHAR(8)', 'EDAD': 'INT',
+        'COD_SEXO': 'CHAR(1)', 'COD_ASISTENCIA': 'CHAR(1)', 'ID_GRUPO': 'INT', 'NOMBRE_GRUPO': 'VARCHAR(100)',
+        'NOMBRE_PRESTACION': 'VARCHAR(200)', 'CONFIRMACION_TELEFONICA': 'CHAR(1)',
+    }, tamano_lote=100_000)
+    conexion.close()
+
+
+def completo(conexion, chunk):
+    """Lo que hacía asistencia.py hasta armar X"""
+    df = pd.read_sql(CONSULTA_ASISTENCIA, conexion)
+    df["FECHA_ADD"] = pd.to_datetime(df["FECHA_ADD"])
+    df["HORA"] = pd.to_datetime(df["HORA"], format="%H:%M:%S", errors="coerce").dt.hour
+    df["ASISTENCIA"] = df["COD_ASISTENCIA"].map({"A": 1, "S": 1, "N": 0})
+    df["DIA_NUM"] = df["NOMBRE_DIA"].map(DIAS)
+    df["NOMBRE_PRESTACION"] = df["NOMBRE_PRESTACION"].astype("category").cat.codes
+    df["COD_SEXO"] = df["COD_SEXO"].map({"F": 1, "M": 0})
+    historial = df.groupby("RUN").agg(
+        TOTAL_CITAS=("ASISTENCIA", "count"),
+        TOTAL_ASISTENCIAS=("ASISTENCIA", "sum")
+    ).reset_index()
+    historial["PORCENTAJE_ASISTENCIA"] = historial["TOTAL_ASISTENCIAS"] / historial["TOTAL_CITAS"]
+    df = df.merge(historial, on="RUN", how="left")
+    for columna in ("TOTAL_CITAS", "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"):
+        df[columna] = df[columna].fillna(0)
+    return df, historial.set_index("RUN")
+
+
+def por_chunks(conexion, chunk):
+    """Lo que hace asistencia.py ahora hasta armar X"""
+    df, historial = leer_asistencia(conexion, chunk)
+    df["DIA_NUM"] = df["NOMBRE_DIA"].map(DIAS).astype("float32")
+    df["NOMBRE_PRESTACION"] = df["NOMBRE_PRESTACION"].cat.codes
+    df["COD_SEXO"] = df["COD_SEXO"].map({"F": 1, "M": 0}).astype("float32")
+    for columna in ("TOTAL_CITAS", "TOTAL_ASISTENCIAS", "PORCENTAJE_ASISTENCIA"):
+        df[columna] = df["RUN"].map(historial[columna]).fillna(0)
+    return df, historial
+
+
+def pico_mb():
+    # VmHWM es por proceso desde el exec; ru_maxrss en Linux hereda el pico del padre
+    with open('/proc/self/status') as estado:
+        for linea in estado:
+            if linea.startswith('VmHWM:'):
+                return int(linea.split()[1]) / 1024
+
+
+def trabajador(variante, ruta, chunk):
+    base = pico_mb()
+    inicio = time.perf_counter()
+    conexion = sqlite3.connect(ruta)
+    df, historial = {'completo': completo, 'chunks': por_chunks}[variante](conexion, chunk)
+    X = df[FEATURES]
+    segundos = time.perf_counter() - inicio
+    pico = pico_mb()
+    print(json.dumps({
+        'segundos': segundos,
+        'pico_mb': pico,
+        'sobre_base_mb': pico - base,
+        'df_mb': df.memory_usage(deep=True).sum() / 2 ** 20,
+        'sumas': {columna: float(X[columna].astype('float64').sum()) for columna in FEATURES},
+        'historial': [len(historial), int(historial['TOTAL_CITAS'].sum()), int(historial['TOTAL_ASISTENCIAS'].sum())],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=3_000_000)
+    parser.add_argument('--chunk', type=int, default=100_000)
+    parser.add_argument('--bbdd', default='/tmp/asistencia_sintetica.db')
+    parser.add_argument('--variante', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variante:
+        trabajador(args.variante, args.bbdd, args.chunk)
+        return
+
+    conexion = sqlite3.connect(args.bbdd)
+    try:
+        existentes = conexion.execute("SELECT COUNT(*) FROM JMC_PREDICCION_ASISTENCIA").fetchone()[0]
+    except sqlite3.OperationalError:
+        existentes = 0
+    conexion.close()
+    if existentes != args.filas:
+        print(f"Generando {args.filas} filas en {args.bbdd}...")
+        generar(args.bbdd, args.filas)
+
+    resultados = {}
+    print(f"{'variante':<10} {'segundos':>9} {'pico_MB':>9} {'sobre_base':>11} {'df_MB':>8}")
+    for variante in ('completo', 'chunks'):
+        salida = subprocess.run(
+            [sys.executable, __file__, '--variante', variante, '--bbdd', args.bbdd, '--chunk', str(args.chunk)],
+            capture_output=True, text=True, check=True,
+        )
+        r = resultados[variante] = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{variante:<10} {r['segundos']:>9.1f} {r['pico_mb']:>9.0f} {r['sobre_base_mb']:>11.0f} {r['df_mb']:>8.0f}")
+
+    assert resultados['completo']['historial'] == resultados['chunks']['historial']
+    for columna in FEATURES:
+        assert np.isclose(resultados['completo']['sumas'][columna], resultados['chunks']['sumas'][columna]), columna
+    print("Mismas features e historial en ambas variantes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""Historial por RUN: groupby sobre todo el extracto en cada corrida vs contadores incrementales en SQLite.
+
+Uso:
+    python benchmarks/historial_asistencia.py [--filas 2000000] [--dias 3] [--nuevas 5000] [--consultas 100000]
+
+Siembra JMC_PREDICCION_ASISTENCIA en SQLite y la copia local en Parquet
+(cache_extractos.py). Luego simula `--dias` días: cada día llegan `--nuevas`
+filas, algunas atrasadas con la fecha de la marca y algunas de pacientes que
+ya tenían citas. Por día se mide sincronizar() contra el groupby completo y se
+verifica que den lo mismo; al final se miden `--consultas` obtener(run) sueltos.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from cache_extractos import CacheExtracto  # noqa: E402
+from carga_masiva import reemplazar_tabla  # noqa: E402
+from extraccion_asistencia import ASISTIO, CONSULTA_ASISTENCIA, DIAS_SEMANA  # noqa: E402
+from historial_asistencia import HistorialAsistencia  # noqa: E402
+
+COLUMNAS = {
+    'RUN': 'INT', 'NOMBRE_DIA': 'VARCHAR(10)', 'FECHA_ADD': 'DATETIME', 'HORA': 'VARCHAR(8)', 'EDAD': 'INT',
+    'COD_SEXO': 'CHAR(1)', 'COD_ASISTENCIA': 'CHAR(1)', 'ID_GRUPO': 'INT', 'NOMBRE_GRUPO': 'VARCHAR(100)',
+    'NOMBRE_PRESTACION': 'VARCHAR(200)', 'CONFIRMACION_TELEFONICA': 'CHAR(1)',
+}
+
+
+def filas_sinteticas(filas, desde, dias, semilla):
+    rnd = np.random.default_rng(semilla)
+    fechas = (pd.Timestamp(desde) + pd.to_timedelta(rnd.integers(0, dias, filas), unit='D')
+              + pd.to_timedelta(rnd.integers(0, 86400, filas), unit='s'))
+    return pd.DataFrame({
+        'RUN': rnd.integers(5_000_000, 5_400_000, filas),
+        'NOMBRE_DIA': np.array(DIAS_SEMANA)[fechas.dayofweek],
+        'FECHA_ADD': fechas.strftime('%Y-%m-%d %H:%M:%S'),
+        'HORA': '10:00:00',
+        'EDAD': rnd.integers(0, 100, filas),
+        'COD_SEXO': rnd.choice(['F', 'M'], filas),
+        'COD_ASISTENCIA': rnd.choice(['A', 'S', 'N', 'X'], filas, p=[0.6, 0.1, 0.29, 0.01]),
+        'ID_GRUPO': rnd.integers(1, 40, filas),
+        'NOMBRE_GRUPO': 'GRUPO',
+        'NOMBRE_PRESTACION': 'PRESTACION',
+        'CONFIRMACION_TELEFONICA': 'S',
+    })
+
+
+def groupby_completo(extracto):
+    """Lo que hacía asistencia.py: groupby("RUN") sobre todas las filas"""
+    df = extracto.leer(['RUN', 'COD_ASISTENCIA'])
+    df['ASISTENCIA'] = df['COD_ASISTENCIA'].map(ASISTIO)
+    historial = df.groupby('RUN').agg(
+        TOTAL_CITAS=('ASISTENCIA', 'count'),
+        TOTAL_ASISTENCIAS=('ASISTENCIA', 'sum'),
+    )
+    historial.index = historial.index.astype(str)
+    return historial
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--filas', type=int, default=2_000_000)
+    parser.add_argument('--dias', type=int, default=3)
+    parser.add_argument('--nuevas', type=int, default=5000)
+    parser.add_argument('--consultas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    directorio = Path(tempfile.mkdtemp())
+    conexion = sqlite3.connect(directorio / 'hospital.db')
+    reemplazar_tabla(conexion, 'JMC_PREDICCION_ASISTENCIA', filas_sinteticas(args.filas, '2020-01-01', 5 * 365, 0),
+                     COLUMNAS, tamano_lote=100_000)
+    extracto = CacheExtracto('asistencia', CONSULTA_ASISTENCIA, directorio=directorio / 'extractos', solape_dias=1)
+    extracto.actualizar(conexion)
+    historial = HistorialAsistencia(directorio / 'historial.db')
+    segundos, filas = cronometrar(lambda: historial.sincronizar(extracto))
+    print(f"carga inicial del historial: {filas} filas en {segundos:.1f}s")
+
+    print(f"\n{'día':<12} {'groupby completo':>17} {'sincronizar':>12} {'filas releídas':>15}")
+    for dia in range(1, args.dias + 1):
+        marca = extracto.marca()
+        nuevas = filas_sinteticas(args.nuevas, marca.normalize() + pd.Timedelta(days=1), 1, dia)
+        atrasadas = filas_sinteticas(20, marca.normalize(), 1, 100 + dia)
+        df = pd.concat([nuevas, atrasadas])
+        conexion.executemany(
+            f"INSERT INTO JMC_PREDICCION_ASISTENCIA ({', '.join(COLUMNAS)}) VALUES ({', '.join('?' * len(COLUMNAS))})",
+            df[list(COLUMNAS)].astype(object).values.tolist(),
+        )
+        conexion.commit()
+        extracto.actualizar(conexion)
+
+        completo, esperado = cronometrar(lambda: groupby_completo(extracto))
+        incremental, filas = cronometrar(lambda: historial.sincronizar(extracto))
+        print(f"{str(extracto.marca().date()):<12} {completo:>16.2f}s {incremental:>11.2f}s {filas:>15}")
+
+        obtenido = historial.tabla()
+        assert len(obtenido) == len(esperado)
+        comparado = esperado.join(obtenido, rsuffix='_store')
+        assert (comparado['TOTAL_CITAS'] == comparado['TOTAL_CITAS_store']).all()
+        assert (comparado['TOTAL_ASISTENCIAS'] == comparado['TOTAL_ASISTENCIAS_store']).all()
+
+    runs = random.Random(0).choices(list(obtenido.index), k=args.consultas)
+    segundos, _ = cronometrar(lambda: [historial.obtener(run) for run in runs])
+    print(f"\nEl historial incremental coincide con el groupby completo ({len(obtenido)} RUN)")
+    print(f"obtener(run): {segundos / args.consultas * 1e6:.1f} µs por consulta")
+
+
+if __name__ == '__main__':
+    main()
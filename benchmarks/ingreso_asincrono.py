@@ -0,0 +1,154 @@
+"""Compara el modo síncrono con el asíncrono (ack inmediato + envío por API REST) con un backend lento.
+
+Uso:
+    python benchmarks/ingreso_asincrono.py [--mensajes 200] [--retardo-ms 100] [--hilos 8]
+
+Se levanta un Twilio falso local que recibe los POST a Messages.json y el webhook
+en un servidor HTTP de un solo hilo (como un worker síncrono de gunicorn). La
+búsqueda de FAQ se hace lenta artificialmente para simular una consulta SQL.
+Se mide cuántos mensajes por segundo acepta el webhook y cuánto tardan todas
+las respuestas en llegar al Twilio falso.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class TwilioFalso(BaseHTTPRequestHandler):
+    recibidos = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length', 0))
+        datos = parse_qs(self.rfile.read(largo).decode('utf-8'))
+        with self.lock:
+            self.recibidos.append((time.perf_counter(), datos))
+        cuerpo = json.dumps({'sid': f"SM{uuid.uuid4().hex}", 'status': 'queued'}).encode()
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def levantar(servidor):
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor
+
+
+def correr(app, puerto_webhook, mensajes, concurrencia, esperar_envios):
+    url = f"http://127.0.0.1:{puerto_webhook}/whatsapp"
+    TwilioFalso.recibidos.clear()
+    sesiones = {}
+
+    def enviar(i):
+        hilo = threading.get_ident()
+        if hilo not in sesiones:
+            sesiones[hilo] = requests.Session()
+        sesion = sesiones[hilo]
+        inicio = time.perf_counter()
+        sesion.post(url, data={'Body': 'horario', 'From': f"whatsapp:+569{i:08d}", 'MessageSid': f"SM{uuid.uuid4().hex}"})
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        latencias = sorted(pool.map(enviar, range(mensajes)))
+    aceptados = time.perf_counter() - inicio
+    if esperar_envios:
+        while len(TwilioFalso.recibidos) < mensajes and time.perf_counter() - inicio < 120:
+            time.sleep(0.01)
+        completados = max(t for t, _ in TwilioFalso.recibidos) - inicio
+        verificar_envios(mensajes)
+    else:
+        completados = aceptados
+    return {
+        'aceptados_por_s': mensajes / aceptados,
+        'p95_ack_ms': latencias[int(len(latencias) * 0.95) - 1] * 1000,
+        'respuestas_por_s': mensajes / completados,
+        'enviados_api': len(TwilioFalso.recibidos),
+    }
+
+
+def verificar_envios(mensajes):
+    """Cada número debe recibir exactamente una respuesta no vacía desde el número del bot"""
+    destinos = {}
+    for _, datos in TwilioFalso.recibidos:
+        assert datos.get('From') == [os.environ['TWILIO_WHATSAPP_NUMBER']], datos
+        assert datos.get('Body', [''])[0].strip(), datos
+        destinos[datos['To'][0]] = destinos.get(datos['To'][0], 0) + 1
+    esperados = {f"whatsapp:+569{i:08d}": 1 for i in range(mensajes)}
+    assert destinos == esperados, f"{len(destinos)} números con respuesta de {mensajes}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mensajes', type=int, default=200)
+    parser.add_argument('--retardo-ms', type=float, default=100, help="latencia simulada del backend")
+    parser.add_argument('--hilos', type=int, default=8, help="hilos del modo asíncrono")
+    parser.add_argument('--concurrencia', type=int, default=16, help="clientes simultáneos")
+    args = parser.parse_args()
+
+    twilio = levantar(ThreadingHTTPServer(('127.0.0.1', 0), TwilioFalso))
+    directorio = tempfile.mkdtemp()
+    os.environ.update({
+        'MODO_ASINCRONO': '1',
+        'ASINCRONO_HILOS': str(args.hilos),
+        'TWILIO_ACCOUNT_SID': 'ACfalso',
+        'TWILIO_AUTH_TOKEN': 'falso',
+        'TWILIO_WHATSAPP_NUMBER': 'whatsapp:+14155238886',
+        'TWILIO_API_URL': f"http://127.0.0.1:{twilio.server_port}",
+        'FAQ_RECARGA_SEGUNDOS': '0',
+        'LIMITE_RAFAGA': '1000000',
+        'CITAS_BITACORA': os.path.join(directorio, 'citas.journal'),
+        'RESERVAS_RUTA': os.path.join(directorio, 'reservas.db'),
+        'DEDUP_RUTA': os.path.join(directorio, 'mensajes.db'),
+    })
+    logging.disable(logging.INFO)
+    import app
+
+    # Backend lento simulado: cada búsqueda de FAQ espera como una consulta remota
+    buscar_original = app.CACHE_FAQS.buscar
+
+    def buscar_lento(pregunta, motor):
+        time.sleep(args.retardo_ms / 1000)
+        return buscar_original(pregunta, motor)
+
+    app.CACHE_FAQS.buscar = buscar_lento
+
+    # Un solo hilo atendiendo el webhook, como un worker síncrono
+    webhook = levantar(make_server('127.0.0.1', 0, app.app, threaded=False))
+    procesador = app.PROCESADOR
+
+    print(f"{args.mensajes} mensajes, backend {args.retardo_ms:.0f} ms, {args.concurrencia} clientes")
+    print(f"{'modo':<10} {'acept/s':>9} {'p95_ack_ms':>11} {'resp/s':>8} {'enviados':>9}")
+    for modo in ('sincrono', 'asincrono'):
+        app.PROCESADOR = procesador if modo == 'asincrono' else None
+        r = correr(app, webhook.server_port, args.mensajes, args.concurrencia, esperar_envios=modo == 'asincrono')
+        print(f"{modo:<10} {r['aceptados_por_s']:>9.1f} {r['p95_ack_ms']:>11.1f} "
+              f"{r['respuestas_por_s']:>8.1f} {r['enviados_api']:>9}")
+
+    webhook.shutdown()
+    twilio.shutdown()
+
+
+if __name__ == '__main__':
+    main()
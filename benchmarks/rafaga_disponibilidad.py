@@ -0,0 +1,91 @@
+"""Ráfaga de "agendar" tras un recordatorio: consultas a la base con y sin la cache de disponibilidad.
+
+Uso:
+    python benchmarks/rafaga_disponibilidad.py [--pacientes 200] [--retardo-ms 50] [--ttl 5]
+
+Los `--pacientes` hilos piden a la vez los cupos libres del mismo día contra
+el backend SQLite de OtrosPY/datos_reservas.py, con `--retardo-ms` de latencia
+agregada a cada consulta para simular SQL Server. Al final se reserva un cupo y
+se verifica que la siguiente lectura ya no lo ofrezca.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'OtrosPY'))
+
+from cache_disponibilidad import CacheDisponibilidad  # noqa: E402
+from datos_reservas import RepositorioReservas, crear_bbdd_sqlite, crear_pool_sqlite  # noqa: E402
+
+DIA = date(2025, 4, 16)
+
+
+class RepositorioLento(RepositorioReservas):
+    def __init__(self, pool, retardo):
+        super().__init__(pool, 'sqlite')
+        self.retardo = retardo
+        self.llamadas = 0
+        self.lock = threading.Lock()
+
+    def cupos_disponibles(self, dia, limite=3, especialidad=None):
+        with self.lock:
+            self.llamadas += 1
+        time.sleep(self.retardo)
+        return super().cupos_disponibles(dia, limite, especialidad)
+
+
+def rafaga(obtener, pacientes):
+    barrera = threading.Barrier(pacientes)
+    resultados = []
+
+    def paciente():
+        barrera.wait()
+        resultados.append(obtener(DIA, limite=3))
+
+    hilos = [threading.Thread(target=paciente) for _ in range(pacientes)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return time.perf_counter() - inicio, resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pacientes', type=int, default=200)
+    parser.add_argument('--retardo-ms', type=float, default=50)
+    parser.add_argument('--ttl', type=float, default=5)
+    args = parser.parse_args()
+
+    ruta = str(Path(tempfile.mkdtemp()) / 'reservas.db')
+    crear_bbdd_sqlite(ruta)
+    pool = crear_pool_sqlite(ruta, maximo=32, espera=60)
+
+    print(f"{args.pacientes} pacientes a la vez, backend {args.retardo_ms:.0f} ms")
+    print(f"{'variante':<12} {'consultas':>10} {'segundos':>9}")
+    for variante in ('sin cache', 'con cache'):
+        repositorio = RepositorioLento(pool, args.retardo_ms / 1000)
+        if variante == 'con cache':
+            cache = CacheDisponibilidad(repositorio.cupos_disponibles, ttl=args.ttl)
+            obtener = cache.obtener
+        else:
+            obtener = repositorio.cupos_disponibles
+        segundos, resultados = rafaga(obtener, args.pacientes)
+        assert all(list(r) == list(resultados[0]) for r in resultados)
+        print(f"{variante:<12} {repositorio.llamadas:>10} {segundos:>9.3f}")
+
+    # La reserva invalida el día: la siguiente lectura no debe ofrecer el cupo tomado
+    tomado = cache.obtener(DIA, limite=3)[0]
+    assert repositorio.reservar(tomado[4])
+    cache.invalidar(tomado[0])
+    assert tomado[4] not in [cupo[4] for cupo in cache.obtener(DIA, limite=3)]
+    print(f"cupo {tomado[4]} reservado y retirado de la cache; {cache.estadisticas()}")
+
+
+if __name__ == '__main__':
+    main()
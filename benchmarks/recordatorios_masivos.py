@@ -0,0 +1,156 @@
+"""Recordatorios masivos contra un Twilio falso: msg/s, reintentos y que nadie reciba dos veces.
+
+Uso:
+    python benchmarks/recordatorios_masivos.py [--citas 2000] [--latencia-ms 50] [--tasa-429 0.05] [--cortar 1.5]
+
+Se siembra una base SQLite con `--citas` citas reservadas para mañana y se
+levanta un Twilio falso (HTTP/1.1 keep-alive) que tarda `--latencia-ms` por
+mensaje y responde 429 con probabilidad `--tasa-429`. OtrosPY/recordatorios.py
+corre en un proceso aparte que se mata con SIGKILL a los `--cortar` segundos y
+luego se vuelve a lanzar hasta terminar. Al final se verifica que ningún número
+haya recibido dos mensajes y se compara con el envío secuencial de un
+requests.post por mensaje, como hacen mensaje_plano.py / reserva_horas.py.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import requests
+
+OTROS = Path(__file__).resolve().parent.parent / 'OtrosPY'
+sys.path.insert(0, str(OTROS))
+
+from datos_reservas import crear_bbdd_sqlite  # noqa: E402
+
+
+class TwilioFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latencia = 0.05
+    tasa_429 = 0.0
+    recibidos = Counter()
+    conexiones = 0
+    lock = threading.Lock()
+    rnd = random.Random(0)
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            TwilioFalso.conexiones += 1
+
+    def do_POST(self):
+        largo = int(self.headers.get('Content-Length', 0))
+        datos = parse_qs(self.rfile.read(largo).decode('utf-8'))
+        if 'To' not in datos:
+            return  # cuerpo cortado por el SIGKILL del cliente
+        time.sleep(self.latencia)
+        with self.lock:
+            limitado = self.rnd.random() < self.tasa_429
+            if not limitado:
+                self.recibidos[datos['To'][0]] += 1
+        if limitado:
+            codigo, cuerpo = 429, {'code': 20429, 'message': 'Too Many Requests'}
+        else:
+            codigo, cuerpo = 201, {'sid': f"SM{uuid.uuid4().hex}", 'status': 'queued'}
+        contenido = json.dumps(cuerpo).encode()
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, *args):
+        pass
+
+
+def sembrar(ruta, citas, dia):
+    crear_bbdd_sqlite(ruta, citas=None, faqs=None)
+    conexion = sqlite3.connect(ruta, isolation_level=None)
+    conexion.execute("BEGIN")
+    conexion.executemany(
+        "INSERT INTO Reservas (fecha, hora, medico, especialidad, disponible, telefono) VALUES (?, ?, ?, ?, 0, ?)",
+        (
+            (dia.isoformat(), f"{8 + i % 10:02d}:{i % 2 * 30:02d}:00", f"Médico {i % 40}",
+             f"Especialidad {i % 12}", f"whatsapp:+569{i:08d}")
+            for i in range(citas)
+        ),
+    )
+    conexion.execute("COMMIT")
+    conexion.close()
+
+
+def secuencial(url, mensajes):
+    """Un requests.post sin sesión por destinatario, uno tras otro"""
+    inicio = time.perf_counter()
+    for i in range(mensajes):
+        requests.post(url, auth=('ACfalso', 'falso'), data={'To': f"whatsapp:+568{i:08d}", 'From': 'x', 'Body': 'hola'})
+    return mensajes / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--citas', type=int, default=2000)
+    parser.add_argument('--latencia-ms', type=float, default=50)
+    parser.add_argument('--tasa-429', type=float, default=0.05)
+    parser.add_argument('--concurrencia', type=int, default=16)
+    parser.add_argument('--por-segundo', type=float, default=200)
+    parser.add_argument('--cortar', type=float, default=1.5, help="segundos antes de matar la primera ejecución")
+    args = parser.parse_args()
+
+    TwilioFalso.latencia = args.latencia_ms / 1000
+    TwilioFalso.tasa_429 = args.tasa_429
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), TwilioFalso)
+    servidor.daemon_threads = True
+    servidor.handle_error = lambda *args: None  # conexiones cortadas por el SIGKILL
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{servidor.server_port}"
+
+    directorio = Path(tempfile.mkdtemp())
+    dia = date.today() + timedelta(days=1)
+    sembrar(str(directorio / 'reservas.db'), args.citas, dia)
+    entorno = dict(
+        os.environ, BBDD_BACKEND='sqlite', BBDD_RUTA=str(directorio / 'reservas.db'),
+        TWILIO_ACCOUNT_SID='ACfalso', TWILIO_AUTH_TOKEN='falso', TWILIO_API_URL=base_url,
+    )
+    comando = [
+        sys.executable, 'recordatorios.py', '--dia', dia.isoformat(), '--salida', str(directorio / 'salida.db'),
+        '--concurrencia', str(args.concurrencia), '--por-segundo', str(args.por_segundo),
+    ]
+
+    inicio = time.perf_counter()
+    primera = subprocess.Popen(comando, cwd=OTROS, env=entorno, stdout=subprocess.DEVNULL)
+    time.sleep(args.cortar)
+    primera.send_signal(signal.SIGKILL)
+    primera.wait()
+    antes_de_cortar = sum(TwilioFalso.recibidos.values())
+    segunda = subprocess.run(comando, cwd=OTROS, env=entorno, capture_output=True, text=True, check=True)
+    total = time.perf_counter() - inicio
+    print(segunda.stdout.strip())
+
+    resumen = dict(sqlite3.connect(directorio / 'salida.db').execute("SELECT estado, COUNT(*) FROM salida GROUP BY estado"))
+    duplicados = [destino for destino, veces in TwilioFalso.recibidos.items() if veces > 1]
+    print(f"\n{antes_de_cortar} entregados antes del SIGKILL, {sum(TwilioFalso.recibidos.values())} en total "
+          f"a {len(TwilioFalso.recibidos)} números en {total:.1f}s; {TwilioFalso.conexiones} conexiones HTTP")
+    print(f"bandeja: {resumen}")
+    assert not duplicados, f"{len(duplicados)} números recibieron más de un recordatorio"
+    assert resumen.get('enviado', 0) + resumen.get('incierto', 0) + resumen.get('fallido', 0) == args.citas
+
+    muestra = min(100, args.citas)
+    print(f"secuencial, requests.post por mensaje: {secuencial(base_url + '/2010-04-01/Accounts/ACfalso/Messages.json', muestra):.1f} msg/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from agenda import AgendaCupos, Cupo
+
+logger = logging.getLogger(__name__)
+
+# Sobre este tamaño la bitácora se compacta en una nueva foto de la agenda
+UMBRAL_COMPACTACION = 1024 * 1024
+
+
+@contextmanager
+def bloqueo(ruta, exclusivo):
+    # Quienes agregan a la bitácora toman el lock compartido; la compactación, el exclusivo
+    with open(f"{ruta}.lock", 'a') as archivo:
+        fcntl.flock(archivo, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(archivo, fcntl.LOCK_UN)
+
+
+def aplicar(agenda, entrada):
+    """Aplica un cambio de la bitácora; las operaciones son idempotentes para poder reproducirlas"""
+    op = entrada['op']
+    if op == 'reservar':
+        agenda.reservar(entrada['id'])
+    elif op == 'liberar':
+        agenda.liberar(entrada['id'])
+    elif op == 'crear':
+        cupo = Cupo.desde_dict(entrada['cupo'])
+        if agenda.obtener(cupo.id) is None:
+            agenda.agregar(cupo)
+    else:
+        raise ValueError(f"Operación desconocida en bitácora: {op}")
+
+
+def reproducir(agenda, ruta_bitacora):
+    try:
+        archivo = open(ruta_bitacora, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        return 0
+    aplicadas = 0
+    with archivo:
+        for numero, linea in enumerate(archivo, 1):
+            try:
+                entrada = json.loads(linea)
+            except json.JSONDecodeError:
+                # Una línea incompleta sólo puede ser la última, escrita durante una caída
+                logger.warning(f"Línea {numero} de {ruta_bitacora} ilegible, se ignora")
+                continue
+            aplicar(agenda, entrada)
+            aplicadas += 1
+    return aplicadas
+
+
+def _cargar(ruta_foto, ruta_bitacora, ruta_semilla=None):
+    # Hasta la primera compactación no hay foto y se parte de la semilla (citas.json)
+    if ruta_semilla is not None and not Path(ruta_foto).exists():
+        ruta_foto = ruta_semilla
+    agenda = AgendaCupos.desde_archivo(ruta_foto)
+    aplicadas = reproducir(agenda, ruta_bitacora)
+    if aplicadas:
+        logger.info(f"Bitácora de citas: {aplicadas} cambios reproducidos")
+    return agenda
+
+
+def cargar_agenda(ruta_foto, ruta_bitacora, ruta_semilla=None):
+    """Reconstruye la agenda como foto + reproducción de la bitácora.
+
+    Se lee con el lock compartido: si otro worker compactara entre la lectura
+    de la foto y la de la bitácora, se leería la foto vieja con la bitácora ya
+    vaciada y se perderían las reservas anotadas en ella.
+    """
+    with bloqueo(ruta_bitacora, exclusivo=False):
+        return _cargar(ruta_foto, ruta_bitacora, ruta_semilla)
+
+
+def escribir_atomico(ruta, contenido):
+    ruta = Path(ruta)
+    temporal = ruta.with_name(f".{ruta.name}.tmp")
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    descriptor = os.open(ruta.parent, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def compactar(ruta_foto, ruta_bitacora, ruta_semilla=None):
+    """Incorpora la bitácora a una nueva foto y la vacía.
+
+    La foto es un archivo propio, fuera de git: citas.json sólo se lee como
+    semilla mientras no exista, así un deploy o un git pull no lo pisa con
+    reservas ya sacadas de la bitácora.
+    Se trabaja sobre lo que hay en disco (no sobre la memoria de un worker) para
+    incluir los cambios de todos. Si el proceso cae entre el reemplazo de la foto
+    y el truncado, al reiniciar se reproduce una bitácora ya incorporada, lo
+    que no cambia nada porque las operaciones son idempotentes.
+    """
+    with bloqueo(ruta_bitacora, exclusivo=True):
+        # Sin cargar_agenda: un segundo flock sobre otro descriptor del mismo proceso se bloquearía
+        agenda = _cargar(ruta_foto, ruta_bitacora, ruta_semilla)
+        contenido = json.dumps(
+            {'citas': [cupo.a_dict() for cupo in agenda.cupos.values()]}, ensure_ascii=False, indent=2
+        )
+        escribir_atomico(ruta_foto, contenido)
+        with open(ruta_bitacora, 'a') as f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+    logger.info(f"Bitácora compactada en {ruta_foto}: {len(agenda)} cupos")
+
+
+class Bitacora:
+    """Bitácora de solo-anexar para los cambios de estado de los cupos.
+
+    Cada cambio es una línea JSON agregada con O_APPEND (compartible entre
+    workers). El fsync se hace en grupo: el primer hilo que necesita
+    sincronizar hace un único fsync que cubre todas las líneas escritas hasta
+    ese momento, y los demás sólo esperan su resultado.
+    """
+
+    def __init__(self, ruta, ruta_foto, ruta_semilla=None, umbral_compactacion=UMBRAL_COMPACTACION):
+        self.ruta = str(ruta)
+        self.ruta_foto = str(ruta_foto)
+        self.ruta_semilla = ruta_semilla
+        self.umbral_compactacion = umbral_compactacion
+        self.descriptor = os.open(self.ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.condicion = threading.Condition()
+        self.escritas = 0
+        self.sincronizadas = 0
+        self.sincronizando = False
+        self.compactando = threading.Lock()
+
+    def registrar(self, op, esperar=True, **datos):
+        linea = json.dumps({'op': op, **datos}, ensure_ascii=False) + '\n'
+        with bloqueo(self.ruta, exclusivo=False):
+            os.write(self.descriptor, linea.encode('utf-8'))
+        with self.condicion:
+            self.escritas += 1
+            numero = self.escritas
+        if esperar:
+            self.sincronizar(numero)
+        if os.fstat(self.descriptor).st_size > self.umbral_compactacion:
+            self.compactar_en_segundo_plano()
+        return numero
+
+    def sincronizar(self, hasta):
+        with self.condicion:
+            while self.sincronizadas < hasta:
+                if self.sincronizando:
+                    self.condicion.wait()
+                    continue
+                self.sincronizando = True
+                objetivo = self.escritas
+                self.condicion.release()
+                try:
+                    os.fsync(self.descriptor)
+                finally:
+                    self.condicion.acquire()
+                    self.sincronizando = False
+                    self.condicion.notify_all()
+                self.sincronizadas = max(self.sincronizadas, objetivo)
+
+    def compactar_en_segundo_plano(self):
+        if not self.compactando.acquire(blocking=False):
+            return
+
+        def tarea():
+            try:
+                compactar(self.ruta_foto, self.ruta, self.ruta_semilla)
+            except Exception as e:
+                logger.error(f"Error compactando bitácora de citas: {str(e)}")
+            finally:
+                self.compactando.release()
+
+        threading.Thread(target=tarea, name='compactar-bitacora', daemon=True).start()
+
+    def cerrar(self):
+        self.sincronizar(self.escritas)
+        os.close(self.descriptor)
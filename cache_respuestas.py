@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+CAPACIDAD_POR_DEFECTO = 1024
+_AUSENTE = object()
+
+
+class CacheRespuestas:
+    """Cache LRU acotada de mensaje normalizado -> respuesta FAQ (o None si no hubo match).
+
+    Cada cache queda asociada al motor de FAQ con que se llenó: si el motor
+    cambia (recarga de faqs.json) se vacía sola antes de la siguiente consulta.
+    `observador(evento, tamano)` recibe cada 'hit', 'miss' e 'invalidacion'
+    (app.py lo conecta a /metrics).
+    """
+
+    def __init__(self, capacidad=CAPACIDAD_POR_DEFECTO, observador=None):
+        self.capacidad = capacidad
+        self.entradas = OrderedDict()
+        self.motor = None
+        self.observador = observador
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def clave(pregunta_usuario):
+        # Misma normalización que aplican los motores antes de puntuar
+        return pregunta_usuario.lower().strip()
+
+    def _avisar(self, evento, tamano):
+        if self.observador is not None:
+            self.observador(evento, tamano)
+
+    def buscar(self, pregunta_usuario, motor):
+        clave = self.clave(pregunta_usuario)
+        invalidada = False
+        with self.lock:
+            if motor is not self.motor:
+                invalidada = self.motor is not None
+                self.entradas.clear()
+                self.motor = motor
+            respuesta = self.entradas.get(clave, _AUSENTE)
+            if respuesta is not _AUSENTE:
+                self.entradas.move_to_end(clave)
+                tamano = len(self.entradas)
+        if invalidada:
+            self._avisar('invalidacion', 0)
+        if respuesta is not _AUSENTE:
+            self._avisar('hit', tamano)
+            return respuesta
+
+        respuesta = motor.buscar(clave)
+
+        with self.lock:
+            if motor is self.motor:
+                self.entradas[clave] = respuesta
+                self.entradas.move_to_end(clave)
+                if len(self.entradas) > self.capacidad:
+                    self.entradas.popitem(last=False)
+            tamano = len(self.entradas)
+        self._avisar('miss', tamano)
+        return respuesta
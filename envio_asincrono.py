@@ -0,0 +1,93 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_URL = 'https://api.twilio.com'
+
+
+class ClienteMensajes:
+    """Envía mensajes por la API REST de Twilio (Messages.json) reutilizando conexiones keep-alive"""
+
+    def __init__(self, account_sid, auth_token, numero_origen, base_url=TWILIO_API_URL, timeout=10):
+        self.url = f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Messages.json"
+        self.numero_origen = numero_origen
+        self.timeout = timeout
+        # requests sólo hace falta en modo asíncrono; importarlo arriba suma ~60 ms al arranque de cada worker
+        import requests
+        self.sesion = requests.Session()
+        self.sesion.auth = (account_sid, auth_token)
+
+    def enviar(self, destino, cuerpo):
+        """Devuelve el sid del mensaje creado"""
+        respuesta = self.sesion.post(
+            self.url, data={'To': destino, 'From': self.numero_origen, 'Body': cuerpo}, timeout=self.timeout
+        )
+        respuesta.raise_for_status()
+        return respuesta.json().get('sid')
+
+
+class ProcesadorAsincrono:
+    """Pool de hilos con cola acotada: si hay `maximo_pendientes` trabajos esperando, se rechaza el nuevo.
+
+    Los trabajos con la misma `clave` (el From del mensaje) corren de a uno y en
+    el orden en que se encolaron: mientras uno está en curso los siguientes
+    esperan en su cola y los ejecuta el mismo hilo al terminar. Así la sesión
+    de un número no se procesa en paralelo y sus respuestas salen en orden.
+    """
+
+    def __init__(self, hilos=8, maximo_pendientes=1000):
+        self.pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='respuesta')
+        self.cupos = threading.BoundedSemaphore(maximo_pendientes)
+        # clave -> trabajos en espera; la clave está presente mientras uno de ellos corre
+        self.en_curso = {}
+        self.lock = threading.Lock()
+
+    def encolar(self, funcion, *args, clave=None):
+        if not self.cupos.acquire(blocking=False):
+            return False
+        trabajo = (funcion, args)
+        if clave is not None:
+            with self.lock:
+                if clave in self.en_curso:
+                    self.en_curso[clave].append(trabajo)
+                    return True
+                self.en_curso[clave] = deque()
+        try:
+            self.pool.submit(self._ejecutar, clave, trabajo)
+        except RuntimeError:
+            # Pool cerrado: se descarta también lo que alcanzó a quedar en espera de esta clave
+            descartados = 1
+            if clave is not None:
+                with self.lock:
+                    descartados += len(self.en_curso.pop(clave))
+            for _ in range(descartados):
+                self.cupos.release()
+            return False
+        return True
+
+    def _ejecutar(self, clave, trabajo):
+        while trabajo is not None:
+            funcion, args = trabajo
+            try:
+                funcion(*args)
+            except Exception as e:
+                logger.error(f"Error procesando mensaje en segundo plano: {str(e)}")
+            finally:
+                self.cupos.release()
+            trabajo = self._siguiente(clave)
+
+    def _siguiente(self, clave):
+        if clave is None:
+            return None
+        with self.lock:
+            esperando = self.en_curso[clave]
+            if esperando:
+                return esperando.popleft()
+            del self.en_curso[clave]
+            return None
+
+    def cerrar(self, esperar=True):
+        self.pool.shutdown(wait=esperar)
@@ -0,0 +1,179 @@
+import unicodedata
+from collections import Counter, defaultdict
+
+from fuzzywuzzy import fuzz
+
+UMBRAL_PUNTAJE = 50
+PESO_PREGUNTA = 0.8
+# Cotas por las que se va bajando en buscar() antes de llegar al umbral
+NIVELES_COTA = (90, 80, 70, 60)
+
+
+def normalizar(texto):
+    """Pasa a minúsculas y elimina tildes (á -> a, ñ -> n)"""
+    texto = unicodedata.normalize('NFKD', texto.lower().strip())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+class IndiceFAQ:
+    """Índice de las FAQ, construido una sola vez al cargar, con el mismo resultado que el recorrido lineal.
+
+    fuzz.ratio es 2*M/(|a|+|b|) con M caracteres que coinciden en orden, así
+    que nunca supera 2*C/(|a|+|b|), donde C son los caracteres que ambos textos
+    tienen en común contando repeticiones. Para superar el umbral un texto de
+    largo L necesita C >= t, con t según L y el largo de la pregunta.
+
+    Cada carácter (con su repetición) tiene una lista invertida con los textos
+    que lo contienen, guardada como entero de bits (bit i = texto i). Para una
+    pregunta se suman las listas de sus caracteres en contadores por bits
+    (un entero por bit del contador), así que C de todos los textos sale de
+    operaciones sobre enteros y no de un recorrido en Python; sólo los textos
+    con C >= t para su largo pasan a candidatos. buscar() los pide por niveles
+    de cota (NIVELES_COTA, luego el umbral) y puntúa cada tanda con fuzz.ratio
+    de mayor a menor cota, hasta que ninguna cota restante alcance al mejor
+    puntaje: lo que se descarta no podría haber ganado ni empatado.
+    """
+
+    def __init__(self, faqs):
+        self.faqs = faqs
+        self.entradas = []
+        self.bits = {}  # (carácter, repetición) -> bit de las máscaras de texto
+        self.textos = []  # (máscara, posición, texto, peso)
+        indices_por_bit = defaultdict(list)
+        indices_por_grupo = defaultdict(list)  # (es_pregunta, largo) -> índices en self.textos
+
+        for posicion, faq in enumerate(faqs):
+            pregunta = faq['pregunta'].lower()
+            keywords = [kw.strip().lower() for kw in faq.get('keywords', '').split(',')]
+            self.entradas.append((pregunta, keywords, faq['respuesta']))
+
+            for texto, es_pregunta in [(pregunta, True)] + [(kw, False) for kw in keywords]:
+                if texto:  # fuzz.ratio contra un texto vacío es 0
+                    indice = len(self.textos)
+                    mascara = 0
+                    for bit in self._bits(texto, agregar=True):
+                        mascara |= 1 << bit
+                        indices_por_bit[bit].append(indice)
+                    self.textos.append((mascara, posicion, texto, PESO_PREGUNTA if es_pregunta else 1))
+                    indices_por_grupo[es_pregunta, len(texto)].append(indice)
+
+        self.listas = {bit: self._conjunto(indices) for bit, indices in indices_por_bit.items()}
+        self.grupos = {grupo: self._conjunto(indices) for grupo, indices in indices_por_grupo.items()}
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def _bits(self, texto, agregar=False):
+        bits = []
+        for caracter, veces in Counter(texto).items():
+            for repeticion in range(veces):
+                bit = self.bits.get((caracter, repeticion))
+                if bit is None:
+                    if not agregar:
+                        break  # ningún texto del catálogo tiene tantas repeticiones de este carácter
+                    bit = self.bits[caracter, repeticion] = len(self.bits)
+                bits.append(bit)
+        return bits
+
+    def _conjunto(self, indices):
+        """Entero con el bit i encendido por cada índice de texto"""
+        conjunto = bytearray((len(self.textos) + 7) // 8)
+        for indice in indices:
+            conjunto[indice >> 3] |= 1 << (indice & 7)
+        return int.from_bytes(conjunto, 'little')
+
+    @staticmethod
+    def _al_menos(contador, necesarios, dominio):
+        """Textos de `dominio` cuyo contador por bits vale al menos `necesarios`"""
+        if necesarios >> len(contador):
+            return 0
+        mayor, igual = 0, dominio
+        for k in range(len(contador) - 1, -1, -1):
+            if necesarios >> k & 1:
+                igual &= contador[k]
+            else:
+                mayor |= igual & contador[k]
+        return mayor | igual
+
+    def _contar(self, bits):
+        """C de cada texto como contador por bits: contador[k] tiene los textos con el bit k de C encendido"""
+        contador = []
+        for bit in bits:
+            acarreo = self.listas[bit]
+            for k in range(len(contador)):
+                contador[k], acarreo = contador[k] ^ acarreo, contador[k] & acarreo
+                if not acarreo:
+                    break
+            else:
+                if acarreo:
+                    contador.append(acarreo)
+        return contador
+
+    def _superan(self, largo, bits, contador, nivel):
+        """Entero de bits con los textos cuya cota supera `nivel`"""
+        # Por cada t, los grupos de largo que exigen al menos t caracteres en común
+        por_necesarios = defaultdict(int)
+        for (es_pregunta, largo_texto), conjunto in self.grupos.items():
+            peso = PESO_PREGUNTA if es_pregunta else 1
+            # cota = peso * (200*C/total + 1) supera el nivel sólo con C mayor que esto; el +1 cubre el redondeo
+            necesarios = int((nivel / peso - 1) * (largo + largo_texto) / 200) + 1
+            if necesarios <= min(len(bits), largo_texto):
+                por_necesarios[necesarios] |= conjunto
+        superan = 0
+        for necesarios, dominio in por_necesarios.items():
+            superan |= self._al_menos(contador, necesarios, dominio)
+        return superan
+
+    def _cotas(self, largo, mascara, conjunto):
+        """[(cota del puntaje, posición, texto, peso)] de los textos de `conjunto`"""
+        cotas = []
+        # Posiciones de los bits encendidos, del menos al más significativo
+        digitos = bin(conjunto)[:1:-1]
+        indice = digitos.find('1')
+        while indice >= 0:
+            mascara_texto, posicion, texto, peso = self.textos[indice]
+            comunes = bin(mascara & mascara_texto).count('1')  # int.bit_count es de Python 3.10
+            cota = peso * (200 * comunes / (largo + len(texto)) + 1)
+            if cota > UMBRAL_PUNTAJE:
+                cotas.append((cota, posicion, texto, peso))
+            indice = digitos.find('1', indice + 1)
+        return cotas
+
+    def _mascara(self, bits):
+        mascara = 0
+        for bit in bits:
+            mascara |= 1 << bit
+        return mascara
+
+    def cotas(self, pregunta_usuario):
+        """[(cota del puntaje, posición, texto, peso)] de los textos que podrían superar el umbral"""
+        largo, bits = len(pregunta_usuario), self._bits(pregunta_usuario)
+        superan = self._superan(largo, bits, self._contar(bits), UMBRAL_PUNTAJE)
+        return self._cotas(largo, self._mascara(bits), superan)
+
+    def buscar(self, pregunta_usuario):
+        pregunta_usuario = pregunta_usuario.lower().strip()
+        largo, bits = len(pregunta_usuario), self._bits(pregunta_usuario)
+        contador, mascara = self._contar(bits), self._mascara(bits)
+        mejor_posicion = None
+        mejor_puntaje = UMBRAL_PUNTAJE
+
+        # Primero los textos de cota más alta. Los que quedan sin ver tienen cota <= techo (el
+        # nivel anterior): si el mejor puntaje ya lo supera, ninguno puede alcanzarlo
+        vistos, techo = 0, None
+        for nivel in NIVELES_COTA + (UMBRAL_PUNTAJE,):
+            if techo is not None and mejor_puntaje > techo:
+                break
+            superan = self._superan(largo, bits, contador, nivel)
+            nuevos, vistos, techo = superan & ~vistos, superan, nivel
+            for cota, posicion, texto, peso in sorted(self._cotas(largo, mascara, nuevos), key=lambda c: c[0], reverse=True):
+                if cota < mejor_puntaje:
+                    break
+                puntaje = fuzz.ratio(pregunta_usuario, texto) * peso
+                if puntaje <= UMBRAL_PUNTAJE:
+                    continue
+                # Ante empate gana la FAQ que aparece antes, igual que el recorrido lineal
+                if puntaje > mejor_puntaje or (puntaje == mejor_puntaje and posicion < mejor_posicion):
+                    mejor_puntaje, mejor_posicion = puntaje, posicion
+
+        return None if mejor_posicion is None else self.entradas[mejor_posicion][2]
@@ -0,0 +1,73 @@
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from faq_index import PESO_PREGUNTA
+
+UMBRAL_SIMILITUD = 0.35
+RANGO_NGRAMAS = (2, 4)
+
+
+class MotorTFIDF:
+    """Recuperación de FAQ por similitud coseno sobre n-gramas de caracteres TF-IDF.
+
+    Cada pregunta y cada keyword es una fila de la matriz dispersa; el puntaje de
+    una FAQ es el máximo de sus filas (las preguntas ponderadas por PESO_PREGUNTA,
+    igual que en el motor fuzzy).
+    """
+
+    def __init__(self, faqs, umbral=UMBRAL_SIMILITUD):
+        self.faqs = faqs
+        self.umbral = umbral
+        self.respuestas = [faq['respuesta'] for faq in faqs]
+
+        documentos = []
+        pesos = []
+        inicios = []
+        for faq in faqs:
+            inicios.append(len(documentos))
+            documentos.append(faq['pregunta'])
+            pesos.append(PESO_PREGUNTA)
+            for kw in faq.get('keywords', '').split(','):
+                if kw.strip():
+                    documentos.append(kw.strip())
+                    pesos.append(1.0)
+
+        self.inicios = np.array(inicios, dtype=np.intp)
+        if not documentos:
+            self.vectorizador = None
+            self.matriz = None
+            return
+
+        self.vectorizador = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=RANGO_NGRAMAS,
+            lowercase=True,
+            strip_accents='unicode',
+            dtype=np.float32,
+        )
+        matriz = self.vectorizador.fit_transform(documentos)
+        # Se escalan las filas de preguntas para no tener que ponderar en cada consulta
+        escala = np.asarray(pesos, dtype=np.float32)
+        self.matriz = matriz.multiply(escala[:, None]).tocsr().T.tocsr()
+
+    def __len__(self):
+        return len(self.respuestas)
+
+    def puntajes(self, pregunta_usuario):
+        vector = self.vectorizador.transform([pregunta_usuario.strip()])
+        similitud = (vector @ self.matriz).toarray().ravel()
+        return np.maximum.reduceat(similitud, self.inicios)
+
+    def top_k(self, pregunta_usuario, k=3):
+        """Devuelve hasta k pares (respuesta, puntaje) sobre el umbral, de mayor a menor"""
+        if self.matriz is None or not pregunta_usuario.strip():
+            return []
+        puntajes = self.puntajes(pregunta_usuario)
+        k = min(k, len(puntajes))
+        mejores = np.argpartition(-puntajes, k - 1)[:k]
+        mejores = sorted(mejores, key=lambda i: (-puntajes[i], i))
+        return [(self.respuestas[i], float(puntajes[i])) for i in mejores if puntajes[i] > self.umbral]
+
+    def buscar(self, pregunta_usuario):
+        resultados = self.top_k(pregunta_usuario, k=1)
+        return resultados[0][0] if resultados else None
@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+# Debe quedar definido antes de que cualquier worker importe prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'reservas_metricas'))
+
+
+def on_starting(server):
+    # Métricas de una ejecución anterior no deben sumarse a las nuevas
+    directorio = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directorio, ignore_errors=True)
+    os.makedirs(directorio, exist_ok=True)
+    # La tasa de perfilado de la ejecución anterior tampoco se arrastra
+    from perfilador import reiniciar_control
+    reiniciar_control()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from sqlite_local import ConexionesPorHilo
+
+TTL_POR_DEFECTO = 3600
+MAXIMO_POR_DEFECTO = 100000
+ESCRITURAS_POR_PURGA = 256
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+
+class MensajesMemoria:
+    """MessageSid ya vistos en este proceso, con TTL y tamaño máximo.
+
+    Un sid se reclama antes de procesarlo y se completa con la respuesta
+    renderizada; un reintento que llega mientras tanto espera esa respuesta.
+    """
+
+    def __init__(self, ttl=TTL_POR_DEFECTO, maximo=MAXIMO_POR_DEFECTO):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.datos = OrderedDict()
+        self.condicion = threading.Condition()
+
+    def _purgar(self, ahora):
+        # Se insertan en orden de llegada, así que los más antiguos están al principio
+        limite = ahora - self.ttl
+        while self.datos and (next(iter(self.datos.values()))[1] <= limite or len(self.datos) > self.maximo):
+            self.datos.popitem(last=False)
+
+    def reclamar(self, sid):
+        """(True, None) si el sid es nuevo; (False, respuesta o None si aún se procesa) si es un reintento"""
+        ahora = time.time()
+        with self.condicion:
+            self._purgar(ahora)
+            entrada = self.datos.get(sid)
+            if entrada is not None:
+                return False, entrada[0]
+            self.datos[sid] = [None, ahora]
+            return True, None
+
+    def completar(self, sid, respuesta):
+        with self.condicion:
+            entrada = self.datos.get(sid)
+            if entrada is not None:
+                entrada[0] = respuesta
+            self.condicion.notify_all()
+
+    def liberar(self, sid):
+        with self.condicion:
+            self.datos.pop(sid, None)
+            self.condicion.notify_all()
+
+    def esperar(self, sid, limite):
+        fin = time.monotonic() + limite
+        with self.condicion:
+            while True:
+                entrada = self.datos.get(sid)
+                if entrada is None or entrada[0] is not None:
+                    return entrada[0] if entrada else None
+                restante = fin - time.monotonic()
+                if restante <= 0:
+                    return None
+                self.condicion.wait(restante)
+
+
+class MensajesSQLite:
+    """MessageSid ya vistos, en un archivo SQLite (WAL) compartido por los workers del nodo.
+
+    El reclamo es un INSERT OR IGNORE sobre la clave primaria: entre todos los
+    procesos sólo uno lo inserta y procesa el mensaje.
+    """
+
+    def __init__(self, ruta, ttl=TTL_POR_DEFECTO, maximo=MAXIMO_POR_DEFECTO):
+        self.ruta = str(ruta)
+        self.ttl = ttl
+        self.maximo = maximo
+        self.conexiones = ConexionesPorHilo(self.ruta)
+        self.escrituras = 0
+        conexion = self.conexion()
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS mensajes ("
+            " sid TEXT PRIMARY KEY,"
+            " respuesta TEXT,"
+            " creado REAL NOT NULL)"
+        )
+        conexion.execute("CREATE INDEX IF NOT EXISTS mensajes_creado ON mensajes (creado)")
+
+    def conexion(self):
+        return self.conexiones.obtener()
+
+    def _leer(self, sid):
+        return self.conexion().execute(
+            "SELECT respuesta FROM mensajes WHERE sid = ? AND creado > ?", (sid, time.time() - self.ttl)
+        ).fetchone()
+
+    def reclamar(self, sid):
+        """(True, None) si el sid es nuevo; (False, respuesta o None si aún se procesa) si es un reintento"""
+        conexion = self.conexion()
+        ahora = time.time()
+        # Un sid vencido se reemplaza, igual que si ya hubiera sido purgado
+        conexion.execute("DELETE FROM mensajes WHERE sid = ? AND creado <= ?", (sid, ahora - self.ttl))
+        cursor = conexion.execute(
+            "INSERT OR IGNORE INTO mensajes (sid, respuesta, creado) VALUES (?, NULL, ?)", (sid, ahora)
+        )
+        if cursor.rowcount == 1:
+            self.escrituras += 1
+            if self.escrituras % ESCRITURAS_POR_PURGA == 0:
+                self.purgar()
+            return True, None
+        fila = self._leer(sid)
+        return False, fila[0] if fila else None
+
+    def completar(self, sid, respuesta):
+        self.conexion().execute("UPDATE mensajes SET respuesta = ? WHERE sid = ?", (respuesta, sid))
+
+    def liberar(self, sid):
+        self.conexion().execute("DELETE FROM mensajes WHERE sid = ?", (sid,))
+
+    def esperar(self, sid, limite, intervalo=0.05):
+        fin = time.monotonic() + limite
+        while True:
+            fila = self._leer(sid)
+            if fila is None or fila[0] is not None:
+                return fila[0] if fila else None
+            if time.monotonic() >= fin:
+                return None
+            time.sleep(intervalo)
+
+    def purgar(self):
+        conexion = self.conexion()
+        conexion.execute("DELETE FROM mensajes WHERE creado <= ?", (time.time() - self.ttl,))
+        conexion.execute(
+            "DELETE FROM mensajes WHERE sid IN ("
+            " SELECT sid FROM mensajes ORDER BY creado DESC LIMIT -1 OFFSET ?)",
+            (self.maximo,),
+        )
+
+
+def crear_registro_mensajes(backend=None, ruta=None):
+    """DEDUP_BACKEND=memoria o sqlite (por defecto, el mismo que SESIONES_BACKEND); DEDUP_RUTA indica el archivo (data/mensajes.db si no).
+
+    DEDUP_TTL_SEGUNDOS y DEDUP_MAXIMO acotan cuántos MessageSid se recuerdan.
+    """
+    backend = backend or os.environ.get('DEDUP_BACKEND', os.environ.get('SESIONES_BACKEND', 'memoria'))
+    ttl = float(os.environ.get('DEDUP_TTL_SEGUNDOS', TTL_POR_DEFECTO))
+    maximo = int(os.environ.get('DEDUP_MAXIMO', MAXIMO_POR_DEFECTO))
+    if backend == 'sqlite':
+        return MensajesSQLite(ruta or os.environ.get('DEDUP_RUTA', DATA_DIR / 'mensajes.db'), ttl, maximo)
+    if backend != 'memoria':
+        raise ValueError(f"Backend de deduplicación desconocido: {backend}")
+    return MensajesMemoria(ttl, maximo)
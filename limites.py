@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LimitadorPorNumero:
+    """Token bucket por número (From) con memoria acotada.
+
+    Cada número tiene `capacidad` mensajes de ráfaga que se recargan a
+    `recarga` por segundo. Los buckets viven en un OrderedDict en orden de uso;
+    sobre `maximo_numeros` se descarta el menos reciente, que es también el que
+    más tiempo lleva recargándose. Cada consulta es O(1). Los buckets son del
+    proceso, así que con varios workers cada uno lleva su propia cuenta.
+    """
+
+    def __init__(self, capacidad=8, recarga=0.5, maximo_numeros=50000):
+        self.capacidad = float(capacidad)
+        self.recarga = float(recarga)
+        self.maximo_numeros = maximo_numeros
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def permitir(self, numero):
+        ahora = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(numero)
+            if bucket is None:
+                bucket = self.buckets[numero] = [self.capacidad, ahora]
+                if len(self.buckets) > self.maximo_numeros:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(numero)
+                bucket[0] = min(self.capacidad, bucket[0] + (ahora - bucket[1]) * self.recarga)
+                bucket[1] = ahora
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+class LimiteConcurrencia:
+    """Máximo de requests procesándose a la vez en el proceso; el que sobra no espera, se rechaza"""
+
+    def __init__(self, maximo):
+        self.semaforo = threading.BoundedSemaphore(maximo)
+
+    def entrar(self):
+        return self.semaforo.acquire(blocking=False)
+
+    def salir(self):
+        self.semaforo.release()
+
+    def ejecutar(self, funcion, rechazo):
+        """Ejecuta funcion si hay cupo y lo libera aunque falle; si no hay, devuelve rechazo()"""
+        if not self.entrar():
+            return rechazo()
+        try:
+            return funcion()
+        finally:
+            self.salir()
@@ -0,0 +1,103 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Con PROMETHEUS_MULTIPROC_DIR definido (ver gunicorn.conf.py) cada worker escribe sus
+# métricas en archivos mmap de ese directorio y /metrics las suma todas.
+MULTIPROCESO = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+DURACION_ETAPA = Histogram(
+    'reservas_etapa_segundos', 'Duración de cada etapa del webhook /whatsapp', ['etapa'], buckets=BUCKETS
+)
+CONSULTAS_FAQ = Counter('reservas_faq_consultas_total', 'Búsquedas de FAQ según resultado', ['resultado'])
+TRANSICIONES = Counter(
+    'reservas_flujo_transiciones_total', 'Transiciones del flujo de agendamiento', ['desde', 'hacia']
+)
+REINTENTOS = Counter('reservas_reintentos_total', 'Reintentos de Twilio respondidos sin reprocesar (mismo MessageSid)')
+RECHAZOS = Counter('reservas_rechazos_total', 'Mensajes descartados por límite de carga', ['motivo'])
+CACHE_FAQ = Counter('reservas_faq_cache_total', 'Consultas al cache de respuestas FAQ', ['resultado'])
+CACHE_FAQ_INVALIDACIONES = Counter(
+    'reservas_faq_cache_invalidaciones_total', 'Veces que el cache de FAQ se vació por recarga de faqs.json'
+)
+# Cada worker tiene su cache: se suman los tamaños de los workers vivos
+CACHE_FAQ_TAMANO = Gauge('reservas_faq_cache_entradas', 'Entradas en el cache de FAQ', multiprocess_mode='livesum')
+# Con sesiones en memoria cada worker tiene las suyas y se suman; con SQLite todos ven el mismo total
+SESIONES_ACTIVAS = Gauge(
+    'reservas_sesiones_activas', 'Conversaciones de agendamiento en curso',
+    multiprocess_mode='livemostrecent' if os.environ.get('SESIONES_BACKEND') == 'sqlite' else 'livesum',
+)
+
+SESIONES_DESCARTADAS = Counter(
+    'reservas_sesiones_descartadas_total', 'Conversaciones borradas por TTL (expirada) o por tamaño máximo (desalojada)',
+    ['motivo'],
+)
+
+_etapas = {}
+
+
+def _histograma(etapa):
+    # labels() arma la llave en cada llamada; se guarda el hijo para no repetirlo por request
+    hijo = _etapas.get(etapa)
+    if hijo is None:
+        hijo = _etapas[etapa] = DURACION_ETAPA.labels(etapa)
+    return hijo
+
+
+def observar_etapa(etapa, segundos):
+    _histograma(etapa).observe(segundos)
+
+
+@contextmanager
+def medir(etapa):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _histograma(etapa).observe(time.perf_counter() - inicio)
+
+
+def consulta_faq(encontrada):
+    CONSULTAS_FAQ.labels('hit' if encontrada else 'miss').inc()
+
+
+def cache_faq(evento, tamano):
+    if evento == 'invalidacion':
+        CACHE_FAQ_INVALIDACIONES.inc()
+    else:
+        CACHE_FAQ.labels(evento).inc()
+    CACHE_FAQ_TAMANO.set(tamano)
+
+
+def transicion(desde, hacia):
+    TRANSICIONES.labels(desde or 'inicio', hacia).inc()
+
+
+def reintento():
+    REINTENTOS.inc()
+
+
+def rechazo(motivo):
+    RECHAZOS.labels(motivo).inc()
+
+
+def sesiones_activas(cantidad):
+    SESIONES_ACTIVAS.set(cantidad)
+
+
+def sesiones_descartadas(motivo, cantidad):
+    SESIONES_DESCARTADAS.labels(motivo).inc(cantidad)
+
+
+def exportar():
+    """Texto en formato Prometheus y su Content-Type"""
+    if MULTIPROCESO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
@@ -0,0 +1,142 @@
+"""Perfilado por muestreo de requests en producción.
+
+Una fracción `tasa` de las llamadas se ejecuta bajo cProfile y se guarda como
+archivo .prof en el directorio de perfiles. Los archivos de distintos requests y
+workers se combinan con:
+
+    python perfilador.py combinar /tmp/reservas_perfiles --salida total.prof --top 30
+"""
+import argparse
+import cProfile
+import functools
+import glob
+import logging
+import os
+import pstats
+import random
+import tempfile
+import threading
+import time
+
+from vigilante_archivo import VigilanteArchivo
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_POR_DEFECTO = os.path.join(tempfile.gettempdir(), 'reservas_perfiles')
+
+
+def validar_tasa(tasa):
+    """Convierte la tasa a float; fuera de [0, 1] o NaN es ValueError"""
+    tasa = float(tasa)
+    if not 0.0 <= tasa <= 1.0:  # NaN también cae aquí
+        raise ValueError(f"la tasa debe estar entre 0 y 1, no {tasa}")
+    return tasa
+
+
+def escribir_control(directorio, tasa):
+    tasa = validar_tasa(tasa)
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, 'tasa')
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w') as f:
+        f.write(f"{tasa}\n")
+    os.replace(temporal, ruta)
+    return tasa
+
+
+def reiniciar_control(directorio=None):
+    """Al arrancar el servidor la tasa vuelve a PERFIL_TASA, o a 0 si no está definida.
+
+    Lo llama una sola vez el proceso principal (on_starting de gunicorn.conf.py o
+    app.run); los workers no, para que reiniciar uno no pise la tasa vigente.
+    """
+    directorio = directorio or os.environ.get('PERFILES_DIR', DIRECTORIO_POR_DEFECTO)
+    return escribir_control(directorio, os.environ.get('PERFIL_TASA', 0))
+
+
+class Perfilador:
+    """La tasa vive en un archivo de control dentro del directorio de perfiles.
+
+    Cada worker lo vigila, así que cambiarla desde cualquier worker (o a mano)
+    se aplica a todos sin reiniciar. Con tasa 0 el costo por request es una
+    comparación. El archivo sobrevive a los reinicios; ver reiniciar_control.
+    """
+
+    def __init__(self, directorio, tasa=0.0, intervalo=2.0):
+        self.directorio = str(directorio)
+        self.ruta_control = os.path.join(self.directorio, 'tasa')
+        self.tasa = tasa
+        self.perfiles = 0
+        self.en_curso = threading.Lock()
+        os.makedirs(self.directorio, exist_ok=True)
+        self.leer_control()
+        self.vigilante = VigilanteArchivo(self.ruta_control, self.leer_control, intervalo).iniciar()
+
+    def leer_control(self):
+        try:
+            with open(self.ruta_control, 'r') as f:
+                self.tasa = validar_tasa(f.read().strip() or 0)
+        except FileNotFoundError:
+            pass
+        except ValueError as e:
+            logger.error(f"Tasa de perfilado inválida en {self.ruta_control}: {str(e)}")
+
+    def fijar_tasa(self, tasa):
+        tasa = escribir_control(self.directorio, tasa)
+        self.tasa = tasa
+        logger.info(f"Tasa de perfilado: {tasa}")
+        return tasa
+
+    def muestrear(self, nombre):
+        """Decorador: perfila una fracción `tasa` de las llamadas a la función"""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self.tasa or random.random() >= self.tasa:
+                    return funcion(*args, **kwargs)
+                # cProfile admite un solo perfil activo por proceso; si hay otro en curso se omite
+                if not self.en_curso.acquire(blocking=False):
+                    return funcion(*args, **kwargs)
+                try:
+                    perfil = cProfile.Profile()
+                    try:
+                        return perfil.runcall(funcion, *args, **kwargs)
+                    finally:
+                        self.guardar(perfil, nombre)
+                finally:
+                    self.en_curso.release()
+            return envoltura
+        return decorador
+
+    def guardar(self, perfil, nombre):
+        ruta = os.path.join(self.directorio, f"{nombre}-{os.getpid()}-{time.time_ns()}.prof")
+        try:
+            perfil.dump_stats(ruta)
+            self.perfiles += 1
+        except OSError as e:
+            logger.error(f"No se pudo guardar el perfil {ruta}: {str(e)}")
+
+
+def combinar(directorio, salida=None, top=30, orden='cumulative'):
+    archivos = sorted(glob.glob(os.path.join(directorio, '*.prof')))
+    if not archivos:
+        print(f"No hay perfiles en {directorio}")
+        return None
+    estadisticas = pstats.Stats(*archivos)
+    if salida:
+        estadisticas.dump_stats(salida)
+    print(f"{len(archivos)} perfiles combinados")
+    estadisticas.sort_stats(orden).print_stats(top)
+    return estadisticas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Herramientas de perfilado")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+    parser_combinar = subcomandos.add_parser('combinar', help="combina los .prof de un directorio")
+    parser_combinar.add_argument('directorio')
+    parser_combinar.add_argument('--salida')
+    parser_combinar.add_argument('--top', type=int, default=30)
+    parser_combinar.add_argument('--orden', default='cumulative')
+    args = parser.parse_args()
+    combinar(args.directorio, args.salida, args.top, args.orden)
@@ -0,0 +1,101 @@
+import os
+import threading
+from pathlib import Path
+
+from sqlite_local import ConexionesPorHilo
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+
+class ReservasMemoria:
+    """Disponibilidad de cupos en el proceso; sólo es segura con un único worker"""
+
+    def __init__(self, cupos=()):
+        self.disponibles = {cupo.id: cupo.disponible for cupo in cupos}
+        self.lock = threading.Lock()
+
+    def reservar(self, cupo_id):
+        """Compare-and-set de disponible 1 -> 0; True sólo para quien gana el cupo"""
+        with self.lock:
+            if not self.disponibles.get(cupo_id):
+                return False
+            self.disponibles[cupo_id] = False
+            return True
+
+    def liberar(self, cupo_id):
+        with self.lock:
+            if cupo_id not in self.disponibles or self.disponibles[cupo_id]:
+                return False
+            self.disponibles[cupo_id] = True
+            return True
+
+    def libres(self, cupo_ids):
+        with self.lock:
+            return {cupo_id for cupo_id in cupo_ids if self.disponibles.get(cupo_id)}
+
+
+class ReservasSQLite:
+    """Disponibilidad de cupos en un archivo SQLite (WAL) compartido por todos los workers del nodo.
+
+    La reserva es un único UPDATE condicionado a disponible = 1: SQLite
+    serializa las escrituras, así que entre todos los procesos sólo uno
+    obtiene rowcount = 1 para el mismo cupo.
+    """
+
+    def __init__(self, ruta, cupos=()):
+        self.ruta = str(ruta)
+        self.conexiones = ConexionesPorHilo(self.ruta, timeout=10)
+        conexion = self.conexion()
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS cupos ("
+            " id INTEGER PRIMARY KEY,"
+            " disponible INTEGER NOT NULL)"
+        )
+        # Cada worker siembra los cupos que falten; los ya existentes conservan su estado
+        with conexion:
+            conexion.execute("BEGIN IMMEDIATE")
+            conexion.executemany(
+                "INSERT OR IGNORE INTO cupos (id, disponible) VALUES (?, ?)",
+                ((cupo.id, int(cupo.disponible)) for cupo in cupos),
+            )
+
+    def conexion(self):
+        return self.conexiones.obtener()
+
+    def reservar(self, cupo_id):
+        """Compare-and-set de disponible 1 -> 0; True sólo para quien gana el cupo"""
+        cursor = self.conexion().execute(
+            "UPDATE cupos SET disponible = 0 WHERE id = ? AND disponible = 1", (cupo_id,)
+        )
+        return cursor.rowcount == 1
+
+    def liberar(self, cupo_id):
+        cursor = self.conexion().execute(
+            "UPDATE cupos SET disponible = 1 WHERE id = ? AND disponible = 0", (cupo_id,)
+        )
+        return cursor.rowcount == 1
+
+    def libres(self, cupo_ids):
+        cupo_ids = list(cupo_ids)
+        if not cupo_ids:
+            return set()
+        marcas = ', '.join('?' * len(cupo_ids))
+        filas = self.conexion().execute(
+            f"SELECT id FROM cupos WHERE disponible = 1 AND id IN ({marcas})", cupo_ids
+        ).fetchall()
+        return {fila[0] for fila in filas}
+
+
+def crear_reservas(cupos, backend=None, ruta=None):
+    """RESERVAS_BACKEND=sqlite (por defecto) o memoria (sólo con un worker); RESERVAS_RUTA indica el archivo.
+
+    El valor por defecto es sqlite porque gunicorn corre varios workers y en
+    memoria cada uno tendría su propia disponibilidad: dos pacientes podrían
+    recibir el mismo cupo.
+    """
+    backend = backend or os.environ.get('RESERVAS_BACKEND', 'sqlite')
+    if backend == 'sqlite':
+        return ReservasSQLite(ruta or os.environ.get('RESERVAS_RUTA', DATA_DIR / 'reservas.db'), cupos)
+    if backend != 'memoria':
+        raise ValueError(f"Backend de reservas desconocido: {backend}")
+    return ReservasMemoria(cupos)
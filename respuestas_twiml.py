@@ -0,0 +1,16 @@
+from twilio.twiml.messaging_response import MessagingResponse
+
+
+# Respuesta sin mensajes: Twilio la acepta y no envía nada al paciente
+TWIML_VACIO = str(MessagingResponse())
+
+
+def renderizar_twiml(texto):
+    response = MessagingResponse()
+    response.message(texto)
+    return str(response)
+
+
+def prerenderizar(textos):
+    """TwiML ya serializado para cada texto fijo; el dict se reemplaza completo al recargar FAQs"""
+    return {texto: renderizar_twiml(texto) for texto in textos if texto}
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlite_local import ConexionesPorHilo
+
+TTL_POR_DEFECTO = 1800
+MAXIMO_POR_DEFECTO = 100000
+# El backend SQLite purga expiradas cada tantas escrituras
+ESCRITURAS_POR_PURGA = 256
+
+
+class Sesion:
+    """Estado compacto de una conversación en curso"""
+
+    __slots__ = ('estado', 'nombre', 'especialidad', 'opciones', 'ultima_actividad')
+
+    def __init__(self, estado=None, nombre=None, especialidad=None, opciones=None, ultima_actividad=None):
+        self.estado = estado
+        self.nombre = nombre
+        self.especialidad = especialidad
+        self.opciones = opciones
+        self.ultima_actividad = ultima_actividad if ultima_actividad is not None else time.time()
+
+    def tocar(self, ahora=None):
+        self.ultima_actividad = ahora if ahora is not None else time.time()
+
+    def a_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(**{campo: datos.get(campo) for campo in cls.__slots__})
+
+    def __repr__(self):
+        return f"Sesion({self.a_dict()!r})"
+
+
+class AlmacenMemoria:
+    """Estado de conversación en el proceso (cada worker tiene el suyo), con TTL y tamaño máximo.
+
+    Las sesiones se mantienen en un OrderedDict ordenado por última actividad:
+    las candidatas a expirar siempre están al principio, así que cada escritura
+    desaloja en O(1) amortizado. `observador(motivo, cantidad)` recibe las
+    sesiones 'expirada' y 'desalojada' (app.py lo conecta a /metrics).
+    """
+
+    def __init__(self, ttl=TTL_POR_DEFECTO, maximo=MAXIMO_POR_DEFECTO, observador=None):
+        self.ttl = ttl
+        self.maximo = maximo
+        self.datos = OrderedDict()
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.observador = observador
+        self.lock = threading.Lock()
+
+    def _avisar(self, expiradas, desalojadas):
+        self.expiradas += expiradas
+        self.desalojadas += desalojadas
+        if self.observador is not None:
+            if expiradas:
+                self.observador('expirada', expiradas)
+            if desalojadas:
+                self.observador('desalojada', desalojadas)
+
+    def _purgar(self, ahora):
+        limite = ahora - self.ttl
+        expiradas = desalojadas = 0
+        while self.datos:
+            sesion = next(iter(self.datos.values()))
+            if sesion.ultima_actividad > limite:
+                break
+            self.datos.popitem(last=False)
+            expiradas += 1
+        while len(self.datos) > self.maximo:
+            self.datos.popitem(last=False)
+            desalojadas += 1
+        self._avisar(expiradas, desalojadas)
+
+    def obtener(self, numero):
+        with self.lock:
+            sesion = self.datos.get(numero)
+            if sesion is not None and sesion.ultima_actividad <= time.time() - self.ttl:
+                del self.datos[numero]
+                self._avisar(1, 0)
+                return None
+            return sesion
+
+    def guardar(self, numero, sesion):
+        ahora = time.time()
+        sesion.tocar(ahora)
+        with self.lock:
+            self.datos[numero] = sesion
+            self.datos.move_to_end(numero)
+            self._purgar(ahora)
+
+    def eliminar(self, numero):
+        with self.lock:
+            self.datos.pop(numero, None)
+
+    def estadisticas(self):
+        with self.lock:
+            return {'vivas': len(self.datos), 'expiradas': self.expiradas, 'desalojadas': self.desalojadas}
+
+    def __len__(self):
+        return len(self.datos)
+
+
+class AlmacenSQLite:
+    """Estado de conversación en un archivo SQLite en modo WAL, compartido entre workers del mismo nodo.
+
+    Cada hilo usa su propia conexión; en WAL las lecturas no bloquean a las
+    escrituras y con synchronous=NORMAL cada commit no espera un fsync. Las
+    sesiones expiradas se ignoran al leer y se borran en lote cada
+    ESCRITURAS_POR_PURGA escrituras usando el índice por última actividad.
+    """
+
+    def __init__(self, ruta, ttl=TTL_POR_DEFECTO, maximo=MAXIMO_POR_DEFECTO, observador=None):
+        self.ruta = str(ruta)
+        self.ttl = ttl
+        self.maximo = maximo
+        self.conexiones = ConexionesPorHilo(self.ruta)
+        self.escrituras = 0
+        self.expiradas = 0
+        self.desalojadas = 0
+        self.observador = observador
+        conexion = self.conexion()
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS sesiones ("
+            " numero TEXT PRIMARY KEY,"
+            " datos TEXT NOT NULL,"
+            " ultima_actividad REAL NOT NULL)"
+        )
+        self._migrar(conexion)
+        conexion.execute("CREATE INDEX IF NOT EXISTS sesiones_actividad ON sesiones (ultima_actividad)")
+
+    @staticmethod
+    def _migrar(conexion):
+        # Archivos creados antes del TTL no tienen ultima_actividad. BEGIN IMMEDIATE para que
+        # dos workers que arrancan juntos no intenten agregar la columna los dos.
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            columnas = {fila[1] for fila in conexion.execute("PRAGMA table_info(sesiones)")}
+            if 'ultima_actividad' not in columnas:
+                conexion.execute("ALTER TABLE sesiones ADD COLUMN ultima_actividad REAL NOT NULL DEFAULT 0")
+                # Las conversaciones en curso cuentan desde ahora en vez de expirar con el deploy
+                conexion.execute("UPDATE sesiones SET ultima_actividad = ?", (time.time(),))
+            conexion.execute("COMMIT")
+        except Exception:
+            conexion.execute("ROLLBACK")
+            raise
+
+    def _avisar(self, motivo, cantidad):
+        if cantidad > 0 and self.observador is not None:
+            self.observador(motivo, cantidad)
+
+    def conexion(self):
+        return self.conexiones.obtener()
+
+    def obtener(self, numero):
+        fila = self.conexion().execute(
+            "SELECT datos FROM sesiones WHERE numero = ? AND ultima_actividad > ?",
+            (numero, time.time() - self.ttl),
+        ).fetchone()
+        return Sesion.desde_dict(json.loads(fila[0])) if fila else None
+
+    def guardar(self, numero, sesion):
+        sesion.tocar()
+        self.conexion().execute(
+            "INSERT OR REPLACE INTO sesiones (numero, datos, ultima_actividad) VALUES (?, ?, ?)",
+            (numero, json.dumps(sesion.a_dict(), ensure_ascii=False), sesion.ultima_actividad),
+        )
+        self.escrituras += 1
+        if self.escrituras % ESCRITURAS_POR_PURGA == 0:
+            self.purgar()
+
+    def purgar(self):
+        conexion = self.conexion()
+        cursor = conexion.execute("DELETE FROM sesiones WHERE ultima_actividad <= ?", (time.time() - self.ttl,))
+        self.expiradas += max(cursor.rowcount, 0)
+        self._avisar('expirada', cursor.rowcount)
+        sobrantes = len(self) - self.maximo
+        if sobrantes > 0:
+            cursor = conexion.execute(
+                "DELETE FROM sesiones WHERE numero IN ("
+                " SELECT numero FROM sesiones ORDER BY ultima_actividad LIMIT ?)",
+                (sobrantes,),
+            )
+            self.desalojadas += max(cursor.rowcount, 0)
+            self._avisar('desalojada', cursor.rowcount)
+
+    def eliminar(self, numero):
+        self.conexion().execute("DELETE FROM sesiones WHERE numero = ?", (numero,))
+
+    def estadisticas(self):
+        # Los contadores de purga son de este proceso; "vivas" es el total compartido
+        return {'vivas': len(self), 'expiradas': self.expiradas, 'desalojadas': self.desalojadas}
+
+    def __len__(self):
+        return self.conexion().execute(
+            "SELECT COUNT(*) FROM sesiones WHERE ultima_actividad > ?", (time.time() - self.ttl,)
+        ).fetchone()[0]
+
+
+def crear_almacen_sesiones(backend=None, ruta=None, observador=None):
+    """SESIONES_BACKEND=memoria (por defecto) o sqlite; SESIONES_RUTA indica el archivo.
+
+    SESIONES_TTL_SEGUNDOS y SESIONES_MAXIMO acotan las conversaciones abandonadas.
+    """
+    backend = backend or os.environ.get('SESIONES_BACKEND', 'memoria')
+    ttl = float(os.environ.get('SESIONES_TTL_SEGUNDOS', TTL_POR_DEFECTO))
+    maximo = int(os.environ.get('SESIONES_MAXIMO', MAXIMO_POR_DEFECTO))
+    if backend == 'sqlite':
+        return AlmacenSQLite(ruta or os.environ.get('SESIONES_RUTA', 'sesiones.db'), ttl, maximo, observador)
+    if backend != 'memoria':
+        raise ValueError(f"Backend de sesiones desconocido: {backend}")
+    return AlmacenMemoria(ttl, maximo, observador)
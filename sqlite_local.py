@@ -0,0 +1,24 @@
+import sqlite3
+import threading
+
+
+class ConexionesPorHilo:
+    """Una conexión SQLite (WAL, synchronous=NORMAL, autocommit) por hilo.
+
+    Las usan sesiones, idempotencia y reservas sobre archivos compartidos por
+    los workers; quien necesita una transacción la abre con BEGIN.
+    """
+
+    def __init__(self, ruta, timeout=5):
+        self.ruta = str(ruta)
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def obtener(self):
+        conexion = getattr(self.local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self.local.conexion = conexion
+        return conexion
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+# Los módulos del webhook están en la raíz y los scripts en OtrosPY, sin paquete
+sys.path.insert(0, str(RAIZ / 'OtrosPY'))
+sys.path.insert(0, str(RAIZ))
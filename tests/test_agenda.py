@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+from agenda import AgendaCupos, Cupo
+
+
+def cupo(id, inicio, medico='Dra. Soto', especialidad='Pediatría', disponible=True):
+    return Cupo(id, datetime.strptime(inicio, '%Y-%m-%d %H:%M'), disponible, medico, especialidad)
+
+
+def agenda_ejemplo():
+    return AgendaCupos([
+        cupo(1, '2025-04-16 23:30'),
+        cupo(2, '2025-04-17 00:00'),
+        cupo(3, '2025-04-17 09:00', medico='Dr. Pérez', especialidad='Traumatología'),
+        cupo(4, '2025-04-17 10:00', medico='Dr. Pérez', especialidad='Pediatría'),
+        cupo(5, '2025-04-17 23:59', especialidad='Dermatología'),
+        cupo(6, '2025-04-18 00:00'),
+        cupo(7, '2025-04-18 08:00', disponible=False),
+    ])
+
+
+def ids(cupos):
+    return [c.id for c in cupos]
+
+
+def test_fecha_cubre_el_dia_completo_y_nada_mas():
+    agenda = agenda_ejemplo()
+    assert ids(agenda.proximos_libres(10, fecha=date(2025, 4, 17))) == [2, 3, 4, 5]
+    # Con otro índice elegido la fecha se sigue aplicando como rango
+    assert ids(agenda.proximos_libres(10, especialidad='pediatria', fecha=date(2025, 4, 17))) == [2, 4]
+
+
+def test_desde_incluye_el_cupo_que_parte_a_esa_hora():
+    agenda = agenda_ejemplo()
+    assert ids(agenda.proximos_libres(2, desde=datetime(2025, 4, 17, 9))) == [3, 4]
+    # Un desde anterior al día no amplía el rango; uno posterior lo recorta
+    assert ids(agenda.proximos_libres(10, fecha=date(2025, 4, 17), desde=datetime(2025, 4, 16))) == [2, 3, 4, 5]
+    assert ids(agenda.proximos_libres(10, fecha=date(2025, 4, 17), desde=datetime(2025, 4, 17, 10))) == [4, 5]
+    assert agenda.proximos_libres(10, fecha=date(2025, 4, 19)) == []
+
+
+def test_medico_y_especialidad_se_filtran_juntos():
+    agenda = agenda_ejemplo()
+    assert ids(agenda.proximos_libres(10, medico='dr. perez')) == [3, 4]
+    assert ids(agenda.proximos_libres(10, medico='DR. PÉREZ', especialidad='pediatria')) == [4]
+    assert agenda.proximos_libres(10, medico='Dr. Pérez', especialidad='Dermatología') == []
+    assert agenda.proximos_libres(10, medico='Dr. Nadie') == []
+
+
+def test_especialidades_con_cupos_libres_desde():
+    agenda = agenda_ejemplo()
+    assert agenda.especialidades() == ['Dermatología', 'Pediatría', 'Traumatología']
+    assert agenda.especialidades(datetime(2025, 4, 17, 9, 30)) == ['Dermatología', 'Pediatría']
+    assert agenda.especialidades(datetime(2025, 4, 18, 0, 1)) == []
+
+
+def test_reservar_y_liberar_actualizan_todos_los_indices():
+    agenda = agenda_ejemplo()
+    assert agenda.reservar(3)
+    assert not agenda.reservar(3)
+    assert not agenda.reservar(99)
+    assert 3 not in ids(agenda.proximos_libres(10))
+    assert 3 not in ids(agenda.proximos_libres(10, fecha=date(2025, 4, 17)))
+    assert ids(agenda.proximos_libres(10, medico='Dr. Pérez')) == [4]
+    assert agenda.especialidades() == ['Dermatología', 'Pediatría']
+
+    assert agenda.liberar(3)
+    assert not agenda.liberar(3)
+    assert ids(agenda.proximos_libres(10, especialidad='Traumatología')) == [3]
+    assert ids(agenda.proximos_libres(10, fecha=date(2025, 4, 17))) == [2, 3, 4, 5]
+    assert ids(agenda.proximos_libres(10, medico='Dr. Pérez')) == [3, 4]
+
+    # Un cupo creado ocupado entra a los índices recién al liberarse
+    assert agenda.liberar(7)
+    assert ids(agenda.proximos_libres(10, fecha=date(2025, 4, 18))) == [6, 7]
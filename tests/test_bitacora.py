@@ -0,0 +1,53 @@
+import json
+import threading
+
+from bitacora import Bitacora, bloqueo, cargar_agenda, compactar
+
+
+def foto(ruta, cupos):
+    ruta.write_text(json.dumps({'citas': [
+        {'id': i, 'fecha': '2025-04-17', 'hora': f"{8 + i:02d}:00:00", 'disponible': 1,
+         'medico': 'Dra. Soto', 'especialidad': 'Pediatría'}
+        for i in range(1, cupos + 1)
+    ]}), encoding='utf-8')
+
+
+def test_carga_espera_a_la_compactacion_en_curso(tmp_path):
+    ruta_foto, ruta_bitacora = tmp_path / 'citas.json', tmp_path / 'citas.journal'
+    foto(ruta_foto, 2)
+    bitacora = Bitacora(ruta_bitacora, ruta_foto)
+    bitacora.registrar('reservar', id=1)
+
+    cargadas = []
+    with bloqueo(ruta_bitacora, exclusivo=True):  # como si otro worker estuviera compactando
+        hilo = threading.Thread(target=lambda: cargadas.append(cargar_agenda(ruta_foto, ruta_bitacora)))
+        hilo.start()
+        hilo.join(0.2)
+        assert cargadas == []
+    hilo.join(5)
+    assert not cargadas[0].obtener(1).disponible
+    bitacora.cerrar()
+
+
+def test_compactar_conserva_las_reservas_de_la_bitacora(tmp_path):
+    ruta_semilla, ruta_foto = tmp_path / 'citas.json', tmp_path / 'citas.foto.json'
+    ruta_bitacora = tmp_path / 'citas.journal'
+    foto(ruta_semilla, 2)
+    semilla = ruta_semilla.read_bytes()
+    bitacora = Bitacora(ruta_bitacora, ruta_foto, ruta_semilla)
+    bitacora.registrar('reservar', id=2)
+    assert not cargar_agenda(ruta_foto, ruta_bitacora, ruta_semilla).obtener(2).disponible
+
+    compactar(ruta_foto, ruta_bitacora, ruta_semilla)
+    assert ruta_bitacora.stat().st_size == 0
+    assert ruta_semilla.read_bytes() == semilla  # citas.json (versionado) no se toca
+    agenda = cargar_agenda(ruta_foto, ruta_bitacora, ruta_semilla)
+    assert agenda.obtener(1).disponible and not agenda.obtener(2).disponible
+
+    # Una semilla nueva (deploy, git pull) no pisa la foto ya compactada
+    foto(ruta_semilla, 3)
+    bitacora.registrar('reservar', id=1)
+    compactar(ruta_foto, ruta_bitacora, ruta_semilla)
+    agenda = cargar_agenda(ruta_foto, ruta_bitacora, ruta_semilla)
+    assert not agenda.obtener(1).disponible and not agenda.obtener(2).disponible
+    bitacora.cerrar()
@@ -0,0 +1,88 @@
+import threading
+import time as reloj
+from datetime import date, datetime, time
+
+from cache_disponibilidad import CacheDisponibilidad
+from datos_reservas import PoolConexiones, RepositorioReservas
+
+DIA = date(2025, 4, 16)
+
+
+class CursorSQLServer:
+    """Como pyodbc con fecha DATETIME: las filas traen datetime en vez de date"""
+
+    def __init__(self, filas):
+        self.filas = filas
+
+    def execute(self, consulta, parametros=()):
+        pass
+
+    def fetchall(self):
+        return list(self.filas)
+
+    def close(self):
+        pass
+
+
+class ConexionSQLServer:
+    def __init__(self, filas):
+        self.filas = filas
+
+    def cursor(self):
+        return CursorSQLServer(self.filas)
+
+    def rollback(self):
+        pass
+
+
+def test_consultas_simultaneas_comparten_una_sola_carga():
+    liberar, llamadas = threading.Event(), []
+
+    def cargar(dia, limite, especialidad):
+        llamadas.append(dia)
+        liberar.wait(5)
+        return [(dia, time(8), 'Dra. Soto', 'Pediatría', 1)]
+
+    cache = CacheDisponibilidad(cargar, ttl=60)
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener(DIA))) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    while cache.estadisticas()['coalescidas'] < 4:
+        reloj.sleep(0.001)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert llamadas == [DIA] and len(set(resultados)) == 1 and len(resultados) == 5
+    assert cache.obtener(DIA) == resultados[0] and cache.estadisticas()['hits'] == 1
+
+
+def test_reservar_invalida_el_dia_aunque_la_base_entregue_datetime():
+    filas = [(datetime(2025, 4, 16), time(8), 'Dra. Soto', 'Pediatría', 1)]
+    repositorio = RepositorioReservas(PoolConexiones(lambda: ConexionSQLServer(filas)), 'sqlserver')
+    cache = CacheDisponibilidad(repositorio.cupos_disponibles, ttl=60)
+
+    slot = cache.obtener(DIA)[0]
+    assert slot[0] == DIA and type(slot[0]) is date
+    filas.clear()  # alguien tomó el cupo
+    cache.invalidar(slot[0])  # lo que hace reservar_slot en appBBDD.py
+    assert cache.obtener(DIA) == ()
+    assert cache.estadisticas()['consultas'] == 2
+
+
+def test_carga_en_curso_no_repone_datos_invalidados():
+    en_carga, liberar = threading.Event(), threading.Event()
+
+    def cargar(dia, limite, especialidad):
+        en_carga.set()
+        liberar.wait(5)
+        return ['cupo viejo']
+
+    cache = CacheDisponibilidad(cargar, ttl=60)
+    hilo = threading.Thread(target=cache.obtener, args=(DIA,))
+    hilo.start()
+    en_carga.wait(5)
+    cache.invalidar(DIA)
+    liberar.set()
+    hilo.join(5)
+    assert cache.estadisticas()['tamano'] == 0
@@ -0,0 +1,37 @@
+import sqlite3
+
+from cache_extractos import CacheExtracto, tiene_columna
+
+CONSULTA = "SELECT RUN, FECHA_ADD FROM atenciones"
+
+
+def base(ruta, filas):
+    conexion = sqlite3.connect(str(ruta))
+    conexion.execute("CREATE TABLE IF NOT EXISTS atenciones (RUN TEXT, FECHA_ADD TEXT)")
+    conexion.executemany("INSERT INTO atenciones VALUES (?, ?)", filas)
+    conexion.commit()
+    return conexion
+
+
+def test_filas_sin_fecha_se_vuelven_a_pedir_sin_duplicarse(tmp_path):
+    conexion = base(tmp_path / 'base.db', [('1', '2024-01-10 08:00:00'), ('2', None)])
+    extracto = CacheExtracto('atenciones', CONSULTA, directorio=tmp_path / 'extractos')
+    extracto.actualizar(conexion)
+
+    # Llega otra fila sin fecha y la que no tenía fecha la recibe después
+    conexion.execute("UPDATE atenciones SET FECHA_ADD = '2024-02-03 09:00:00' WHERE RUN = '2'")
+    conexion.executemany("INSERT INTO atenciones VALUES (?, ?)", [('3', None), ('4', '2024-02-01 10:00:00')])
+    conexion.commit()
+    extracto.actualizar(conexion)
+    assert sorted(extracto.leer()['RUN']) == ['1', '2', '3', '4']
+
+    conexion.execute("DELETE FROM atenciones WHERE FECHA_ADD IS NULL")
+    conexion.commit()
+    extracto.actualizar(conexion)
+    assert sorted(extracto.leer()['RUN']) == ['1', '2', '4']
+
+
+def test_tiene_columna(tmp_path):
+    conexion = base(tmp_path / 'base.db', [])
+    assert tiene_columna(conexion, 'atenciones', 'FECHA_ADD')
+    assert not tiene_columna(conexion, 'atenciones', 'FECHA_MOD')
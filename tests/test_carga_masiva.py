@@ -0,0 +1,23 @@
+import sqlite3
+
+import pandas as pd
+
+from carga_masiva import reemplazar_tabla
+
+COLUMNAS = {'RUN': 'VARCHAR(50)', 'PROBABILIDAD_ASISTENCIA': 'FLOAT'}
+
+
+def filas(*runs):
+    return pd.DataFrame({'RUN': list(runs), 'PROBABILIDAD_ASISTENCIA': [0.5] * len(runs)})
+
+
+def test_conserva_indices_de_la_tabla_existente(tmp_path):
+    conexion = sqlite3.connect(str(tmp_path / 'carga.db'))
+    assert reemplazar_tabla(conexion, 'PROBABILIDAD', filas('1', '2'), COLUMNAS) == 2
+    # Índice agregado a mano sobre la tabla ya publicada
+    conexion.execute("CREATE UNIQUE INDEX ix_probabilidad_run ON PROBABILIDAD (RUN)")
+
+    assert reemplazar_tabla(conexion, 'PROBABILIDAD', filas('3', '4', '5'), COLUMNAS, tamano_lote=2) == 3
+    assert [r[0] for r in conexion.execute("SELECT RUN FROM PROBABILIDAD ORDER BY RUN")] == ['3', '4', '5']
+    assert conexion.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall() == [('ix_probabilidad_run',)]
+    assert conexion.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%__carga'").fetchone()[0] == 0
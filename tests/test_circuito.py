@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from circuito import CircuitoAbierto, Cortocircuito
+
+
+class Backend:
+    """Backend de prueba: falla mientras `caido` y cuenta las llamadas que recibe"""
+
+    def __init__(self):
+        self.caido = False
+        self.llamadas = 0
+
+    def consultar(self):
+        self.llamadas += 1
+        if self.caido:
+            raise ConnectionError("backend caído")
+        return 'ok'
+
+
+def abrir(circuito, backend):
+    backend.caido = True
+    for _ in range(circuito.fallos_maximos):
+        with pytest.raises(ConnectionError):
+            circuito.llamar(backend.consultar)
+    assert circuito.estado == 'abierto'
+
+
+def test_abierto_no_toca_el_backend():
+    circuito, backend = Cortocircuito(fallos_maximos=3, espera=60), Backend()
+    abrir(circuito, backend)
+    with pytest.raises(CircuitoAbierto):
+        circuito.llamar(backend.consultar)
+    assert backend.llamadas == 3
+
+
+def test_prueba_exitosa_cierra_y_fallida_reabre():
+    circuito, backend = Cortocircuito(fallos_maximos=2, espera=0.01), Backend()
+    abrir(circuito, backend)
+    time.sleep(0.02)
+    with pytest.raises(ConnectionError):
+        circuito.llamar(backend.consultar)
+    assert circuito.estado == 'abierto'
+    time.sleep(0.02)
+    backend.caido = False
+    assert circuito.llamar(backend.consultar) == 'ok'
+    assert (circuito.estado, circuito.fallos, circuito.probando) == ('cerrado', 0, False)
+
+
+def test_una_sola_prueba_a_la_vez():
+    circuito, backend = Cortocircuito(fallos_maximos=1, espera=0.01), Backend()
+    abrir(circuito, backend)
+    time.sleep(0.02)
+    en_prueba, liberar = threading.Event(), threading.Event()
+
+    def lenta():
+        en_prueba.set()
+        liberar.wait(5)
+        return 'ok'
+
+    hilo = threading.Thread(target=circuito.llamar, args=(lenta,))
+    hilo.start()
+    en_prueba.wait(5)
+    with pytest.raises(CircuitoAbierto):
+        circuito.llamar(backend.consultar)
+    liberar.set()
+    hilo.join(5)
+    assert circuito.estado == 'cerrado'
+
+
+def test_prueba_interrumpida_no_bloquea_el_circuito():
+    circuito, backend = Cortocircuito(fallos_maximos=1, espera=0.01), Backend()
+    abrir(circuito, backend)
+    time.sleep(0.02)
+
+    def interrumpida():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        circuito.llamar(interrumpida)
+    assert not circuito.probando
+    backend.caido = False
+    assert circuito.llamar(backend.consultar) == 'ok'
+    assert circuito.estado == 'cerrado'
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from datos_reservas import (
+    PoolConexiones, RepositorioReservas, config_sqlserver_desde_entorno, crear_bbdd_sqlite, crear_pool_sqlite,
+)
+
+
+def test_devolver_conexion_descarta_lo_no_confirmado(tmp_path):
+    ruta = tmp_path / 'bbdd.db'
+    crear_bbdd_sqlite(ruta, citas=None, faqs=None)
+    pool = crear_pool_sqlite(ruta, maximo=1)
+    with pool.conexion() as conexion:
+        conexion.execute("BEGIN IMMEDIATE")
+        conexion.execute("INSERT INTO Reservas (id, fecha, hora, disponible) VALUES (1, '2025-04-17', '08:00', 1)")
+        # Sin commit: quien la usó olvidó confirmar
+    otra = sqlite3.connect(str(ruta), timeout=0.1)
+    otra.execute("INSERT INTO Reservas (id, fecha, hora, disponible) VALUES (2, '2025-04-17', '09:00', 1)")
+    otra.commit()
+    with pool.conexion() as conexion:
+        assert conexion.execute("SELECT id FROM Reservas").fetchall() == [(2,)]
+    pool.cerrar()
+
+
+class ConexionRota:
+    cerrada = False
+
+    def rollback(self):
+        raise OSError("conexión perdida")
+
+    def close(self):
+        self.cerrada = True
+
+
+def test_conexion_que_falla_el_rollback_se_descarta():
+    conexiones = []
+    pool = PoolConexiones(lambda: conexiones.append(ConexionRota()) or conexiones[-1], maximo=1)
+    with pool.conexion():
+        pass
+    assert conexiones[0].cerrada and pool.libres == [] and pool.abiertas == 0
+
+
+def test_reserva_aunque_falte_la_columna_telefono(tmp_path):
+    # Esquema de Reservas anterior a los recordatorios
+    ruta = tmp_path / 'bbdd.db'
+    conexion = sqlite3.connect(str(ruta))
+    conexion.execute("CREATE TABLE Reservas (id INTEGER PRIMARY KEY, fecha TEXT, hora TEXT,"
+                     " medico TEXT, especialidad TEXT, disponible INTEGER)")
+    conexion.execute("INSERT INTO Reservas VALUES (1, '2025-04-17', '08:00:00', 'Dra. Soto', 'Pediatría', 1)")
+    conexion.commit()
+    conexion.close()
+
+    repositorio = RepositorioReservas(crear_pool_sqlite(ruta), 'sqlite')
+    assert repositorio.reservar(1, 'whatsapp:+569') and not repositorio.reservar(1, 'whatsapp:+568')
+    with pytest.raises(RuntimeError):
+        repositorio.cupos_reservados('2025-04-17')
+
+
+def test_config_sqlserver_desde_entorno(monkeypatch):
+    for variable, valor in [('BBDD_SERVIDOR', 'db'), ('BBDD_BASE', 'base'), ('BBDD_USUARIO', 'u'), ('BBDD_CLAVE', 'c')]:
+        monkeypatch.setenv(variable, valor)
+    assert config_sqlserver_desde_entorno()['pwd'] == 'c'
+    monkeypatch.delenv('BBDD_CLAVE')
+    with pytest.raises(KeyError, match='BBDD_CLAVE'):
+        config_sqlserver_desde_entorno()
@@ -0,0 +1,91 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from envio_asincrono import ClienteMensajes, ProcesadorAsincrono
+
+
+class TwilioFalso(BaseHTTPRequestHandler):
+    def do_POST(self):
+        datos = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+        with self.server.lock:
+            self.server.recibidos.append({clave: valores[0] for clave, valores in datos.items()})
+            sid = f"SM{len(self.server.recibidos)}"
+        cuerpo = json.dumps({'sid': sid}).encode()
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def twilio():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), TwilioFalso)
+    servidor.recibidos, servidor.lock = [], threading.Lock()
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def cliente(twilio):
+    return ClienteMensajes('ACfalso', 'falso', 'whatsapp:+1415', base_url=f"http://127.0.0.1:{twilio.server_port}")
+
+
+def test_cliente_envia_a_messages_json(twilio):
+    assert cliente(twilio).enviar('whatsapp:+569', 'hola') == 'SM1'
+    assert twilio.recibidos == [{'To': 'whatsapp:+569', 'From': 'whatsapp:+1415', 'Body': 'hola'}]
+
+
+def test_mensajes_de_un_numero_llegan_en_orden(twilio):
+    mensajes = cliente(twilio)
+    procesador = ProcesadorAsincrono(hilos=8)
+    rnd = random.Random(0)
+    en_curso, solapados = set(), []
+
+    def responder(numero, texto, demora):
+        if numero in en_curso:
+            solapados.append(numero)
+        en_curso.add(numero)
+        time.sleep(demora)  # el primer mensaje de cada número es el más lento
+        en_curso.discard(numero)
+        mensajes.enviar(numero, texto)
+
+    numeros = [f"whatsapp:+569{i}" for i in range(5)]
+    for n in range(6):
+        for numero in numeros:
+            assert procesador.encolar(responder, numero, f"respuesta {n}", 0.05 / (n + 1) * rnd.random(), clave=numero)
+    procesador.cerrar()
+
+    assert solapados == []
+    for numero in numeros:
+        assert [m['Body'] for m in twilio.recibidos if m['To'] == numero] == [f"respuesta {n}" for n in range(6)]
+    assert procesador.en_curso == {}
+
+
+def test_error_no_detiene_la_cola_del_numero():
+    procesador = ProcesadorAsincrono(hilos=2, maximo_pendientes=2)
+    hechos = []
+
+    def falla():
+        raise ValueError("backend caído")
+
+    assert procesador.encolar(falla, clave='a')
+    assert procesador.encolar(hechos.append, 1, clave='a')
+    while not hechos:
+        time.sleep(0.01)
+    # Los cupos se devolvieron aunque el primero fallara
+    liberar = threading.Event()
+    assert procesador.encolar(liberar.wait, clave='a') and procesador.encolar(liberar.wait, clave='b')
+    assert not procesador.encolar(liberar.wait, clave='c')
+    liberar.set()
+    procesador.cerrar()
@@ -0,0 +1,76 @@
+import json
+import random
+import string
+
+import pytest
+from fuzzywuzzy import fuzz
+
+from conftest import RAIZ
+from faq_index import IndiceFAQ, normalizar
+
+
+def recorrido_lineal(faqs, pregunta_usuario):
+    """buscar_respuesta_faq tal como estaba antes del índice"""
+    pregunta_usuario = pregunta_usuario.lower().strip()
+    mejor_respuesta = None
+    mejor_puntaje = 0
+    for faq in faqs:
+        puntaje_pregunta = fuzz.ratio(pregunta_usuario, faq['pregunta'].lower())
+        keywords = [kw.strip().lower() for kw in faq.get('keywords', '').split(',')]
+        puntaje_keywords = max([fuzz.ratio(pregunta_usuario, kw) for kw in keywords] + [0])
+        puntaje_total = max(puntaje_keywords, puntaje_pregunta * 0.8)
+        if puntaje_total > 50 and puntaje_total > mejor_puntaje:
+            mejor_puntaje = puntaje_total
+            mejor_respuesta = faq['respuesta']
+    return mejor_respuesta
+
+
+def con_error(texto, rnd):
+    if len(texto) < 4:
+        return texto
+    i = rnd.randrange(len(texto))
+    return texto[:i] + rnd.choice(string.ascii_lowercase) + texto[i + 1:]
+
+
+@pytest.fixture(scope='module')
+def faqs():
+    with open(RAIZ / 'data' / 'faqs.json', encoding='utf-8') as f:
+        return json.load(f)['faqs']
+
+
+def catalogo(faqs, tamano, rnd):
+    palabras = [p for faq in faqs for p in (faq['pregunta'] + ' ' + faq['keywords']).replace(',', ' ').split()]
+    return faqs + [{
+        'pregunta': f"¿{' '.join(rnd.sample(palabras, 4))} {i}?",
+        'keywords': ', '.join(f"{rnd.choice(palabras)}{i}" for _ in range(5)),
+        'respuesta': f"Respuesta sintética {i}",
+    } for i in range(tamano)]
+
+
+def consultas(catalogo, rnd):
+    textos = []
+    for faq in catalogo:
+        textos += [faq['pregunta']] + [kw.strip() for kw in faq.get('keywords', '').split(',')]
+    textos = rnd.sample(textos, min(len(textos), 150))
+    variantes = [v for texto in textos for v in (texto, normalizar(texto), con_error(texto, rnd))]
+    return variantes + ['', 'a', 'gracias', 'ok', 'jajaja', 'quiero pedir una pizza', 'ññññ', 'hola ' * 10]
+
+
+@pytest.mark.parametrize('tamano', [0, 1000])
+def test_mismo_resultado_que_el_recorrido_lineal(faqs, tamano):
+    rnd = random.Random(tamano)
+    faqs_catalogo = catalogo(faqs, tamano, rnd)
+    indice = IndiceFAQ(faqs_catalogo)
+    distintas = [
+        texto for texto in consultas(faqs_catalogo, rnd)
+        if indice.buscar(texto) != recorrido_lineal(faqs_catalogo, texto)
+    ]
+    assert distintas == []
+
+
+def test_empate_gana_la_primera_faq():
+    faqs = [
+        {'pregunta': 'uno', 'keywords': 'horario', 'respuesta': 'primera'},
+        {'pregunta': 'dos', 'keywords': 'horario', 'respuesta': 'segunda'},
+    ]
+    assert IndiceFAQ(faqs).buscar('horarios') == 'primera'
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pandas as pd
+
+from cache_extractos import CacheExtracto
+from extraccion_asistencia import ASISTIO, acumular_historial, cerrar_historial
+from historial_asistencia import HistorialAsistencia
+
+CONSULTA = "SELECT RUN, COD_ASISTENCIA, FECHA_ADD FROM atenciones"
+
+
+def groupby_completo(extracto):
+    """Lo que calculaba asistencia.py con groupby("RUN") sobre todo el extracto"""
+    df = extracto.leer()
+    df['ASISTENCIA'] = df['COD_ASISTENCIA'].map(ASISTIO)
+    return cerrar_historial(acumular_historial(None, df))[['TOTAL_CITAS', 'TOTAL_ASISTENCIAS']]
+
+
+def contadores(historial):
+    tabla = historial.tabla()
+    return tabla[tabla['TOTAL_CITAS'] > 0][['TOTAL_CITAS', 'TOTAL_ASISTENCIAS']]
+
+
+def test_coincide_con_el_extracto_con_filas_sin_fecha(tmp_path):
+    base = sqlite3.connect(str(tmp_path / 'base.db'))
+    base.execute("CREATE TABLE atenciones (RUN TEXT, COD_ASISTENCIA TEXT, FECHA_ADD TEXT)")
+    extracto = CacheExtracto('atenciones', CONSULTA, directorio=tmp_path / 'extractos', solape_dias=1)
+    historial = HistorialAsistencia(tmp_path / 'historial.db')
+
+    pasos = [
+        ["INSERT INTO atenciones VALUES ('1', 'A', '2024-01-10 08:00:00'), ('1', 'N', NULL)"],
+        ["INSERT INTO atenciones VALUES ('1', 'A', NULL), ('2', 'S', '2024-01-11 09:00:00')"],
+        # Una fila sin fecha la recibe después y llegan filas nuevas de otro mes
+        ["UPDATE atenciones SET FECHA_ADD = '2024-02-01 10:00:00' WHERE rowid = 2",
+         "INSERT INTO atenciones VALUES ('2', 'N', '2024-02-02 11:00:00'), ('3', 'A', NULL)"],
+        ["DELETE FROM atenciones WHERE FECHA_ADD IS NULL"],
+        [],
+    ]
+    for sentencias in pasos:
+        for sentencia in sentencias:
+            base.execute(sentencia)
+        base.commit()
+        extracto.actualizar(base)
+        historial.sincronizar(extracto)
+        pd.testing.assert_frame_equal(contadores(historial), groupby_completo(extracto), check_like=True,
+                                      check_dtype=False, check_index_type=False)
+    assert historial.obtener('1')['TOTAL_CITAS'] == 2
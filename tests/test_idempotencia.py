@@ -0,0 +1,9 @@
+from idempotencia import DATA_DIR, MensajesSQLite, crear_registro_mensajes
+
+
+def test_por_defecto_el_archivo_queda_en_data(monkeypatch):
+    monkeypatch.delenv('DEDUP_RUTA', raising=False)
+    monkeypatch.setenv('DEDUP_BACKEND', 'sqlite')
+    monkeypatch.setattr(MensajesSQLite, '__init__', lambda self, ruta, ttl, maximo: setattr(self, 'ruta', ruta))
+    # El archivo no depende del directorio desde el que se lanzó gunicorn
+    assert crear_registro_mensajes().ruta == DATA_DIR / 'mensajes.db'
@@ -0,0 +1,68 @@
+import pytest
+
+import limites
+from limites import LimitadorPorNumero, LimiteConcurrencia
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    reloj = Reloj()
+    monkeypatch.setattr(limites.time, 'monotonic', reloj)
+    return reloj
+
+
+def test_rafaga_y_recarga(reloj):
+    limitador = LimitadorPorNumero(capacidad=2, recarga=0.5)
+    assert limitador.permitir('+569')
+    assert limitador.permitir('+569')
+    assert not limitador.permitir('+569')
+    assert limitador.permitir('+568')  # otro número tiene su propio bucket
+
+    reloj.ahora += 1  # medio token: todavía no alcanza
+    assert not limitador.permitir('+569')
+    reloj.ahora += 1
+    assert limitador.permitir('+569')
+    assert not limitador.permitir('+569')
+
+    # La recarga no pasa de la capacidad
+    reloj.ahora += 3600
+    assert limitador.permitir('+569')
+    assert limitador.permitir('+569')
+    assert not limitador.permitir('+569')
+
+
+def test_descarta_el_numero_usado_hace_mas_tiempo(reloj):
+    limitador = LimitadorPorNumero(capacidad=1, recarga=0.001, maximo_numeros=2)
+    assert limitador.permitir('a')
+    assert limitador.permitir('b')
+    assert not limitador.permitir('a')  # 'a' pasa a ser el más reciente
+    assert limitador.permitir('c')      # sobre el máximo se descarta 'b'
+    assert len(limitador) == 2
+    assert list(limitador.buckets) == ['a', 'c']
+    assert not limitador.permitir('a')
+    assert limitador.permitir('b')      # vuelve con el bucket lleno
+
+
+def test_concurrencia_libera_el_cupo_si_la_vista_falla():
+    limite = LimiteConcurrencia(1)
+
+    def falla():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        limite.ejecutar(falla, lambda: 'rechazado')
+    assert limite.ejecutar(lambda: 'ok', lambda: 'rechazado') == 'ok'
+
+    assert limite.entrar()
+    assert limite.ejecutar(lambda: 'ok', lambda: 'rechazado') == 'rechazado'
+    limite.salir()
+    with pytest.raises(ValueError):
+        limite.salir()  # BoundedSemaphore: un salir de más es un error, no un cupo extra
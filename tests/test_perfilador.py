@@ -0,0 +1,23 @@
+import pytest
+
+from perfilador import Perfilador, reiniciar_control
+
+
+@pytest.mark.parametrize('tasa', ['nan', '1.5', '-0.1', 'abc'])
+def test_rechaza_tasas_fuera_de_rango(tmp_path, tasa):
+    perfilador = Perfilador(tmp_path, intervalo=60)
+    perfilador.fijar_tasa('0.5')
+    with pytest.raises(ValueError):
+        perfilador.fijar_tasa(tasa)
+    assert perfilador.tasa == 0.5
+    assert (tmp_path / 'tasa').read_text().strip() == '0.5'
+
+
+def test_al_arrancar_la_tasa_vuelve_a_la_del_entorno(tmp_path, monkeypatch):
+    monkeypatch.setenv('PERFILES_DIR', str(tmp_path))
+    monkeypatch.delenv('PERFIL_TASA', raising=False)
+    Perfilador(tmp_path, intervalo=60).fijar_tasa('0.5')  # fijada por /admin/perfilado antes de reiniciar
+    assert reiniciar_control() == 0.0
+    assert Perfilador(tmp_path, intervalo=60).tasa == 0.0
+    monkeypatch.setenv('PERFIL_TASA', '0.01')
+    assert reiniciar_control() == 0.01
@@ -0,0 +1,14 @@
+from types import SimpleNamespace
+
+from reservas import ReservasSQLite, crear_reservas
+
+
+def test_por_defecto_dos_workers_no_obtienen_el_mismo_cupo(tmp_path, monkeypatch):
+    monkeypatch.delenv('RESERVAS_BACKEND', raising=False)
+    monkeypatch.setenv('RESERVAS_RUTA', str(tmp_path / 'reservas.db'))
+    cupos = [SimpleNamespace(id=1, disponible=True)]
+    # Cada worker de gunicorn crea su propia instancia al importar app.py
+    worker_a, worker_b = crear_reservas(cupos), crear_reservas(cupos)
+    assert isinstance(worker_a, ReservasSQLite)
+    assert [worker_a.reservar(1), worker_b.reservar(1)] == [True, False]
+    assert worker_b.libres([1]) == set()
@@ -0,0 +1,37 @@
+import json
+import sqlite3
+
+from sesiones import AlmacenMemoria, AlmacenSQLite, Sesion
+
+
+def test_migra_archivo_sin_ultima_actividad(tmp_path):
+    # Esquema y formato que dejaba el almacén SQLite antes del TTL
+    ruta = tmp_path / 'sesiones.db'
+    conexion = sqlite3.connect(ruta)
+    conexion.execute("CREATE TABLE sesiones (numero TEXT PRIMARY KEY, datos TEXT NOT NULL)")
+    conexion.execute(
+        "INSERT INTO sesiones VALUES (?, ?)",
+        ('whatsapp:+569', json.dumps({'estado': 'esperando_nombre', 'especialidad': 'Pediatría'})),
+    )
+    conexion.commit()
+    conexion.close()
+
+    almacen = AlmacenSQLite(ruta)
+    sesion = almacen.obtener('whatsapp:+569')
+    assert sesion.estado == 'esperando_nombre'
+    almacen.guardar('whatsapp:+568', Sesion(estado='esperando_especialidad'))
+    assert len(almacen) == 2
+    # Abrirlo de nuevo no vuelve a migrar
+    assert len(AlmacenSQLite(ruta)) == 2
+
+
+def test_observador_recibe_expiradas_y_desalojadas():
+    eventos = []
+    almacen = AlmacenMemoria(ttl=60, maximo=2, observador=lambda motivo, cantidad: eventos.append((motivo, cantidad)))
+    for numero in ('a', 'b', 'c'):
+        almacen.guardar(numero, Sesion())
+    assert eventos == [('desalojada', 1)]
+    almacen.datos['b'].ultima_actividad -= 120
+    assert almacen.obtener('b') is None
+    assert eventos[-1] == ('expirada', 1)
+    assert almacen.estadisticas() == {'vivas': 1, 'expiradas': 1, 'desalojadas': 1}
@@ -0,0 +1,48 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class VigilanteArchivo:
+    """Hilo en segundo plano que revisa el mtime de un archivo y llama al callback si cambia"""
+
+    def __init__(self, ruta, callback, intervalo=5.0):
+        self.ruta = ruta
+        self.callback = callback
+        self.intervalo = intervalo
+        self.firma = self.leer_firma()
+        self.detener = threading.Event()
+        self.hilo = None
+
+    def leer_firma(self):
+        try:
+            stat = os.stat(self.ruta)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def revisar(self):
+        firma = self.leer_firma()
+        if firma is None or firma == self.firma:
+            return False
+        self.firma = firma
+        try:
+            self.callback()
+        except Exception as e:
+            logger.error(f"Error procesando cambio en {self.ruta}: {str(e)}")
+        return True
+
+    def _ciclo(self):
+        while not self.detener.wait(self.intervalo):
+            self.revisar()
+
+    def iniciar(self):
+        if self.hilo is None:
+            self.hilo = threading.Thread(target=self._ciclo, name=f"vigilante-{os.path.basename(self.ruta)}", daemon=True)
+            self.hilo.start()
+        return self
+
+    def parar(self):
+        self.detener.set()